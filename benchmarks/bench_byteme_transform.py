@@ -0,0 +1,107 @@
+"""
+ByteMe transform: column operations against the previous row-wise implementation.
+
+Generates synthetic ByteMe CSV responses of 1k to 100k rows, parses them like
+fetch_offers does and times both transforms. Checks that both produce the same values
+(missing values compared as missing, 18.0 and 18 as equal).
+
+Usage:
+    python -m benchmarks.bench_byteme_transform [rows ...]
+"""
+import io
+import sys
+import time
+import random
+
+import numpy as np
+import pandas as pd
+
+from src.providers.fetch_byteme import transform_offers
+
+# --- Previous implementation (row-wise apply) ---
+def get_max_age(row):
+    if pd.isna(row['maxAge']):
+        return np.nan
+    return int(row['maxAge'])
+def get_voucher_value(row):
+    if pd.isna(row['voucherValue']):
+        return np.nan
+    return int(row['voucherValue'])
+def get_limit(row):
+    if pd.isna(row['limitFrom']):
+        return np.nan
+    return int(row['limitFrom'])
+def get_tv(row):
+    if pd.isna(row['tv']):
+        return pd.NA
+    return row['tv']
+
+def row_wise_transform_offers(offers):
+    offers['provider'] = 'ByteMe'
+    offers['name'] = offers['providerName']
+    offers['speed_mbps'] = offers['speed'].astype(int)
+    offers['cost_eur'] = offers['monthlyCostInCent'].astype(float) / 100
+    offers['duration_months'] = offers['durationInMonths'].astype(int)
+    offers['after_two_years_eur'] = offers['afterTwoYearsMonthlyCost'].astype(float) / 100
+    offers['connection_type'] = offers['connectionType'].str.lower()
+    offers['installation_included'] = offers['installationService'] == 'true'
+    offers['tv'] = offers.apply(get_tv, axis=1)
+    offers['max_age'] = offers.apply(get_max_age, axis=1)
+    mask = offers['voucherType'] == 'percentage'
+    offers.loc[mask, 'voucher_percent'] = offers.loc[mask].apply(get_voucher_value, axis=1)
+    offers.loc[mask, 'voucher_fixed_eur'] = np.nan
+    offers.loc[mask, 'promo_price_eur'] = offers.loc[mask, 'cost_eur'] - (offers.loc[mask, 'cost_eur'] * offers.loc[mask, 'voucher_percent'] / 100)
+    offers.loc[~mask, 'voucher_fixed_eur'] = offers.loc[~mask].apply(get_voucher_value, axis=1) / 100
+    offers.loc[~mask, 'voucher_percent'] = np.nan
+    offers.loc[~mask, 'promo_price_eur'] = offers.loc[~mask, 'cost_eur'] - (offers.loc[~mask, 'voucher_fixed_eur']) / 24
+    offers['limit_from_gb'] = offers.apply(get_limit, axis=1).astype(int)
+    order = [
+        'provider', 'name', 'speed_mbps', 'cost_eur', 'promo_price_eur', 'duration_months',
+        'after_two_years_eur', 'connection_type', 'installation_included', 'tv',
+        'max_age', 'voucher_fixed_eur', 'voucher_percent', 'limit_from_gb'
+    ]
+    return offers[order]
+
+# --- Benchmark ---
+def synthetic_csv(rows):
+    random.seed(rows)
+    lines = ["productId,providerName,speed,monthlyCostInCent,afterTwoYearsMonthlyCost,durationInMonths,"
+             "connectionType,installationService,tv,limitFrom,maxAge,voucherType,voucherValue"]
+    for i in range(rows):
+        voucher_type = random.choice(["percentage", "absolute", ""])
+        voucher_value = random.randint(1, 30) if voucher_type == "percentage" else random.choice([random.randint(500, 20000), ""])
+        lines.append(",".join(str(value) for value in [
+            i, f"Byte {random.choice(['Basic', 'Ultra', 'Max'])} {random.randint(10, 1000)}",
+            random.choice([50, 100, 250, 500, 1000]), random.randint(1500, 9000), random.randint(2000, 9500),
+            random.choice([12, 24]), random.choice(["DSL", "Cable", "Fiber", "Mobile"]),
+            random.choice(["true", "false"]), random.choice(["ByteLive Basic", "ByteLive Plus", ""]),
+            random.choice([100, 200, 300]), random.choice([27, 30, ""]), voucher_type, voucher_value,
+        ]))
+    return "\n".join(lines)
+
+def values(df):
+    # missing values as None, so both dtypes compare equal
+    return [df[column].astype(object).where(df[column].notna(), None).tolist() for column in df.columns]
+
+def best_time(func, text, repeat):
+    times = []
+    for _ in range(repeat):
+        offers = pd.read_csv(io.StringIO(text))
+        start = time.perf_counter()
+        result = func(offers)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    print(f"{'rows':>8}{'row-wise ms':>14}{'columns ms':>12}{'speedup':>9}  output")
+    for rows in sizes:
+        text = synthetic_csv(rows)
+        repeat = 5 if rows <= 10000 else 2
+        old_time, old = best_time(row_wise_transform_offers, text, repeat)
+        new_time, new = best_time(transform_offers, text, repeat)
+        same = list(old.columns) == list(new.columns) and values(old) == values(new)
+        print(f"{rows:>8}{old_time * 1000:>14.1f}{new_time * 1000:>12.1f}{old_time / new_time:>8.0f}x  {'identical' if same else 'DIFFERENT'}")
+
+if __name__ == "__main__":
+    main()
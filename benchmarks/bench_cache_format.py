@@ -0,0 +1,42 @@
+"""
+Save and load time of cache entries in the json and npz formats.
+
+Uses the normalized offers of the largest cached demo entry, repeated to the given
+number of rows, and checks that each format round-trips the DataFrame and its dtypes.
+
+Usage:
+    python -m benchmarks.bench_cache_format [rows] [repeat]
+"""
+import os
+import sys
+import json
+import timeit
+
+import pandas as pd
+
+from src.utils import cache_formats, cache_utils
+from src.compare_offers import fill_columns
+
+def sample_offers(rows):
+    paths = [os.path.join(cache_utils.CACHE_DIR, name) for name in os.listdir(cache_utils.CACHE_DIR) if name.endswith(".json")]
+    with open(max(paths, key=os.path.getsize), encoding="utf-8") as f:
+        offers = json.load(f)["data"]
+    offers = (offers * (rows // len(offers) + 1))[:rows]
+    return fill_columns(pd.DataFrame(offers))
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    df = sample_offers(rows)
+    print(f"{rows} offers, {len(df.columns)} columns, best of 5 x {repeat} runs")
+    print(f"{'format':>8}{'bytes':>10}{'save ms':>10}{'load ms':>10}  round-trip")
+    for name, format in cache_formats.FORMATS.items():
+        value = format["dumps"](0, df)
+        save = min(timeit.repeat(lambda: format["dumps"](0, df), number=repeat, repeat=5)) / repeat
+        load = min(timeit.repeat(lambda: format["loads"](value), number=repeat, repeat=5)) / repeat
+        _, loaded = format["loads"](value)
+        exact = loaded.equals(df) and loaded.dtypes.equals(df.dtypes)
+        print(f"{name:>8}{len(value):>10}{save * 1000:>10.3f}{load * 1000:>10.3f}  {'exact' if exact else 'dtypes drift'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Cache hit ratio of the provider cache with and without address canonicalization.
+
+Replays a synthetic search log in which every address is typed with random
+spelling variants (case, "ß"/"ss", "str."/"straße", house number suffixes) and
+counts how many searches find an existing cache entry.
+
+Usage:
+    python -m benchmarks.bench_cache_keys [searches] [addresses]
+"""
+import sys
+import random
+
+from src.utils import cache_utils, for_string
+
+STREETS = ["Hauptstraße", "Bahnhofstraße", "Karl-Marx-Straße", "Schillerstraße", "Goethestraße",
+           "Gartenstraße", "Lindenstraße", "Friedrich-Ebert-Straße", "Kirchstraße", "Ringstraße"]
+CITIES = [("10115", "Berlin"), ("80331", "München"), ("50667", "Köln"), ("20095", "Hamburg"), ("04109", "Leipzig")]
+
+def street_variant(street):
+    street = random.choice([street, street.replace("ß", "ss"), street.replace("straße", "str."),
+                            street.replace("straße", "str"), street.replace("-", " ")])
+    return random.choice([street, street.lower(), street.upper()])
+
+def house_number_variant(number, suffix):
+    if not suffix:
+        return number
+    return random.choice([f"{number}{suffix}", f"{number}{suffix.upper()}", f"{number} {suffix}", f"{number} {suffix.upper()}"])
+
+def search_log(searches, addresses):
+    random.seed(42)
+    places = [(random.choice(STREETS), str(random.randint(1, 120)), random.choice(["", "", "a", "b"]), *random.choice(CITIES))
+              for _ in range(addresses)]
+    for _ in range(searches):
+        street, number, suffix, plz, city = random.choice(places)
+        yield {
+            "street": for_string.make_api_safe(street_variant(street)),
+            "house_number": for_string.make_api_safe(house_number_variant(number, suffix)),
+            "plz": for_string.make_api_safe(plz),
+            "city": for_string.make_api_safe(random.choice([city, city.lower()])),
+        }
+
+def hit_ratio(log, key_func):
+    seen = set()
+    hits = 0
+    for address in log:
+        key = key_func("ByteMe", address)
+        hits += key in seen
+        seen.add(key)
+    return hits / len(log), len(seen)
+
+def main():
+    searches = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    addresses = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    log = list(search_log(searches, addresses))
+    print(f"{searches} searches for {addresses} addresses")
+    for label, key_func in [("raw keys", cache_utils.raw_cache_key), ("canonical keys", cache_utils.cache_key)]:
+        ratio, entries = hit_ratio(log, key_func)
+        print(f"{label:>15}: hit ratio {ratio:6.1%}, {entries} cache entries")
+
+if __name__ == "__main__":
+    main()
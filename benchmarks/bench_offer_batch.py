@@ -0,0 +1,113 @@
+"""
+Memory, normalization and serialization time of offers as DataFrame, list of dicts and OfferBatch.
+
+Uses the offers of all cached demo entries, repeated to the given number of rows:
+- memory: what the memory tier holds per 1,000 offers, measured with tracemalloc
+  (the DataFrame of the previous fill_columns, the records of to_dict, the OfferBatch)
+- normalize: the previous fill_columns (object columns, two full copies) against
+  normalize_offers (one pass over OFFER_SCHEMA)
+- serialize: NDJSON of a provider batch on the previous path (fill_columns, to_dict,
+  json.dumps per offer) and on the current one (normalize_offers, offers_to_ndjson),
+  and of an already normalized entry (memory tier hit) on both paths, with orjson
+  (if installed) and with the standard library encoder
+
+Usage:
+    python -m benchmarks.bench_offer_batch [rows] [repeat]
+"""
+import os
+import sys
+import json
+import timeit
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.app import offers_to_ndjson
+from src.compare_offers import normalize_offers
+from src.utils import cache_utils, ndjson
+from src.utils.offer_batch import OFFER_COLUMNS
+
+# --- Previous implementation ---
+def fill_columns(df):
+    required_columns = [
+        "cost_first_years_eur", "promo_price_eur", "cost_eur", "after_two_years_eur",
+        "voucher_fixed_eur", "voucher_percent",
+        "installation_included", "speed_mbps", "max_age", "duration_months",
+        "tv", "limit_from_gb", "connection_type", "provider", "name"
+    ]
+    for col in required_columns:
+        if col not in df.columns:
+            df[col] = None
+    df["cost_first_years_eur"] = df["promo_price_eur"].fillna(df["cost_eur"])
+    df["after_two_years_eur"] = df["after_two_years_eur"].fillna(df["cost_eur"])
+    df["installation_included"] = df["installation_included"].fillna(False).astype("boolean")
+    df = df.where(pd.notnull(df), None)
+    df = df.replace({np.nan: None})
+    return df
+
+# --- Benchmark ---
+def sample_offers(rows):
+    offers = []
+    for name in sorted(os.listdir(cache_utils.CACHE_DIR)):
+        if name.endswith(".json") and not name.startswith("Nominatim"):
+            with open(os.path.join(cache_utils.CACHE_DIR, name), encoding="utf-8") as f:
+                data = json.load(f)["data"]
+            offers += data if isinstance(data, list) else []
+    return pd.DataFrame((offers * (rows // len(offers) + 1))[:rows])
+
+def previous_ndjson(df):
+    return "".join(json.dumps(offer) + '\n' for offer in df.to_dict(orient="records")).encode()
+
+def allocated(build):
+    """Returns the bytes still allocated by the result of build()."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return size
+
+def best(func, repeat):
+    return min(timeit.repeat(func, number=repeat, repeat=5)) / repeat
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    df = sample_offers(rows)
+    filled = fill_columns(df.copy())
+    batch = normalize_offers(df)
+
+    print(f"{rows} offers, best of 5 x {repeat} runs\n")
+    print(f"{'memory per 1,000 offers':<34}{'KiB':>8}")
+    for label, build in [
+        ("DataFrame (fill_columns)", lambda: fill_columns(df.copy())),
+        ("list of dicts (to_dict)", lambda: filled.to_dict(orient="records")),
+        ("OfferBatch", lambda: normalize_offers(df)),
+    ]:
+        print(f"{label:<34}{allocated(build) / rows * 1000 / 1024:>8.1f}")
+
+    # provider-only columns (e.g. product_id) are dropped, all others must have the same values
+    previous = [json.loads(line) for line in previous_ndjson(filled).splitlines()]
+    current = [json.loads(line) for line in offers_to_ndjson(batch).splitlines()]
+    same = all(old.get(column) == new[column] for old, new in zip(previous, current) for column in OFFER_COLUMNS)
+    print(f"\n{'normalize':<34}{'previous ms':>12}{'batch ms':>10}{'speedup':>9}")
+    old_time, new_time = best(lambda: fill_columns(df.copy()), repeat), best(lambda: normalize_offers(df), repeat)
+    print(f"{'provider batch':<34}{old_time * 1000:>12.2f}{new_time * 1000:>10.2f}{old_time / new_time:>8.1f}x")
+
+    print(f"\n{'serialize':<34}{'previous ms':>12}{'batch ms':>10}{'speedup':>9}")
+    orjson = ndjson.orjson
+    for encoder in (["orjson"] if orjson else []) + ["json"]:
+        ndjson.orjson = orjson if encoder == "orjson" else None
+        for label, old, new in [
+            ("provider batch", lambda: previous_ndjson(fill_columns(df.copy())), lambda: offers_to_ndjson(normalize_offers(df))),
+            ("normalized entry", lambda: previous_ndjson(filled), lambda: offers_to_ndjson(batch)),
+        ]:
+            old_time, new_time = best(old, repeat), best(new, repeat)
+            print(f"{f'{label} ({encoder})':<34}{old_time * 1000:>12.2f}{new_time * 1000:>10.2f}{old_time / new_time:>8.1f}x")
+    ndjson.orjson = orjson
+    print(f"\nsame values in every column of OFFER_COLUMNS: {same}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Build time, size and lookup latency of the offline autocomplete index.
+
+Builds an index from a synthetic dataset about the size of Germany (about 8000
+postal codes and 400000 street/city pairs) and times postal code and street prefix
+lookups as /autocomplete makes them while the user types.
+
+Usage:
+    python -m benchmarks.bench_prefix_index [streets] [lookups]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+from src.utils import prefix_index
+
+WORDS = ["Haupt", "Bahnhof", "Schul", "Garten", "Dorf", "Kirch", "Berg", "Wald", "Linden", "Birken",
+         "Goethe", "Schiller", "Mozart", "Rosen", "Wiesen", "Mühlen", "Feld", "Post", "Markt", "Friedhof"]
+SUFFIXES = ["straße", "weg", "platz", "allee", "gasse", "ring", "damm"]
+
+def dataset(streets):
+    random.seed(42)
+    cities = [f"Stadt {i}" for i in range(2000)]
+    plz_codes = [(f"{random.randint(1000, 99999):05d}", random.choice(cities)) for _ in range(8000)]
+    for i in range(streets):
+        plz, city = random.choice(plz_codes)
+        street = f"{random.choice(WORDS)}{random.choice(WORDS).lower()}{random.choice(SUFFIXES)}"
+        yield {"plz": plz, "city": city, "street": street}
+
+def time_lookups(lookups, queries, func):
+    start = time.perf_counter()
+    for i in range(lookups):
+        func(*queries[i % len(queries)])
+    return (time.perf_counter() - start) / lookups * 1e6
+
+def main():
+    streets = int(sys.argv[1]) if len(sys.argv) > 1 else 400000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    rows = list(dataset(streets))
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        counts = prefix_index.build_index(rows, directory)
+        build = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"{counts['plz']} postal codes, {counts['streets']} streets: built in {build:.1f}s, {size / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        index = prefix_index.open_index(directory)
+        print(f"opened in {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+        random.seed(1)
+        plz_queries = [(row["plz"][:random.randint(1, 5)], 10) for row in random.sample(rows, 1000)]
+        street_queries = [(row["street"][:random.randint(1, 8)], row["city"], 10) for row in random.sample(rows, 1000)]
+        print(f"postal code lookup: {time_lookups(lookups, plz_queries, index.plz_suggestions):6.1f} µs")
+        print(f"     street lookup: {time_lookups(lookups, street_queries, index.street_suggestions):6.1f} µs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+VerbynDich description parsing: batch extraction against the previous per-offer parser.
+
+Generates synthetic VerbynDich responses of 18 (a typical search) to 10k offers with
+descriptions in the format of the API and times both transforms up to the normalized offers:
+the previous parser built a DataFrame that was normalized into an OfferBatch afterwards, the
+batch parser builds the OfferBatch from its column arrays. Checks that both produce the same offers.
+
+Usage:
+    python -m benchmarks.bench_verbyndich_parse [offers ...]
+"""
+import re
+import sys
+import time
+import random
+
+import numpy as np
+import pandas as pd
+
+from src.providers.fetch_verbyndich import transform_offers
+from src.utils.offer_batch import OfferBatch
+
+# --- Previous implementation (one re.search per field and offer) ---
+def parse_description(desc):
+    data = {}
+    data["cost_eur"] = float(m.group(1)) if (m := re.search(r"Für nur (\d+)€ im Monat", desc)) else np.nan
+    data["connection_type"] = m.group(1).lower() if (m := re.search(r"(\w+)-Verbindung", desc)) else pd.NA
+    data["speed_mbps"] = int(m.group(1)) if (m := re.search(r"einer Geschwindigkeit von (\d+) Mbit/s", desc)) else np.nan
+    data["tv"] = m.group(1) if (m := re.search(r"folgende Fernsehsender enthalten (\w+)\.", desc)) else pd.NA
+    data["duration_months"] = int(m.group(1)) if (m := re.search(r"Mindestvertragslaufzeit (\d+) Monate", desc)) else np.nan
+    data["max_age"] = int(m.group(1)) if (m := re.search(r"nur für Personen unter (\d+) Jahren", desc)) else np.nan
+    data["limit_from_gb"] = int(m.group(1)) if (m := re.search(r"Ab (\d+)GB pro Monat wird die Geschwindigkeit gedrosselt", desc)) else np.nan
+    data["voucher_fixed_eur"] = float(m.group(1)) if (m := re.search(r"Rabatt beträgt (\d+)€", desc)) else np.nan
+    data["promo_duration_months"] = int(m.group(1)) if  (m := re.search(r"monatliche Rechnung bis zum (\d+)\. Monat", desc)) else np.nan
+    discount = re.search(r"einen Rabatt von (\d+)%", desc)
+    if discount:
+        data["voucher_percent"] = int(discount.group(1))
+        if data["cost_eur"] * data["voucher_percent"] /100 * data["promo_duration_months"] < data["voucher_fixed_eur"]:
+            data["promo_price_eur"] = data["cost_eur"] - data["cost_eur"] * data["voucher_percent"] / 100
+        else:
+            data["promo_price_eur"] = data["cost_eur"] - data["voucher_fixed_eur"] / data["promo_duration_months"]
+    data["after_two_years_eur"] = float(m.group(1)) if (m := re.search(r"Monat beträgt der monatliche Preis (\d+)€", desc)) else np.nan
+    return data
+
+def per_offer_transform_offers(all_offers, provider="VerbynDich"):
+    offers_list = []
+    for offer in all_offers:
+        if not offer.get("valid", False):
+            continue
+        offers_list.append({"provider": provider, "name": offer["product"], **parse_description(offer["description"])})
+    return pd.DataFrame(offers_list)
+
+def per_offer_batch(all_offers):
+    # the DataFrame of the previous parser was normalized before it was streamed
+    return OfferBatch.from_frame(per_offer_transform_offers(all_offers))
+
+# --- Benchmark ---
+def describe(offer):
+    """Writes the description of an offer (dict with the columns of transform_offers) like the API does."""
+    parts = [
+        f"Für nur {offer['cost_eur']:.0f}€ im Monat erhalten Sie eine {offer['connection_type'].upper()}-Verbindung "
+        f"mit einer Geschwindigkeit von {offer['speed_mbps']} Mbit/s.",
+        f"Bitte beachten Sie, dass die Mindestvertragslaufzeit {offer['duration_months']} Monate beträgt.",
+    ]
+    optional = [
+        ("tv", "Zusätzlich sind folgende Fernsehsender enthalten {}."),
+        ("max_age", "Dieses Angebot ist nur für Personen unter {:.0f} Jahren verfügbar."),
+        ("limit_from_gb", "Ab {:.0f}GB pro Monat wird die Geschwindigkeit gedrosselt."),
+        ("voucher_percent", "Mit diesem Angebot erhalten Sie einen Rabatt von {:.0f}%"),
+        ("promo_duration_months", "auf Ihre monatliche Rechnung bis zum {:.0f}. Monat."),
+        ("voucher_fixed_eur", "Der maximale Rabatt beträgt {:.0f}€."),
+        ("after_two_years_eur", "Ab dem 24. Monat beträgt der monatliche Preis {:.0f}€."),
+    ]
+    parts += [text.format(offer[column]) for column, text in optional if pd.notna(offer.get(column))]
+    return " ".join(parts)
+
+def synthetic_offers(count):
+    random.seed(count)
+    offers = []
+    for i in range(count):
+        discount = random.random() < 0.5
+        offer = {
+            "cost_eur": random.randint(20, 90), "connection_type": random.choice(["dsl", "cable", "fiber"]),
+            "speed_mbps": random.choice([25, 50, 100, 250, 500, 1000]), "duration_months": random.choice([12, 24]),
+            "tv": random.choice(["RobynTV", None]), "max_age": random.choice([27, None, None]),
+            "limit_from_gb": random.choice([250, None]),
+            "voucher_percent": random.randint(5, 20) if discount else None,
+            "promo_duration_months": random.choice([6, 12, 24]) if discount else None,
+            "voucher_fixed_eur": random.randint(50, 200) if discount else None,
+            "after_two_years_eur": random.choice([random.randint(20, 90), None]),
+        }
+        offers.append({"product": f"VerbynDich {i}", "description": describe(offer), "valid": random.random() < 0.95, "last": False})
+    return offers
+
+def best_time(func, offers, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(offers)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [18, 100, 1000, 10000]
+    print(f"{'offers':>8}{'per offer ms':>14}{'batch ms':>10}{'speedup':>9}  output")
+    for count in sizes:
+        offers = synthetic_offers(count)
+        repeat = 20 if count <= 100 else 5 if count <= 1000 else 2
+        old_time, old = best_time(per_offer_batch, offers, repeat)
+        new_time, new = best_time(transform_offers, offers, repeat)
+        same = old.records() == new.records()
+        print(f"{count:>8}{old_time * 1000:>14.1f}{new_time * 1000:>10.1f}{old_time / new_time:>8.1f}x  {'identical' if same else 'DIFFERENT'}")
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,37 @@
 from flask import Flask, request, jsonify, render_template, Response, stream_with_context, url_for, abort, render_template, session
-import json
-import asyncio
+import queue
+import logging
 from uuid import uuid4
 
 from dotenv import load_dotenv
 import os
 load_dotenv()
 
-from src.utils import autocomplete, cache_utils, for_string, snapshot, validation, data_access_utils
+from src.utils import autocomplete, cache_utils, for_string, ndjson, snapshot, validation, data_access_utils, http_client
 # from cache_utils import get_provider_data
-from src.compare_offers import fill_columns
+from src.compare_offers import normalize_offers
 from src.providers.registry import PROVIDER_FETCHERS
 
 app = Flask(__name__)
 app.secret_key = os.getenv("APP_SECRET_KEY")
 
+# Optionally open the connections to all providers at startup (DNS + TLS)
+if for_string.str2bool(os.getenv("HTTP_WARMUP", "false")):
+    http_client.submit(http_client.warm_up([fetcher.base_url for fetcher in PROVIDER_FETCHERS.values()]))
+
+# Version of the NDJSON kept in the cache, bump it when normalize_offers or offers_to_ndjson change their output
+NDJSON_VERSION = 3
+
+def offers_to_ndjson(batch):
+    """
+    Converts a batch of offers to NDJSON, one JSON object per line.
+    Args:
+        batch (OfferBatch): Normalized offers (see normalize_offers).
+    Returns:
+        bytes: The offers as NDJSON, sent as one chunk.
+    """
+    return ndjson.dumps_offers(batch)
+
 """Endpoint to get internet offers based on address"""
 @app.route("/offers")
 def get_offers():
@@ -47,46 +64,42 @@ def get_offers():
         "city": city
     }
 
-    async def generate_async():
-        """Asynchronous generator to fetch and yield offers."""
-        # Create a new event loop for the async generator
-        loop = asyncio.get_event_loop()
-        # Fetch offers from all providers asynchronously
-        # Use the PROVIDER_FETCHERS dictionary to get the fetcher functions
-        tasks = [
-            loop.run_in_executor(
-                None,
-                lambda fetcher=fetcher: cache_utils.get_provider_data(
-                    name, address, lambda address=address: data_access_utils.safe_get_offers(fetcher.get_offers, address, name)
-                )
-            )
-            for name, fetcher in PROVIDER_FETCHERS.items()
-        ]
-        # for each provider, create a task to fetch offers
-        for coro in asyncio.as_completed(tasks):
-            df = await coro
-            # --- Handle missing values for this provider ---
-            df = fill_columns(df)
-            # --- Convert DataFrame to JSON and yield each offer ---
-            for offer in df.to_dict(orient="records"):
-                yield json.dumps(offer) + '\n'
-
     def generate():
         """Generator to stream offers as NDJSON."""
-        # Create a new event loop for the async generator
-        loop = asyncio.new_event_loop()
-        # Set the new loop as the current event loop
-        asyncio.set_event_loop(loop)
-        # Create an async generator
-        agen = generate_async()
-        # Use the event loop to run the async generator and yield chunks
-        # until StopAsyncIteration is raised
-        try:
-            while True:
-                chunk = loop.run_until_complete(agen.__anext__())
-                yield chunk
-        except StopAsyncIteration:
-            pass
+        # Batches of offers are passed from the event loop to this generator through a queue,
+        # None marks that a provider is done
+        batches = queue.Queue()
+
+        async def stream_provider(name, fetcher):
+            """Puts the NDJSON of every batch of offers of one provider into the queue."""
+            try:
+                # --- Handle missing values, normalize_offers is applied once per batch before caching ---
+                async for chunk in cache_utils.iter_provider_ndjson_async(
+                    name, address,
+                    lambda address: data_access_utils.safe_iter_offers_async(fetcher.iter_offers_async, address, name),
+                    normalize=normalize_offers,
+                    serialize=offers_to_ndjson,
+                    version=NDJSON_VERSION
+                ):
+                    batches.put(chunk)
+            except Exception as e:
+                logging.error(f"[{name}] Streaming offers failed: {e}")
+            finally:
+                batches.put(None)
+
+        # Schedule one stream per provider on the shared event loop
+        # Use the PROVIDER_FETCHERS dictionary to get the fetchers
+        for name, fetcher in PROVIDER_FETCHERS.items():
+            http_client.submit(stream_provider(name, fetcher))
+
+        # yield the offers of each batch as soon as it is ready
+        remaining = len(PROVIDER_FETCHERS)
+        while remaining:
+            chunk = batches.get()
+            if chunk is None:
+                remaining -= 1
+                continue
+            yield chunk
 
     # --- Stream the offers as NDJSON ---
     return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
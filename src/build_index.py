@@ -0,0 +1,32 @@
+import csv
+import sys
+import time
+import argparse
+
+from src.utils import prefix_index
+
+# --- Build the Offline Autocomplete Index ---
+# Usage: python -m src.build_index addresses.csv [--output src/index]
+# The CSV file needs a header row with the columns plz, city and (optionally) street,
+# e.g. an export of OpenStreetMap addresses. Set AUTOCOMPLETE_INDEX to the output directory to use it.
+
+DEFAULT_OUTPUT = "src/index"
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the offline postal code and street index for /autocomplete.")
+    parser.add_argument("path", help="CSV file with a header row and the columns plz, city and street")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"directory of the index (default {DEFAULT_OUTPUT})")
+    args = parser.parse_args(argv)
+
+    start = time.monotonic()
+    counts = prefix_index.build_index(read_rows(args.path), args.output)
+    print(f"Built index in {args.output} in {time.monotonic() - start:.1f}s: "
+          f"{counts[prefix_index.PLZ_TABLE]} postal codes, {counts[prefix_index.STREET_TABLE]} streets")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
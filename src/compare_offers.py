@@ -1,19 +1,13 @@
 import asyncio
 
-import nest_asyncio
-nest_asyncio.apply()
-
 import pandas as pd
 pd.set_option('future.no_silent_downcasting', True)
-import numpy as np
 
-from src.utils.data_access_utils import safe_get_offers
+from src.utils import http_client
+from src.utils.offer_batch import OfferBatch
+from src.utils.data_access_utils import safe_get_offers_async
 
-from src.providers.fetch_byteme import ByteMeFetcher
-from src.providers.fetch_pingperfect import PingPerfectFetcher
-from src.providers.fetch_servusspeed import ServusSpeedFetcher
-from src.providers.fetch_verbyndich import VerbynDichFetcher
-from src.providers.fetch_webwunder import WebWunderFetcher
+from src.providers.registry import PROVIDER_FETCHERS
 
 async def fetch_offers(address):
     """
@@ -21,52 +15,44 @@ async def fetch_offers(address):
     Args:
         address (dict): Address to fetch offers for.
     Returns:
-        list: List of DataFrames with offers from different providers.
+        list: List of OfferBatches with offers from different providers
+            (empty DataFrames for providers that failed).
     """
-    loop = asyncio.get_event_loop()
     tasks = [
-        loop.run_in_executor(None, safe_get_offers, PingPerfectFetcher().get_offers, address, "Ping Perfect"),
-        loop.run_in_executor(None, safe_get_offers, ServusSpeedFetcher.get_offers, address, "Servus Speed"),
-        loop.run_in_executor(None, safe_get_offers, VerbynDichFetcher.get_offers, address, "VerbynDich"),
-        loop.run_in_executor(None, safe_get_offers, WebWunderFetcher.get_offers, address, "WebWunder"),
-        loop.run_in_executor(None, safe_get_offers, ByteMeFetcher.get_offers, address, "ByteMe"),
+        safe_get_offers_async(fetcher.get_offers_async, address, name)
+        for name, fetcher in PROVIDER_FETCHERS.items()
     ]
     return await asyncio.gather(*tasks)
 
+def normalize_offers(df):
+    """
+    Brings the offers of a provider into the columns and types of OFFER_SCHEMA in one pass,
+    with the derived columns (e.g. cost_first_years_eur) and defaults filled in.
+    Missing values stay missing, they are written as null when the offers are serialized.
+    Args:
+        df (OfferBatch | pd.DataFrame): Offers of a provider, batches are already normalized.
+    Returns:
+        OfferBatch: The normalized offers.
+    """
+    if isinstance(df, OfferBatch):
+        return df
+    return OfferBatch.from_frame(df)
+
 def fill_columns(df):
     """
-    Fill missing columns in the DataFrame with None or default values.
+    Same as normalize_offers, as a DataFrame for filtering and sorting.
     Args:
         df (pd.DataFrame): DataFrame with offers.
     Returns:
-        pd.DataFrame: DataFrame with filled columns.
+        pd.DataFrame: DataFrame with the columns of OFFER_SCHEMA, nullable dtypes
+            (Float64, Int64, boolean) and pd.NA or None for missing values.
     """
-    required_columns = [
-        "cost_first_years_eur", "promo_price_eur", "cost_eur", "after_two_years_eur",
-        "voucher_fixed_eur", "voucher_percent",
-        "installation_included", "speed_mbps", "max_age", "duration_months",
-        "tv", "limit_from_gb", "connection_type", "provider", "name"
-    ]
-    # Ensure all required columns are present
-    for col in required_columns:
-        if col not in df.columns:
-            df[col] = None
-
-    # if no promo price is given, use cost_eur
-    df["cost_first_years_eur"] = df["promo_price_eur"].fillna(df["cost_eur"])
-    # if the price does not change after two years, use cost_eur
-    df["after_two_years_eur"] = df["after_two_years_eur"].fillna(df["cost_eur"])
-    # if no information about the installation is given, assume it is not included
-    df["installation_included"] = df["installation_included"].fillna(False).astype("boolean")
-    # convert np.nan and pd.NA to None
-    df = df.where(pd.notnull(df), None)
-    df = df.replace({np.nan: None})
-    return df
+    return normalize_offers(df).to_frame()
 
 def aggregate_offers(address):
-    dfs = asyncio.run(fetch_offers(address))
-    all_offers = pd.concat(dfs, ignore_index=True)
-    return fill_columns(all_offers)
+    # Run on the shared loop, the provider session is bound to it
+    batches = [normalize_offers(offers) for offers in http_client.run(fetch_offers(address))]
+    return OfferBatch.concat(batches).to_frame()
 
 """Filtering and sorting functions for offers DataFrame. (not used in the main script, but can be used for further processing)"""
 
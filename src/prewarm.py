@@ -0,0 +1,161 @@
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import threading
+import concurrent.futures
+from urllib.parse import unquote_plus
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from src.utils import cache_utils, data_access_utils, for_string, http_client
+from src.compare_offers import normalize_offers
+from src.providers.registry import PROVIDER_FETCHERS
+
+# --- Bulk Cache Pre-Warming ---
+# Fills the provider cache for a list of known addresses, so searches for them are served from the cache.
+# Usage: python -m src.prewarm addresses.csv [--concurrency 8] [--per-provider 2]
+
+ADDRESS_FIELDS = ["street", "house_number", "plz", "city"]
+
+def read_addresses(path):
+    """
+    Reads addresses from a CSV file with a header row or from a JSONL file (one JSON object per line).
+    Args:
+        path (str): Path of the file, read as JSONL if it ends with .jsonl or .json, else as CSV.
+    Returns:
+        list: Addresses (dicts with street, house_number, plz and city), encoded like in /offers.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".json")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    addresses = []
+    for i, row in enumerate(rows, start=1):
+        if not all(str(row.get(field) or "").strip() for field in ADDRESS_FIELDS):
+            print(f"Skipping row {i}: all address fields (street, house_number, plz, city) are required.")
+            continue
+        addresses.append({field: for_string.make_api_safe(str(row[field]).strip()) for field in ADDRESS_FIELDS})
+    return addresses
+
+def load_done(state_path):
+    """Returns the cache keys of the jobs finished by earlier runs."""
+    if not os.path.exists(state_path):
+        return set()
+    with open(state_path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+class Stats:
+    """Results and busy time of one provider."""
+    def __init__(self):
+        self.ok = 0
+        self.cached = 0
+        self.empty = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+def prewarm(addresses, concurrency=8, per_provider=2, state_path=None, fetchers=None):
+    """
+    Fetches and caches the offers of every provider for every address.
+    Jobs finished in an earlier run (listed in state_path) are skipped. Jobs that fail or
+    return no offers are not cached and not marked as done, so the next run retries them.
+    Args:
+        addresses (list): Addresses as returned by read_addresses.
+        concurrency (int): Maximum number of jobs running at the same time.
+        per_provider (int): Maximum number of jobs per provider running at the same time.
+        state_path (str): File that records finished jobs, no resume if None.
+        fetchers (dict): Provider fetchers by name (default PROVIDER_FETCHERS).
+    Returns:
+        dict: Stats by provider name.
+    """
+    fetchers = fetchers or PROVIDER_FETCHERS
+    done = load_done(state_path) if state_path else set()
+    jobs = [
+        (name, address)
+        for address in addresses
+        for name in fetchers
+        if cache_utils.cache_key(name, address) not in done
+    ]
+    skipped = len(addresses) * len(fetchers) - len(jobs)
+    print(f"{len(jobs)} jobs for {len(addresses)} addresses and {len(fetchers)} providers, {skipped} already done.")
+
+    limits = {name: threading.BoundedSemaphore(per_provider) for name in fetchers}
+    stats = {name: Stats() for name in fetchers}
+    lock = threading.Lock()
+    state = open(state_path, "a", encoding="utf-8") if state_path else None
+    finished = 0
+
+    def fetch(name, address):
+        fetcher = fetchers[name]
+        # exhausted retries and an open circuit are failures, not providers without offers
+        return http_client.run(data_access_utils.safe_get_offers_async(fetcher.get_offers_async, address, name, raise_errors=True))
+
+    def run_job(name, address):
+        nonlocal finished
+        with limits[name]:
+            start = time.monotonic()
+            try:
+                if cache_utils.load_from_cache(name, address) is not None:
+                    status = "cached"
+                else:
+                    data = cache_utils.get_provider_data(name, address, lambda address: fetch(name, address), normalize=normalize_offers)
+                    status = "ok" if not data.empty else "empty"
+            except Exception as e:
+                print(f"[{name}] Pre-warming failed: {e}")
+                status = "failed"
+            elapsed = time.monotonic() - start
+        with lock:
+            provider_stats = stats[name]
+            setattr(provider_stats, status, getattr(provider_stats, status) + 1)
+            provider_stats.seconds += elapsed
+            finished += 1
+            if state and status in ("ok", "cached"):
+                state.write(cache_utils.cache_key(name, address) + "\n")
+                state.flush()
+            street, house_number, plz, city = (unquote_plus(address[field]) for field in ADDRESS_FIELDS)
+            print(f"[{finished}/{len(jobs)}] {name}: {street} {house_number}, {plz} {city} {status} ({elapsed:.1f}s)")
+
+    start = time.monotonic()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(run_job, name, address) for name, address in jobs]:
+                future.result()
+    finally:
+        if state:
+            state.close()
+    print_report(stats, time.monotonic() - start)
+    return stats
+
+def print_report(stats, elapsed):
+    print(f"\nFinished in {elapsed:.1f}s")
+    print(f"{'Provider':<15}{'ok':>6}{'cached':>8}{'empty':>7}{'failed':>8}{'jobs/s':>9}")
+    for name, s in stats.items():
+        fetched = s.ok + s.empty + s.failed
+        # jobs per second of busy time, i.e. the throughput of one concurrent slot
+        throughput = fetched / s.seconds if s.seconds else 0.0
+        print(f"{name:<15}{s.ok:>6}{s.cached:>8}{s.empty:>7}{s.failed:>8}{throughput:>9.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-warm the provider cache for a list of addresses.")
+    parser.add_argument("path", help="CSV (with a header row) or JSONL file with street, house_number, plz and city")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum number of jobs at the same time (default 8)")
+    parser.add_argument("--per-provider", type=int, default=2, help="maximum number of jobs per provider (default 2)")
+    parser.add_argument("--providers", nargs="+", choices=list(PROVIDER_FETCHERS), help="only pre-warm these providers")
+    parser.add_argument("--state", help="file recording finished jobs for resuming (default: <path>.done)")
+    parser.add_argument("--restart", action="store_true", help="ignore the jobs finished by earlier runs")
+    args = parser.parse_args(argv)
+
+    state_path = args.state or f"{args.path}.done"
+    if args.restart and os.path.exists(state_path):
+        os.remove(state_path)
+    fetchers = {name: PROVIDER_FETCHERS[name] for name in args.providers} if args.providers else None
+    stats = prewarm(read_addresses(args.path), args.concurrency, args.per_provider, state_path, fetchers)
+    # non-zero exit status if any job failed, so scheduled runs can alert
+    return 1 if any(s.failed for s in stats.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,21 @@
+from src.utils import http_client
+
 class ProviderFetcher:
+    # Url of the provider API, used to pick the connection pool and for warm-up
+    base_url = None
+
+    async def get_offers_async(self, address):
+        """Fetch offers for the given address on the shared event loop. Should return an OfferBatch."""
+        raise NotImplementedError
+
+    async def iter_offers_async(self, address):
+        """
+        Fetch offers for the given address and yield them in batches (OfferBatch) as they arrive.
+        Providers that receive their offers one by one should override it, by default
+        all offers are yielded at once.
+        """
+        yield await self.get_offers_async(address)
+
     def get_offers(self, address):
-        """Fetch offers for the given address. Should return a pandas.DataFrame."""
-        raise NotImplementedError
\ No newline at end of file
+        """Fetch offers for the given address. Should return an OfferBatch."""
+        return http_client.run(self.get_offers_async(address))
\ No newline at end of file
@@ -1,10 +1,13 @@
-import requests
 import io
 import os
+import asyncio
+import aiohttp
 import pandas as pd
 import numpy as np
 
 from .base import ProviderFetcher
+from src.utils import http_client
+from src.utils.offer_batch import OfferBatch
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -14,10 +17,11 @@ headers = {"X-Api-Key": API_KEY}
 
 BASE_URL = "https://byteme.gendev7.check24.fun/app/api/products/data"
 
-def fetch_offers(address):
+async def fetch_offers(session, address):
     """
     Contacts ByteMe API and retrieves offers for the given address, drops duplicates
     Args:
+        session (aiohttp.ClientSession): The shared aiohttp session.
         address (dict): {
                         "street":      street (str),
                         "houseNumber": house_number (str),
@@ -29,38 +33,26 @@ def fetch_offers(address):
         productId, providerName, speed, monthlyCostInCent,
         afterTwoYearsMonthlyCost, durationInMonths, connectionType,
         installationService, tv, limitFrom, maxAge, voucherType, voucherValue
+        Timeouts and API errors are raised, so retries and the circuit breaker see them.
     """
     print("Fetching offers from ByteMe API...")
     try:
-        response = requests.get(BASE_URL, params=address, headers=headers, timeout=10)
-        response.raise_for_status()
-        offers = pd.read_csv(io.StringIO(response.text))
-        offers.drop_duplicates(inplace=True)
-        return offers
-    except requests.Timeout:
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with session.get(BASE_URL, params=address, headers=headers, timeout=timeout) as response:
+            response.raise_for_status()
+            text = await response.text()
+    except asyncio.TimeoutError:
         print("ByteMe API request timed out.")
-        return pd.DataFrame()  # Return empty DataFrame on timeout
-    except Exception as e:
-        print(f"ByteMe API error: {e}")
+        raise
+    if not text.strip():
         return pd.DataFrame()
+    offers = pd.read_csv(io.StringIO(text))
+    offers.drop_duplicates(inplace=True)
+    return offers
 
-# The following functions return the value of the column if it is not NaN, otherwise return np.nan
-def get_max_age(row):
-    if pd.isna(row['maxAge']):
-        return np.nan
-    return int(row['maxAge'])
-def get_voucher_value(row):
-    if pd.isna(row['voucherValue']):
-        return np.nan
-    return int(row['voucherValue'])
-def get_limit(row):
-    if pd.isna(row['limitFrom']):
-        return np.nan
-    return int(row['limitFrom'])
-def get_tv(row):
-    if pd.isna(row['tv']):
-        return pd.NA
-    return row['tv']
+def to_int(values):
+    """Truncates the numbers to integers like int() does, missing values stay missing (Int64)."""
+    return np.trunc(pd.to_numeric(values)).astype("Int64")
 
 def transform_offers(offers):
     """
@@ -76,6 +68,8 @@ def transform_offers(offers):
         duration_months, after_two_years_eur, connection_type,
         installation_included, tv, max_age, voucher_fixed_eur,
         voucher_percent, unlimited, limit_from_gb
+        Missing values use nullable dtypes: max_age, voucher_percent and limit_from_gb are Int64,
+        voucher_fixed_eur and promo_price_eur are Float64, installation_included is boolean.
     """
     offers['provider'] = 'ByteMe'
     offers['name'] = offers['providerName']
@@ -84,25 +78,23 @@ def transform_offers(offers):
     offers['duration_months'] = offers['durationInMonths'].astype(int)
     offers['after_two_years_eur'] = offers['afterTwoYearsMonthlyCost'].astype(float) / 100
     offers['connection_type'] = offers['connectionType'].str.lower()
-    offers['installation_included'] = offers['installationService'] == 'true'
-    offers['tv'] = offers.apply(get_tv, axis=1)
-    offers['max_age'] = offers.apply(get_max_age, axis=1)
-    
-    # Applies mask to the column 'voucherType'
-    # If the type is 'percentage', it applies the function get_voucher_value to the column 'voucher_percentage'
-    # promo_price_eur is calculated as cost_eur - (cost_eur * voucher_percent / 100)
-    mask = offers['voucherType'] == 'percentage'
-    offers.loc[mask, 'voucher_percent'] = offers.loc[mask].apply(get_voucher_value, axis=1)
-    offers.loc[mask, 'voucher_fixed_eur'] = np.nan
-    offers.loc[mask, 'promo_price_eur'] = offers.loc[mask, 'cost_eur'] - (offers.loc[mask, 'cost_eur'] * offers.loc[mask, 'voucher_percent'] / 100)
+    offers['installation_included'] = (offers['installationService'] == 'true').astype("boolean")
+    offers['tv'] = offers['tv'].astype(object).where(offers['tv'].notna(), pd.NA)
+    offers['max_age'] = to_int(offers['maxAge'])
 
-    # If the type is not 'percentage', it applies the function get_voucher_value to the column 'voucher_fixed_eur'
+    # If the voucherType is 'percentage', voucherValue is the voucher_percent and
+    # promo_price_eur is calculated as cost_eur - (cost_eur * voucher_percent / 100)
+    # Otherwise voucherValue is the voucher_fixed_eur in cent and
     # promo_price_eur is calculated as cost_eur - (voucher_fixed_eur / 24), where 24 is the number of months
-    offers.loc[~mask, 'voucher_fixed_eur'] = offers.loc[~mask].apply(get_voucher_value, axis=1) / 100
-    offers.loc[~mask, 'voucher_percent'] = np.nan
-    offers.loc[~mask, 'promo_price_eur'] = offers.loc[~mask, 'cost_eur'] - (offers.loc[~mask, 'voucher_fixed_eur']) / 24
+    percentage = offers['voucherType'] == 'percentage'
+    voucher = to_int(offers['voucherValue'])
+    offers['voucher_percent'] = voucher.where(percentage)
+    offers['voucher_fixed_eur'] = (voucher / 100).where(~percentage)
+    offers['promo_price_eur'] = (offers['cost_eur'] - offers['cost_eur'] * offers['voucher_percent'] / 100).where(
+        percentage, offers['cost_eur'] - offers['voucher_fixed_eur'] / 24
+    )
 
-    offers['limit_from_gb'] = offers.apply(get_limit, axis=1).astype(int)
+    offers['limit_from_gb'] = to_int(offers['limitFrom'])
 
     order = [
         'provider', 'name', 'speed_mbps', 'cost_eur', 'promo_price_eur', 'duration_months',
@@ -112,9 +104,13 @@ def transform_offers(offers):
     return offers[order]
 
 class ByteMeFetcher(ProviderFetcher):
-    def get_offers(self, address_input):
+    base_url = BASE_URL
+
+    async def get_offers_async(self, address_input):
         """
-        Fetches offers and creates a pandas.DataFrame with the offers in standardized format
+        Fetches offers and creates an OfferBatch with the offers in standardized format.
+        The CSV is parsed and transformed column by column with pandas, the batch takes
+        the resulting columns as they are.
         Args: 
             address_input = {
                     "street": str,
@@ -123,7 +119,7 @@ class ByteMeFetcher(ProviderFetcher):
                     "city": str
                     } 
         Return:
-            pandas.DataFrame: A DataFrame with the offers
+            OfferBatch: The offers
         """
         address = {
                 "street": address_input["street"],
@@ -131,11 +127,13 @@ class ByteMeFetcher(ProviderFetcher):
                 "city": address_input["city"],
                 "plz": address_input["plz"]
             }
-        offers = fetch_offers(address)
-        parsed_offers = transform_offers(offers)
-        df = pd.DataFrame(parsed_offers)
-        print(f"Fetched {len(df)} offers from ByteMe API")
-        return df
+        session = await http_client.get_session(self.base_url)
+        offers = await fetch_offers(session, address)
+        if offers.empty:
+            return OfferBatch.from_records([])
+        batch = OfferBatch.from_frame(transform_offers(offers))
+        print(f"Fetched {len(batch)} offers from ByteMe API")
+        return batch
 
 if __name__ == "__main__":
     address = {
@@ -144,7 +142,7 @@ if __name__ == "__main__":
             "plz": "10115",
             "city": "Berlin"
             }
-    df = ByteMeFetcher().get_offers(address)
+    df = ByteMeFetcher().get_offers(address).to_frame()
     pd.set_option('display.max_columns', None)
     print(df.head(20)) 
 
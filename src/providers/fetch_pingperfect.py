@@ -2,12 +2,15 @@ import os
 import time
 import hmac
 import hashlib
-import requests
+import asyncio
+import aiohttp
 import json
 import pandas as pd
 import numpy as np
 
 from .base import ProviderFetcher
+from src.utils import http_client
+from src.utils.offer_batch import OfferBatch
 
 from dotenv import load_dotenv
 load_dotenv() 
@@ -16,6 +19,9 @@ CLIENT_ID = os.getenv("PINGPERFECT_CLIENT_ID")
 SIGNATURE_SECRET = os.getenv("PINGPERFECT_SIGNATURE_SECRET")
 
 BASE_URL = "https://pingperfect.gendev7.check24.fun/internet/angebote/data"
+# Max age of a signature in seconds, older requests are signed again before a retry
+SIGNATURE_MAX_AGE = int(os.getenv("PINGPERFECT_SIGNATURE_MAX_AGE", "60"))
+REQUEST_RETRIES = 1
 
 def sign_payload(json_body, timestamp, secret):
     """
@@ -35,12 +41,14 @@ def sign_payload(json_body, timestamp, secret):
     )
     return hm.hexdigest()
 
-def fetch_offers(address, wants_fiber):
+def build_request(address, wants_fiber):
     """
-    Fetch offers from the Ping Perfect API for a given address.
+    Serialize the payload once and sign it.
     Args:
         address (dict): keys: "street", "plz", "house_number", "city".
         wants_fiber (bool): Whether to fetch fiber offers or not.
+    Returns:
+        dict: "json_body" (str), "timestamp" (int) and "headers" (dict) of the request.
     """
     payload = {
         "street": address["street"],
@@ -49,29 +57,54 @@ def fetch_offers(address, wants_fiber):
         "city": address["city"],
         "wantsFiber": wants_fiber
     }
-    # Concatenate the timestamp and the request body string with : as a separator.
     json_body = json.dumps(payload, separators=(",", ":"))
-    timestamp = int(time.time())
-    signature = sign_payload(json_body, timestamp, SIGNATURE_SECRET)
+    request = {"json_body": json_body}
+    sign_request(request)
+    return request
 
-    headers = {
+def sign_request(request):
+    """
+    (Re-)sign a request built by build_request with the current timestamp.
+    """
+    # Concatenate the timestamp and the request body string with : as a separator.
+    timestamp = int(time.time())
+    signature = sign_payload(request["json_body"], timestamp, SIGNATURE_SECRET)
+    request["timestamp"] = timestamp
+    request["headers"] = {
         "X-Client-Id": CLIENT_ID,
         "X-Timestamp": str(timestamp),
         "X-Signature": signature,
         "Content-Type": "application/json"
     }
+
+async def fetch_offers(session, request):
+    """
+    Fetch offers from the Ping Perfect API for a signed request.
+    The request is retried on timeouts and connection errors, it is signed again
+    before a retry if its timestamp is older than SIGNATURE_MAX_AGE. The last error
+    is raised, so retries and the circuit breaker of the provider see it.
+    Args:
+        session (aiohttp.ClientSession): The shared aiohttp session.
+        request (dict): signed request, see build_request.
+    """
     print("Fetching offers from Ping Perfect API...")
-    try:
-        response = requests.post(BASE_URL, headers=headers, data=json_body, timeout=10)
-        response.raise_for_status()
-        results = response.json()
-        return results
-    except requests.Timeout:
-        print("Ping Perfect API request timed out.")
-        return []
-    except Exception as e:
-        print(f"Ping Perfect API error: {e}")
-        return []
+    for _ in range(REQUEST_RETRIES + 1):
+        if time.time() - request["timestamp"] > SIGNATURE_MAX_AGE:
+            sign_request(request)
+        try:
+            timeout = aiohttp.ClientTimeout(total=10)
+            async with session.post(BASE_URL, headers=request["headers"], data=request["json_body"], timeout=timeout) as response:
+                response.raise_for_status()
+                results = await response.json()
+            return results
+        # timeouts and connection errors are retried
+        except asyncio.TimeoutError as e:
+            print("Ping Perfect API request timed out.")
+            error = e
+        except aiohttp.ClientConnectionError as e:
+            print(f"Ping Perfect API error: {e}")
+            error = e
+    raise error
 
 def transform_offer(offer):
     """
@@ -110,7 +143,9 @@ def transform_offer(offer):
     }
 
 class PingPerfectFetcher(ProviderFetcher):
-    def get_offers(self, address):
+    base_url = BASE_URL
+
+    async def get_offers_async(self, address):
         """
         Fetch and transform offers for a given address.
         Args:
@@ -121,11 +156,20 @@ class PingPerfectFetcher(ProviderFetcher):
                 "city": str
             }
         Returns:
-            pd.DataFrame
+            OfferBatch
         """
-        # fetch fiber and non-fiber offers separately
-        fiber_offers = fetch_offers(address, True)
-        non_fiber_offers = fetch_offers(address, False)
+        # build and sign both requests up front, then fetch fiber and non-fiber offers concurrently
+        session = await http_client.get_session(self.base_url)
+        requests = [build_request(address, True), build_request(address, False)]
+        results = await asyncio.gather(
+            *[fetch_offers(session, request) for request in requests], return_exceptions=True
+        )
+        # a single failed request leaves out its offers, if both fail the provider is down
+        if all(isinstance(result, BaseException) for result in results):
+            raise results[0]
+        fiber_offers, non_fiber_offers = (
+            [] if isinstance(result, BaseException) else result for result in results
+        )
         # create one list of offers
         offers = fiber_offers + non_fiber_offers
 
@@ -134,9 +178,9 @@ class PingPerfectFetcher(ProviderFetcher):
             normalized = transform_offer(offer)
             normalized_offers.append(normalized)
 
-        df = pd.DataFrame(normalized_offers)
-        print(f"Fetched {len(df)} offers from Ping Perfect API.")
-        return df
+        batch = OfferBatch.from_records(normalized_offers)
+        print(f"Fetched {len(batch)} offers from Ping Perfect API.")
+        return batch
 
 if __name__ == "__main__":
     address = {
@@ -145,6 +189,6 @@ if __name__ == "__main__":
             "plz": "10115",
             "city": "Berlin"
             }
-    df = PingPerfectFetcher().get_offers(address)
+    df = PingPerfectFetcher().get_offers(address).to_frame()
     pd.set_option('display.max_columns', None)
     print(df.head(15))
\ No newline at end of file
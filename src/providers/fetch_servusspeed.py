@@ -1,5 +1,4 @@
-import os, requests
-from requests.auth import HTTPBasicAuth
+import os
 from aiohttp import BasicAuth
 import asyncio
 import aiohttp
@@ -7,6 +6,9 @@ import pandas as pd
 import numpy as np
 
 from .base import ProviderFetcher
+from src.utils import http_client, cache_utils, memory_cache
+from src.utils.adaptive_limiter import AdaptiveLimiter
+from src.utils.offer_batch import OfferBatch
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -15,12 +17,33 @@ USER = os.getenv("SERVUSSPEED_USERNAME")
 PASS = os.getenv("SERVUSSPEED_PASSWORD")
 
 BASE_URL = "https://servus-speed.gendev7.check24.fun"
+# Total timeout for a single product-details request
+DETAILS_TIMEOUT = aiohttp.ClientTimeout(total=20)
+# Product-details requests in flight, shared by all searches of this process.
+# The limit adapts to the observed latency and errors, see AdaptiveLimiter.
+DETAILS_LIMITER = AdaptiveLimiter(
+    initial_limit=int(os.getenv("SERVUSSPEED_CONCURRENCY", "5")),
+    max_limit=int(os.getenv("SERVUSSPEED_MAX_CONCURRENCY", "20")),
+)
+# Product details are cached by product ID, so a refresh only fetches new or expired products.
+# "address": details are cached per address, "global": details are shared by all addresses
+DETAILS_CACHE_SCOPE = os.getenv("SERVUSSPEED_DETAILS_CACHE_SCOPE", "address")
+# Details outlive the provider results: a refresh after CACHE_TIME (or a stale entry served
+# for up to CACHE_STALE_TIME) still finds the details of the products it already knows.
+DETAILS_CACHE_TIME = int(float(os.getenv(
+    "SERVUSSPEED_DETAILS_CACHE_TIME", str(cache_utils.CACHE_TIME + cache_utils.CACHE_STALE_TIME)
+)))
+# One entry per product, kept in a memory LRU of their own (provider results are not evicted by them)
+DETAILS_CACHE_ENTRIES = int(os.getenv("SERVUSSPEED_DETAILS_CACHE_ENTRIES", "2048"))
+DETAILS_CACHE_BYTES = int(float(os.getenv("SERVUSSPEED_DETAILS_CACHE_BYTES", str(16 * 1024 * 1024))))
+DETAILS_MEMORY_CACHE = memory_cache.MemoryLRU(DETAILS_CACHE_ENTRIES, DETAILS_CACHE_BYTES)
 
-def fetch_available_products(address):
+async def fetch_available_products(session, address):
     """
     Fetch a llist of available product IDs for a given address.
     Takes around 10-15 seconds to complete.
     Args:
+        session (aiohttp.ClientSession): The shared aiohttp session.
         address (dict): {
                         "strasse": str,
                         "hausnummer": str,
@@ -32,22 +55,23 @@ def fetch_available_products(address):
         list: A list of available product IDs.
     """
     url = BASE_URL + "/api/external/available-products"
-    auth = HTTPBasicAuth(USER, PASS)
+    auth = BasicAuth(USER, PASS)
     payload = {"address": address}
 
     try:
-        resp = requests.post(url, json=payload, auth=auth, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-    except requests.Timeout:
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with session.post(url, json=payload, auth=auth, timeout=timeout) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+    except asyncio.TimeoutError:
         print("Servus Speed available-products request timed out.")
-        return []
+        raise
     product_ids = data.get("availableProducts")
     if not isinstance(product_ids, list):
         raise ValueError(f"Expected list of IDs, got {product_ids!r}")
     return product_ids
 
-async def fetch_details(session, product_id, address, semaphore):
+async def fetch_details(session, product_id, address, limiter):
     """
     Fetch details for a given product ID.
     When called separately, a request takes 10-15 seconds to complete.
@@ -56,7 +80,7 @@ async def fetch_details(session, product_id, address, semaphore):
         session (aiohttp.ClientSession): The aiohttp session to use for the request.
         product_id (str): The product ID to fetch details for.
         address (dict): The address to use for the request.
-        semaphore (asyncio.Semaphore): Semaphore to limit concurrent requests.
+        limiter (AdaptiveLimiter): Limiter for the number of concurrent requests.
     Returns:
         dict: The details of the product.
     """
@@ -64,21 +88,44 @@ async def fetch_details(session, product_id, address, semaphore):
     auth = BasicAuth(USER, PASS)
     payload = {"address": address}
 
-    async with semaphore:
-        # print(f"Fetching details for product {product_id}")
-        try:
-            async with session.post(url, json=payload, auth=auth) as resp:
+    # print(f"Fetching details for product {product_id}")
+    try:
+        async with limiter.slot():
+            async with session.post(url, json=payload, auth=auth, timeout=DETAILS_TIMEOUT) as resp:
                 resp.raise_for_status()
                 return await resp.json()
-        except asyncio.TimeoutError:
-            print(f"Timeout fetching details for product {product_id}")
-            return None
+    except asyncio.TimeoutError:
+        print(f"Timeout fetching details for product {product_id}")
+        return None
+
+def details_cache_key(product_id, address):
+    """
+    Returns the (name, address) pair under which the details of a product are cached.
+    """
+    name = f"Servus Speed details {product_id}"
+    if DETAILS_CACHE_SCOPE == "global":
+        return name, {}
+    return name, address
+
+async def fetch_details_cached(session, product_id, address, limiter):
+    """
+    Same as fetch_details, but uses the per-product details cache.
+    """
+    name, scope = details_cache_key(product_id, address)
+    details = await cache_utils.load_from_cache_async(name, scope, max_age=DETAILS_CACHE_TIME, memory=DETAILS_MEMORY_CACHE)
+    if details is not None:
+        return details
+    details = await fetch_details(session, product_id, address, limiter)
+    if details is not None:
+        await cache_utils.save_to_cache_async(name, scope, details, memory=DETAILS_MEMORY_CACHE)
+    return details
 
-async def fetch_all_offers(product_ids, address):
+async def fetch_all_offers(session, product_ids, address):
     """
     Fetch details for all product IDs in parallel.
-    Takes around 2 minutes to complete.
+    Takes around 2 minutes to complete, products found in the details cache are not requested again.
     Args:
+        session (aiohttp.ClientSession): The shared aiohttp session.
         product_ids (list): A list of product IDs to fetch details for.
         address (dict): The address to use for the request.
     Returns:
@@ -97,15 +144,12 @@ async def fetch_all_offers(product_ids, address):
                     - installationService (bool)
                 discount (int): fixed amount in cents
     """
-    semaphore = asyncio.Semaphore(5)
-    timeout = aiohttp.ClientTimeout(total=20)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        tasks = [fetch_details(session, pid, address, semaphore) for pid in product_ids]
-        try:
-            return await asyncio.gather(*tasks)
-        except asyncio.TimeoutError:
-            print("Servus Speed product-details requests timed out.")
-            return []
+    tasks = [fetch_details_cached(session, pid, address, DETAILS_LIMITER) for pid in product_ids]
+    try:
+        return await asyncio.gather(*tasks)
+    except asyncio.TimeoutError:
+        print("Servus Speed product-details requests timed out.")
+        return []
 
 """
 Note: when using the function below, the time taken to fetch all offers is around 3-4 minutes.
@@ -172,8 +216,22 @@ def transform_offer(offer):
     data["max_age"] = int(info.get("maxAge"))
     return data
 
+def to_servus_address(address_input):
+    """
+    Converts the address into the format expected by the Servus Speed API.
+    """
+    return {
+        "strasse": address_input["street"],
+        "hausnummer": address_input["house_number"],
+        "postleitzahl": address_input["plz"],
+        "stadt": address_input["city"],
+        "land": "DE"
+    }
+
 class ServusSpeedFetcher(ProviderFetcher):
-    def get_offers(self, address_input):
+    base_url = BASE_URL
+
+    async def get_offers_async(self, address_input):
         """
         Fetch and transform offers for a given address.
         Args:
@@ -184,27 +242,45 @@ class ServusSpeedFetcher(ProviderFetcher):
                 "city": str,
             }
         Returns:
-            pandas.DataFrame
+            OfferBatch
         """
-        address = {
-            "strasse": address_input["street"],
-            "hausnummer": address_input["house_number"],
-            "postleitzahl": address_input["plz"],
-            "stadt": address_input["city"],
-            "land": "DE"
-        }
-
-        product_ids = fetch_available_products(address)
+        address = to_servus_address(address_input)
+
+        session = await http_client.get_session(self.base_url)
+        product_ids = await fetch_available_products(session, address)
         # print(f"Found {len(product_ids)} product IDs")
         print(f"Fetching offers for Servus Speed")
-        offers = asyncio.run(fetch_all_offers(product_ids, address))
+        offers = await fetch_all_offers(session, product_ids, address)
         normalized_offers = []
         for offer in offers:
+            # products whose details timed out are skipped, like in iter_offers_async
+            if offer is None:
+                continue
             normalized = transform_offer(offer)
             normalized_offers.append(normalized)
-        df = pd.DataFrame(normalized_offers)
-        print(f"Fetched {len(df)} offers for Servus Speed")
-        return df
+        batch = OfferBatch.from_records(normalized_offers)
+        print(f"Fetched {len(batch)} offers for Servus Speed")
+        return batch
+
+    async def iter_offers_async(self, address_input):
+        """
+        Same as get_offers_async, but yields every offer (as an OfferBatch of one offer)
+        as soon as its details arrive. Products whose details timed out are skipped.
+        """
+        address = to_servus_address(address_input)
+
+        session = await http_client.get_session(self.base_url)
+        product_ids = await fetch_available_products(session, address)
+        print(f"Streaming offers for Servus Speed")
+        tasks = [fetch_details_cached(session, pid, address, DETAILS_LIMITER) for pid in product_ids]
+        count = 0
+        for next_offer in asyncio.as_completed(tasks):
+            offer = await next_offer
+            if offer is None:
+                continue
+            count += 1
+            yield OfferBatch.from_records([transform_offer(offer)])
+        print(f"Streamed {count} offers for Servus Speed")
 
 if __name__ == "__main__":
     test_address = {
@@ -213,6 +289,6 @@ if __name__ == "__main__":
         "plz": "10115",
         "city": "Berlin"
     }
-    df = ServusSpeedFetcher.get_offers(test_address)
+    df = ServusSpeedFetcher().get_offers(test_address).to_frame()
     pd.set_option('display.max_columns', None)
     print(df.head(20))
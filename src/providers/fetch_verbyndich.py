@@ -6,6 +6,8 @@ import pandas as pd
 import numpy as np
 
 from .base import ProviderFetcher
+from src.utils import http_client, cache_utils
+from src.utils.offer_batch import OfferBatch
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -13,6 +15,10 @@ load_dotenv()
 API_KEY = os.getenv("VERBYNDICH_API_KEY")
 
 BASE_URL = "https://verbyndich.gendev7.check24.fun/check24/data"
+# Number of pages requested at the same time
+PAGE_WINDOW = int(os.getenv("VERBYNDICH_PAGE_WINDOW", "3"))
+# How long the page count of a PLZ is remembered (default one week)
+PAGE_HINT_CACHE_TIME = int(os.getenv("VERBYNDICH_PAGE_HINT_CACHE_TIME", "604800"))
 
 async def fetch_offers_from_page(session, address, page):
     """
@@ -22,98 +28,175 @@ async def fetch_offers_from_page(session, address, page):
         "apiKey": API_KEY,
         "page": page,
     }
-    async with session.post(BASE_URL, params=params, data=address, allow_redirects=False, timeout=10) as response:
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with session.post(BASE_URL, params=params, data=address, allow_redirects=False, timeout=timeout) as response:
         response.raise_for_status()
         return await response.json()
 
-async def fetch_all_offers(address):
+async def load_page_hint(plz):
     """
-    Fetches all offers for the given address from Verbyndich API asynchronously
+    Returns the number of pages seen for this PLZ on the last search, or None.
+    """
+    hint = await cache_utils.load_from_cache_async("VerbynDich pages", {"plz": plz}, max_age=PAGE_HINT_CACHE_TIME)
+    return hint.get("pages") if isinstance(hint, dict) else None
+
+async def save_page_hint(plz, pages):
+    await cache_utils.save_to_cache_async("VerbynDich pages", {"plz": plz}, {"pages": pages})
+
+async def fetch_all_offers(session, address):
+    """
+    Fetches all offers for the given address from Verbyndich API asynchronously.
+    Up to PAGE_WINDOW pages are requested speculatively at the same time, pages after
+    the last page are discarded. If the page count for the PLZ is known from an earlier
+    search, all of its pages are requested at once.
+    Args:
+        session (aiohttp.ClientSession): The shared aiohttp session.
+        address (str): "street;house_number;city;plz"
+    Returns:
+        list: the response of every page, in page order
     """
     print("Fetching offers from Verbyndich API...")
-    all_offers = []
-    page = 0
-
-    timeout = aiohttp.ClientTimeout(total=15)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        try:
-            data = await fetch_offers_from_page(session, address, page)
-            all_offers.append(data)
-            while not data["last"]:
-                page += 1
-                data = await fetch_offers_from_page(session, address, page)
-                all_offers.append(data)
-        except asyncio.TimeoutError:
+    plz = address.rsplit(";", 1)[-1]
+    hint = await load_page_hint(plz)
+    window = max(PAGE_WINDOW, hint or 1)
+
+    pages = {}      # page -> response
+    errors = {}     # page -> exception
+    tasks = {}      # task -> page
+    next_page = 0
+    last_page = None
+    try:
+        while True:
+            # keep the window full, but never request past the last page or a failed page
+            stop = last_page if last_page is not None else min(errors, default=None)
+            # with a known page count, only speculate further if the last known page was not the last
+            if stop is None and hint and hint - 1 not in pages:
+                stop = hint - 1
+            while len(tasks) < window and (stop is None or next_page <= stop):
+                task = asyncio.ensure_future(fetch_offers_from_page(session, address, next_page))
+                tasks[task] = next_page
+                next_page += 1
+            if not tasks:
+                break
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                page = tasks.pop(task)
+                if task.exception() is not None:
+                    errors[page] = task.exception()
+                    continue
+                pages[page] = task.result()
+                if pages[page]["last"] and (last_page is None or page < last_page):
+                    last_page = page
+            if last_page is not None:
+                # discard speculative requests past the last page
+                for task, page in list(tasks.items()):
+                    if page > last_page:
+                        task.cancel()
+                        del tasks[task]
+                if all(page in pages for page in range(last_page + 1)):
+                    break
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # errors after the last page are expected, all others are raised
+    failed = [page for page in errors if last_page is None or page <= last_page]
+    if failed:
+        if isinstance(errors[min(failed)], asyncio.TimeoutError):
             print("Verbyndich API request timed out.")
-            return []
+        raise errors[min(failed)]
+    await save_page_hint(plz, last_page + 1)
+    return [pages[page] for page in range(last_page + 1)]
+
+# --- Description Parsing ---
+# All details of an offer are only given in its description text. Every field has its own
+# compiled pattern, which is searched in the descriptions of all offers column by column,
+# and the columns are converted to arrays at once. Like re.search, the first match is used.
+DESCRIPTION_FIELDS = {
+    # column: (pattern, type of the value)
+    "cost_eur": (re.compile(r"Für nur (\d+)€ im Monat"), "float"),
+    "connection_type": (re.compile(r"(\w+)-Verbindung"), "lower"),
+    "speed_mbps": (re.compile(r"einer Geschwindigkeit von (\d+) Mbit/s"), "int"),
+    "tv": (re.compile(r"folgende Fernsehsender enthalten (\w+)\."), "str"),
+    "duration_months": (re.compile(r"Mindestvertragslaufzeit (\d+) Monate"), "int"),
+    "max_age": (re.compile(r"nur für Personen unter (\d+) Jahren"), "int"),
+    "limit_from_gb": (re.compile(r"Ab (\d+)GB pro Monat wird die Geschwindigkeit gedrosselt"), "int"),
+    "voucher_fixed_eur": (re.compile(r"Rabatt beträgt (\d+)€"), "float"),
+    "promo_duration_months": (re.compile(r"monatliche Rechnung bis zum (\d+)\. Monat"), "int"),
+    "voucher_percent": (re.compile(r"einen Rabatt von (\d+)%"), "int"),
+    "after_two_years_eur": (re.compile(r"Monat beträgt der monatliche Preis (\d+)€"), "float"),
+}
 
-    return all_offers
+def extract_field(descriptions, pattern, kind):
+    search = pattern.search
+    values = [m.group(1) if (m := search(desc)) else None for desc in descriptions]
+    if kind == "str":
+        return np.array([pd.NA if value is None else value for value in values], dtype=object)
+    if kind == "lower":
+        return np.array([pd.NA if value is None else value.lower() for value in values], dtype=object)
+    # integers stay int64 if every description has the field, else float64 with NaN
+    if kind == "int" and None not in values:
+        return np.array(values, dtype=np.int64)
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
 
-def parse_description(desc):
+def parse_descriptions(descriptions):
     """
-    Parses the description of the offer and extracts relevant information
+    Parses the descriptions of offers and extracts relevant information
     Args:
-        desc (str): description of the offer
+        descriptions (list): descriptions of the offers
     Returns:
-        dict: dictionary with extracted information
+        dict: column name -> array with the extracted information of every offer,
+            voucher_percent and promo_price_eur only if any offer has a percentage discount
     """
-    data = {}
-
-    data["cost_eur"] = float(m.group(1)) if (m := re.search(r"Für nur (\d+)€ im Monat", desc)) else np.nan
-    data["connection_type"] = m.group(1).lower() if (m := re.search(r"(\w+)-Verbindung", desc)) else pd.NA
-    data["speed_mbps"] = int(m.group(1)) if (m := re.search(r"einer Geschwindigkeit von (\d+) Mbit/s", desc)) else np.nan
-    data["tv"] = m.group(1) if (m := re.search(r"folgende Fernsehsender enthalten (\w+)\.", desc)) else pd.NA
-    data["duration_months"] = int(m.group(1)) if (m := re.search(r"Mindestvertragslaufzeit (\d+) Monate", desc)) else np.nan
-    data["max_age"] = int(m.group(1)) if (m := re.search(r"nur für Personen unter (\d+) Jahren", desc)) else np.nan
-    # searches for the limit and sets the unlimited flag
-    data["limit_from_gb"] = int(m.group(1)) if (m := re.search(r"Ab (\d+)GB pro Monat wird die Geschwindigkeit gedrosselt", desc)) else np.nan
-    # seaches for the max voucher value and promo duration
-    data["voucher_fixed_eur"] = float(m.group(1)) if (m := re.search(r"Rabatt beträgt (\d+)€", desc)) else np.nan
-    data["promo_duration_months"] = int(m.group(1)) if  (m := re.search(r"monatliche Rechnung bis zum (\d+)\. Monat", desc)) else np.nan
-    # searches for the voucher percent and calculates the promo price
-    discount = re.search(r"einen Rabatt von (\d+)%", desc)
-    if discount:
-        data["voucher_percent"] = int(discount.group(1))
-        # if voucher percent applied over voucher duration < max voucher value
-        # voucher in percent is used to calculate the promo price
-        if data["cost_eur"] * data["voucher_percent"] /100 * data["promo_duration_months"] < data["voucher_fixed_eur"]:
-            data["promo_price_eur"] = data["cost_eur"] - data["cost_eur"] * data["voucher_percent"] / 100 
-        # if voucher percent applied over voucher duration < max voucher value
-        # max voucher value is used to calculate the promo price
-        else: 
-            data["promo_price_eur"] = data["cost_eur"] - data["voucher_fixed_eur"] / data["promo_duration_months"]
-
-    data["after_two_years_eur"] = float(m.group(1)) if (m := re.search(r"Monat beträgt der monatliche Preis (\d+)€", desc)) else np.nan
+    data = {
+        column: extract_field(descriptions, pattern, kind)
+        for column, (pattern, kind) in DESCRIPTION_FIELDS.items()
+    }
+    percent = data["voucher_percent"]
+    if np.isnan(percent).all():
+        del data["voucher_percent"]
+        return data
+    cost, fixed, months = data["cost_eur"], data["voucher_fixed_eur"], data["promo_duration_months"]
+    # if voucher percent applied over voucher duration < max voucher value
+    # voucher in percent is used to calculate the promo price,
+    # else max voucher value is used to calculate the promo price
+    with np.errstate(divide="ignore", invalid="ignore"):
+        promo_price = np.where(
+            cost * percent / 100 * months < fixed,
+            cost - cost * percent / 100,
+            cost - fixed / months,
+        )
+    data["promo_price_eur"] = np.where(np.isnan(percent), np.nan, promo_price)
+    # same column order as the offers without discount
+    data["after_two_years_eur"] = data.pop("after_two_years_eur")
     return data
 
 def transform_offers(all_offers, provider="VerbynDich"):
     """
-    Transforms the offers into a DataFrame with the required columns
+    Transforms the offers into a batch with the required columns, straight from the parsed arrays
     Args:
         all_offers (list): list of offers from Verbyndich API
         provider (str): name of the provider
     Returns:
-        pandas.DataFrame: DataFrame with the following columns:
+        OfferBatch: offers with the following provider columns:
             provider, name, cost_eur, connection_type, speed_mbps,
-            tv, duration_months, max_age, limit_from_gb, unlimited,
+            tv, duration_months, max_age, limit_from_gb,
             voucher_fixed_eur, promo_duration_months, voucher_percent,
             promo_price_eur, after_two_years_eur
     """
-    offers_list = []
-    for offer in all_offers:
-        if not offer.get("valid", False):
-            continue    
-        d = {
-            "provider": provider,
-            "name": offer["product"],
-            **parse_description(offer["description"]),
-        }
-        offers_list.append(d)
-    df = pd.DataFrame(offers_list)
-    return df
+    valid_offers = [offer for offer in all_offers if offer.get("valid", False)]
+    if not valid_offers:
+        return OfferBatch.from_records([])
+    return OfferBatch.from_columns({
+        "provider": [provider] * len(valid_offers),
+        "name": [offer["product"] for offer in valid_offers],
+        **parse_descriptions([offer["description"] for offer in valid_offers]),
+    }, len(valid_offers))
 
 class VerbynDichFetcher(ProviderFetcher):
-    def get_offers(self, address_input):
+    base_url = BASE_URL
+
+    async def get_offers_async(self, address_input):
         """
         Main function to fetch and transform offers from Verbyndich API
         Args:
@@ -124,13 +207,14 @@ class VerbynDichFetcher(ProviderFetcher):
                     "city": "Berlin"
                 }
         Returns:
-            pandas.DataFrame: DataFrame with the offers
+            OfferBatch: The offers
         """
         address = ";".join([address_input[key] for key in ["street", "house_number", "city", "plz"]])
-        offers = asyncio.run(fetch_all_offers(address))
-        df = transform_offers(offers)
-        print(f"Found {len(df)} offers, Verbyndich")
-        return df
+        session = await http_client.get_session(self.base_url)
+        offers = await fetch_all_offers(session, address)
+        batch = transform_offers(offers)
+        print(f"Found {len(batch)} offers, Verbyndich")
+        return batch
         
 if __name__ == "__main__":
     address = {
@@ -139,6 +223,6 @@ if __name__ == "__main__":
             "plz": "10115",
             "city": "Berlin"
         }
-    df = VerbynDichFetcher.get_offers(address)
+    df = VerbynDichFetcher().get_offers(address).to_frame()
     pd.set_option('display.max_columns', None)
     print(df.head(10))
\ No newline at end of file
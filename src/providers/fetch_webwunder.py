@@ -1,10 +1,13 @@
 import os
-import requests
+import asyncio
+import aiohttp
 import xml.etree.ElementTree as ET
 import pandas as pd
 import numpy as np
 
 from .base import ProviderFetcher
+from src.utils import http_client
+from src.utils.offer_batch import OfferBatch
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -12,11 +15,15 @@ load_dotenv()
 API_KEY = os.getenv("WEBWUNDER_API_KEY")
 
 BASE_URL = "https://webwunder.gendev7.check24.fun/endpunkte/soap/ws/getInternetOffers"
+# Max number of SOAP requests in flight for one search
+CONCURRENCY = int(os.getenv("WEBWUNDER_CONCURRENCY", "6"))
+CONNECTION_TYPES = ["fiber", "dsl", "cable"]
 
-def fetch_offers(installation, connection_type, address):
+async def fetch_offers(session, installation, connection_type, address):
     """
     Fetch offers from the WebWunder API for a given address
     Args:
+        session (aiohttp.ClientSession): The shared aiohttp session.
         installation (bool)
         connection_type (str): "fiber", "dsl", "cable"
         address = {
@@ -27,7 +34,8 @@ def fetch_offers(installation, connection_type, address):
             "countryCode": str
         }
     Returns:
-        response: Response object from the requests library
+        str: XML text of the SOAP response
+        Timeouts and API errors are raised, so retries and the circuit breaker see them.
     """
     envelope = f"""<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
                   xmlns:gs="http://webwunder.gendev7.check24.fun/offerservice">
@@ -51,32 +59,27 @@ def fetch_offers(installation, connection_type, address):
 
     headers = {"X-Api-Key": API_KEY}
     try:
-        response = requests.post(BASE_URL, data=envelope, headers=headers, timeout=10)
-        response.raise_for_status()
-        return response
-    except requests.Timeout:
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with session.post(BASE_URL, data=envelope, headers=headers, timeout=timeout) as response:
+            response.raise_for_status()
+            return await response.text()
+    except asyncio.TimeoutError:
         print("WebWunder API request timed out.")
-        # Return an empty response-like object
-        class DummyResponse:
-            text = "<offers></offers>"
-        return DummyResponse()
-    except Exception as e:
-        print(f"WebWunder API error: {e}")
-        class DummyResponse:
-            text = "<offers></offers>"
-        return DummyResponse()
-
-def parse_offers(response):
+        raise
+
+def parse_offers(response_text):
     """
     Parse the XML response from the WebWunder API and extracts relevant information
+    Args:
+        response_text (str): XML text of the SOAP response
     Returns:
-        pd.DataFrame with the following columns:
+        list: offers (dicts) with the following keys:
             provider, product_id, name, speed_mbps, cost_eur,
             min_order_value_eur, promo_price_eur, voucher_fixed_eur,
             voucher_percent, duration_months, after_two_years_eur,
             connection_type
     """
-    root = ET.fromstring(response.text)
+    root = ET.fromstring(response_text)
     ns = {
         "soapenv": "http://schemas.xmlsoap.org/soap/envelope/",
         "ns2": "http://webwunder.gendev7.check24.fun/offerservice"
@@ -138,11 +141,31 @@ def parse_offers(response):
         }
 
         parsed.append(offer)
-    df = pd.DataFrame(parsed)
-    return df
+    return parsed
+
+async def fetch_combination(session, semaphore, installation, connection_type, address):
+    """
+    Fetch and parse the offers for one connection type / installation combination
+    Args:
+        session (aiohttp.ClientSession): The shared aiohttp session.
+        semaphore (asyncio.Semaphore): Semaphore to limit concurrent requests.
+        installation (bool)
+        connection_type (str): "fiber", "dsl", "cable"
+        address (dict): same as in fetch_offers
+    Returns:
+        list: parsed offers, tagged with installation_included
+    """
+    async with semaphore:
+        response_text = await fetch_offers(session, installation, connection_type, address)
+    offers = parse_offers(response_text)
+    for offer in offers:
+        offer["installation_included"] = installation
+    return offers
 
 class WebWunderFetcher(ProviderFetcher):
-    def get_offers(self, address_input):
+    base_url = BASE_URL
+
+    async def get_offers_async(self, address_input):
         """
         Main function to fetch and transform offers from WebWunder API
         """
@@ -154,21 +177,27 @@ class WebWunderFetcher(ProviderFetcher):
             "countryCode": "DE"
         }
 
-        all_offers = []
-        # Fetch offers for all connection types and installation options
+        session = await http_client.get_session(self.base_url)
+        # Fetch offers for all connection types and installation options concurrently
         print("Fetching offers for WebWunder")
-        #TODO: make this async
-        connection_types = ["fiber", "dsl", "cable"]
-        for connection_type in connection_types:
-            for installation in [True, False]:
-                response = fetch_offers(installation, connection_type, address)
-                offers = parse_offers(response)
-                offers["installation_included"] = installation
-                all_offers.append(offers)
-
-        df = pd.concat(all_offers, ignore_index=True)
-        print(f"Found {len(df)} offers, Webwunder")
-        return df
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        tasks = [
+            fetch_combination(session, semaphore, installation, connection_type, address)
+            for connection_type in CONNECTION_TYPES
+            for installation in [True, False]
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # a single failed combination leaves out its offers, if all fail the provider is down
+        offer_lists = [result for result in results if not isinstance(result, BaseException)]
+        if not offer_lists:
+            raise results[0]
+        for result in results:
+            if isinstance(result, BaseException):
+                print(f"WebWunder combination failed: {result!r}")
+
+        batch = OfferBatch.from_records([offer for offers in offer_lists for offer in offers])
+        print(f"Found {len(batch)} offers, Webwunder")
+        return batch
 
 if __name__ == "__main__":
     address = {
@@ -177,6 +206,6 @@ if __name__ == "__main__":
         "plz": "10115",
         "city": "Berlin"
     }
-    df = WebWunderFetcher.get_offers(address)
+    df = WebWunderFetcher().get_offers(address).to_frame()
     pd.set_option('display.max_columns', None)
     print(df.head(40))
\ No newline at end of file
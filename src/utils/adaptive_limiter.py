@@ -0,0 +1,80 @@
+import time
+import asyncio
+import contextlib
+import collections
+
+class AdaptiveLimiter:
+    """
+    Concurrency limiter that adapts its limit to the observed latency and errors (AIMD).
+    - every fast, successful request raises the limit by 1 / limit,
+      so the limit grows by about one per round of requests (additive increase)
+    - an error, or a request slower than latency_tolerance * the baseline latency,
+      multiplies the limit by backoff_factor (multiplicative decrease)
+    The baseline is the fastest of the last latency_window successful requests, so it
+    follows the upstream when it gets slower and one unusually fast response (e.g. an
+    upstream cache hit) does not make every later request look congested.
+    Must only be used from one event loop.
+    """
+    def __init__(self, initial_limit=5, min_limit=1, max_limit=20, latency_tolerance=2.0, backoff_factor=0.5, latency_window=50):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff_factor = backoff_factor
+        self.in_flight = 0
+        self.latencies = collections.deque(maxlen=latency_window)
+        self._limit = float(initial_limit)
+        self._last_decrease = None
+        self._condition = None
+
+    @property
+    def limit(self):
+        """Current number of requests allowed in flight."""
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def min_latency(self):
+        """Baseline latency, the fastest of the last latency_window successful requests."""
+        return min(self.latencies) if self.latencies else None
+
+    def record(self, latency, success):
+        """
+        Adjusts the limit after a request finished.
+        Args:
+            latency (float): Duration of the request in seconds.
+            success (bool): Whether the request succeeded.
+        """
+        if success:
+            self.latencies.append(latency)
+        congested = not success or latency > self.min_latency * self.latency_tolerance
+        if not congested:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            return
+        # Requests that were already in flight report the same congestion,
+        # so decrease at most once per request duration
+        now = time.monotonic()
+        if self._last_decrease is None or now - self._last_decrease >= latency:
+            self._limit = max(self.min_limit, self._limit * self.backoff_factor)
+            self._last_decrease = now
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """
+        Waits for a free slot and holds it for the body of the `async with` block.
+        The block's duration and whether it raised are recorded.
+        """
+        # Created on first use so it belongs to the running loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        start = time.monotonic()
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self.record(time.monotonic() - start, success)
+                self._condition.notify_all()
@@ -0,0 +1,59 @@
+import re
+import unicodedata
+from urllib.parse import unquote_plus
+
+# --- Address Canonicalization ---
+# Different spellings of the same address should share one cache entry, e.g.
+# "Hauptstraße 5a", "Hauptstrasse 5A" and "hauptstr. 5 a".
+
+# "str", "str." at the end of a word, e.g. "Hauptstr." or "Karl-Marx-Str"
+STREET_ABBREVIATION = re.compile(r"str\b\.?")
+NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+WHITESPACE = re.compile(r"\s+")
+
+def to_ascii(string):
+    """
+    Decodes an API safe string (see for_string.make_api_safe) and reduces it to
+    lowercase ASCII, so raw and encoded input give the same result.
+    """
+    string = unquote_plus(string).replace("ß", "ss").replace("ẞ", "ss")
+    normalized = unicodedata.normalize('NFKD', string)
+    return normalized.encode('ascii', 'ignore').decode('ascii').lower()
+
+def canonical_street(street):
+    # "Karl-Marx-Str." -> "karlmarxstrasse"
+    street = STREET_ABBREVIATION.sub("strasse", to_ascii(street))
+    return NON_ALPHANUMERIC.sub("", street)
+
+def canonical_house_number(house_number):
+    # "5 A" -> "5a", "12 - 14" -> "12-14"
+    return WHITESPACE.sub("", to_ascii(house_number))
+
+def canonical_plz(plz):
+    return WHITESPACE.sub("", to_ascii(plz))
+
+def canonical_city(city):
+    # "Frankfurt  (Oder)" -> "frankfurt oder"
+    return " ".join(NON_ALPHANUMERIC.sub(" ", to_ascii(city)).split())
+
+CANONICAL_FIELDS = {
+    "street": canonical_street,
+    "house_number": canonical_house_number,
+    "plz": canonical_plz,
+    "city": canonical_city,
+}
+
+def canonical_address(address):
+    """
+    Returns a copy of the address with its fields in canonical form.
+    Args:
+        address (dict): Address with any of the keys street, house_number, plz and city,
+            raw or encoded with for_string.make_api_safe. Other keys are kept as they are.
+    Returns:
+        dict: Canonical address, only meant for comparing and hashing.
+    """
+    canonical = dict(address)
+    for field, canonicalize in CANONICAL_FIELDS.items():
+        if isinstance(canonical.get(field), str):
+            canonical[field] = canonicalize(canonical[field])
+    return canonical
@@ -2,25 +2,55 @@ import requests
 import os
 import json
 
+from src.utils import nominatim_cache, prefix_index
+
 NOMINATIM_URL = os.getenv("NOMINATIM_URL")
 HEADERS = json.loads(os.getenv("HEADERS"))
 
+# Maximum number of Nominatim results per search
+LIMIT = 10
+# Shortest postal code query whose Nominatim results are trusted to be all matches of the prefix
+MIN_COMPLETE_PLZ_LENGTH = 3
+
+# Optional offline index (see src/build_index.py), opened once and memory-mapped
+AUTOCOMPLETE_INDEX = os.getenv("AUTOCOMPLETE_INDEX")
+INDEX = prefix_index.open_index(AUTOCOMPLETE_INDEX) if AUTOCOMPLETE_INDEX else None
+
 def fetch_plz_suggestions(query):
     """
     Returns a list of German postal code suggestions based on the given query.
     Uses Nominatim's search API to find postal codes and cities that match the prefix.
+    Answered from the offline index if it knows the prefix, Nominatim is only asked on a miss.
+    Results are cached, complete results also answer longer queries (see nominatim_cache).
     """
     # Ensure the query is a valid postal code prefix
     query = query.strip()
     if not query.isdigit():
         return []
+    if INDEX is not None:
+        suggestions = INDEX.plz_suggestions(query, LIMIT)
+        if suggestions:
+            return suggestions
+    return nominatim_cache.cached_prefix(
+        "plz", {}, query, search_plz,
+        lambda suggestion, query: suggestion["postcode"].startswith(query)
+    )
 
+def search_plz(query):
+    """
+    Searches Nominatim for postal codes starting with query.
+    Returns:
+        dict: {"complete": bool, "suggestions": list}, complete only if Nominatim did a prefix search:
+            fewer than LIMIT results, at least one, all starting with a query of at least
+            MIN_COMPLETE_PLZ_LENGTH digits. Postal code searches are often exact matches,
+            "1" finds nothing although "10115" exists.
+    """
     params = {
         "postalcode": query,         # structured field for postcodes
         "countrycodes": "de",        # hard filter to Germany
         "format": "json",            # JSON output
         "addressdetails": 1,         # include breakdown into components
-        "limit": 10                  # max results
+        "limit": LIMIT               # max results
     }
     resp = requests.get(NOMINATIM_URL, params=params, headers=HEADERS)
     resp.raise_for_status()
@@ -41,14 +71,38 @@ def fetch_plz_suggestions(query):
                   "postcode": plz,
                   "city": city
                 })
-                if len(suggestions) >= 10:
+                if len(suggestions) >= LIMIT:
                     break
-    return suggestions
+    complete = (
+        len(query) >= MIN_COMPLETE_PLZ_LENGTH
+        and 0 < len(results) < LIMIT
+        and all(str(result.get("address", {}).get("postcode", "")).startswith(query) for result in results)
+    )
+    return {"complete": complete, "suggestions": suggestions}
 
 def fetch_street_suggestions(query, city):
     """
     Returns street-name autocomplete suggestions in the given German city.
     Uses Nominatim's autocomplete mode for prefix searches.
+    Answered from the offline index if it knows the prefix, Nominatim is only asked on a miss.
+    Results are cached, complete results also answer longer queries (see nominatim_cache).
+    """
+    if INDEX is not None:
+        suggestions = INDEX.street_suggestions(query, city, LIMIT)
+        if suggestions:
+            return suggestions
+    return nominatim_cache.cached_prefix(
+        "street", {"city": city}, query.strip().lower(),
+        lambda query: search_streets(query, city),
+        lambda suggestion, query: query in suggestion["display"].lower()
+    )
+
+def search_streets(query, city):
+    """
+    Searches Nominatim for streets matching query in city.
+    Returns:
+        dict: {"complete": bool, "suggestions": list}, never complete: the structured street
+            search is not a prefix search, so its results do not answer longer queries.
     """
     params = {
         "street":         query,     # structured field for street name (no house number)
@@ -56,7 +110,7 @@ def fetch_street_suggestions(query, city):
         "countrycodes":   "de",      # hard filter to Germany
         "format":         "json",    # JSON output
         "addressdetails": 1,         # include components
-        "limit":          10         # max results
+        "limit":          LIMIT      # max results
     }
     resp = requests.get(NOMINATIM_URL, params=params, headers=HEADERS)
     resp.raise_for_status()
@@ -70,4 +124,4 @@ def fetch_street_suggestions(query, city):
         if street and street not in seen:
             seen.add(street)
             suggestions.append({"display": street})
-    return suggestions
\ No newline at end of file
+    return {"complete": False, "suggestions": suggestions}
@@ -0,0 +1,197 @@
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+
+# --- Cache Backends ---
+# A backend stores opaque cache entries (bytes) by name, e.g. "ByteMe_<hash>.json".
+# Expiry on read is handled by cache_utils, the backend only has to
+# - track when an entry was written and last read, and return the write time without the value
+# - purge entries older than max_age and evict the least recently used entries above max_bytes
+
+# Reads update the last read time of an entry only if it is older than this many seconds,
+# LRU eviction does not need it more exact and most reads then do not write
+ATIME_RESOLUTION = 60
+
+# Suffix of the temporary files of FileBackend writes
+TMP_SUFFIX = ".tmp"
+
+class FileBackend:
+    """
+    One file per entry in a flat directory. Compatible with the existing cache files.
+    The modification time of a file is its write time, the access time is its last read
+    (at most ATIME_RESOLUTION seconds old).
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def get(self, name):
+        path = self.path(name)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+                stat = os.fstat(f.fileno())
+        except FileNotFoundError:
+            return None
+        # remember the read for LRU eviction, keep the write time
+        now = time.time()
+        if now - stat.st_atime >= ATIME_RESOLUTION:
+            try:
+                os.utime(path, (now, stat.st_mtime))
+            except OSError:
+                pass
+        return value
+
+    def timestamp(self, name):
+        """Returns the write time of an entry, or None if there is no entry."""
+        try:
+            return os.stat(self.path(name)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def set(self, name, value, timestamp):
+        """
+        Writes to a temporary file in the same directory and renames it over the entry,
+        so readers in any process see either the old or the new entry, never a partial one.
+        The file is not synced: after a crash the entry may be empty, which is read as a
+        corrupt entry (a cache miss), so the write does not wait for the disk.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f".{name}.", suffix=TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.utime(tmp_path, (timestamp, timestamp))
+            os.replace(tmp_path, self.path(name))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def delete(self, name):
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def purge(self, max_age, max_bytes):
+        """
+        Deletes entries written more than max_age seconds ago, then the least recently
+        read entries until the total size is at most max_bytes.
+        Returns:
+            int: number of deleted entries
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+        now = time.time()
+        deleted = 0
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if now - stat.st_mtime > max_age:
+                    self.delete(entry.name)
+                    deleted += 1
+                elif entry.name.endswith(TMP_SUFFIX):
+                    # a write in progress (or interrupted less than max_age ago)
+                    continue
+                else:
+                    entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= max_bytes:
+                break
+            self.delete(name)
+            total -= size
+            deleted += 1
+        return deleted
+
+class SQLiteBackend:
+    """
+    All entries in one SQLite database, indexed by name, write time and last read.
+    Lookups and expiry do not depend on the number of entries in a directory.
+    Safe to use from several threads and processes (one connection per thread, WAL mode).
+    """
+    def __init__(self, directory, filename="cache.sqlite3"):
+        self.directory = directory
+        self.path = os.path.join(directory, filename)
+        self.local = threading.local()
+
+    def connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            # autocommit, every statement is its own transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    name      TEXT PRIMARY KEY,
+                    timestamp REAL NOT NULL,
+                    accessed  REAL NOT NULL,
+                    size      INTEGER NOT NULL,
+                    value     BLOB NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_timestamp ON entries (timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self.local.conn = conn
+        return conn
+
+    def get(self, name):
+        conn = self.connect()
+        row = conn.execute("SELECT value FROM entries WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        conn.execute("UPDATE entries SET accessed = ? WHERE name = ? AND accessed <= ?", (now, name, now - ATIME_RESOLUTION))
+        return bytes(row[0])
+
+    def timestamp(self, name):
+        """Returns the write time of an entry, or None if there is no entry."""
+        row = self.connect().execute("SELECT timestamp FROM entries WHERE name = ?", (name,)).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, name, value, timestamp):
+        self.connect().execute(
+            "INSERT OR REPLACE INTO entries (name, timestamp, accessed, size, value) VALUES (?, ?, ?, ?, ?)",
+            (name, timestamp, time.time(), len(value), sqlite3.Binary(value))
+        )
+
+    def delete(self, name):
+        self.connect().execute("DELETE FROM entries WHERE name = ?", (name,))
+
+    def purge(self, max_age, max_bytes):
+        """Same as FileBackend.purge."""
+        conn = self.connect()
+        deleted = conn.execute("DELETE FROM entries WHERE timestamp < ?", (time.time() - max_age,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= max_bytes:
+            return deleted
+        evict = []
+        for name, size in conn.execute("SELECT name, size FROM entries ORDER BY accessed"):
+            if total <= max_bytes:
+                break
+            evict.append((name,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE name = ?", evict)
+        return deleted + len(evict)
+
+BACKENDS = {
+    "file": FileBackend,
+    "sqlite": SQLiteBackend,
+}
+
+def create_backend(kind, directory):
+    """Creates the backend of the given kind ("file" or "sqlite") storing its data in directory."""
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown cache backend {kind!r}, expected one of {list(BACKENDS)}")
+    return BACKENDS[kind](directory)
@@ -0,0 +1,91 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+
+from src.utils.offer_batch import OfferBatch
+
+# --- Cache Entry Formats ---
+# A cache entry (write timestamp and data) is serialized to bytes for the cache backend.
+# - json: {"timestamp": ..., "data": ...}, any JSON data, DataFrames and offer batches as a list of records
+# - npz: NumPy archive with one array per column, DataFrames and offer batches only. Keeps the dtypes
+#   (including pandas' nullable ones) and is read column by column instead of row by row.
+
+def to_native(value):
+    # missing values and numpy scalars in object and string columns
+    if value is pd.NA:
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+def dumps_json(timestamp, data):
+    # Convert DataFrame to list of dicts for JSON serialization
+    if isinstance(data, pd.DataFrame):
+        data = data.to_dict(orient="records")
+    elif isinstance(data, OfferBatch):
+        data = data.records()
+    # missing values of nullable columns (pd.NA) are written as null
+    return json.dumps({'timestamp': timestamp, 'data': data}, default=to_native).encode()
+
+def loads_json(value):
+    entry = json.loads(value)
+    data = entry.get('data')
+    # Convert list of dicts back to DataFrame
+    if isinstance(data, list):
+        data = pd.DataFrame(data)
+    return entry.get('timestamp', 0), data
+
+def dumps_npz(timestamp, df):
+    """
+    Stores every column in the most direct way that does not need pickle:
+    - "array": numpy dtypes (numbers, bool, datetimes) as they are
+    - "masked": pandas' nullable dtypes (boolean, Int64, Float64) as values and NA mask
+    - "json": everything else (object, string, ...) as a list in the JSON header,
+      so the archive has as few members as possible
+    """
+    if isinstance(df, OfferBatch):
+        df = df.to_frame()
+    arrays = {}
+    columns = []
+    for i, (name, series) in enumerate(df.items()):
+        dtype = series.dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+            columns.append([name, str(dtype), "array", None])
+            arrays[f"values_{i}"] = series.to_numpy()
+        elif isinstance(series.array, (pd.arrays.BooleanArray, pd.arrays.IntegerArray, pd.arrays.FloatingArray)):
+            columns.append([name, str(dtype), "masked", None])
+            arrays[f"values_{i}"] = series.to_numpy(dtype=dtype.numpy_dtype, na_value=dtype.numpy_dtype.type(0))
+            arrays[f"mask_{i}"] = series.isna().to_numpy()
+        else:
+            columns.append([name, str(dtype), "json", series.tolist()])
+    meta = {'timestamp': timestamp, 'length': len(df), 'columns': columns}
+    buffer = io.BytesIO()
+    header = json.dumps(meta, default=to_native).encode()
+    np.savez(buffer, meta=np.frombuffer(header, dtype=np.uint8), **arrays)
+    return buffer.getvalue()
+
+def loads_npz(value):
+    with np.load(io.BytesIO(value), allow_pickle=False) as archive:
+        meta = json.loads(archive["meta"].tobytes())
+        data = {}
+        for i, (name, dtype, kind, values) in enumerate(meta['columns']):
+            if kind == "array":
+                data[name] = archive[f"values_{i}"]
+            elif kind == "masked":
+                array_type = pd.api.types.pandas_dtype(dtype).construct_array_type()
+                data[name] = array_type(archive[f"values_{i}"], archive[f"mask_{i}"])
+            elif dtype == "object":
+                data[name] = np.fromiter(values, dtype=object, count=len(values))
+            else:
+                data[name] = pd.array(values, dtype=dtype)
+    return meta['timestamp'], pd.DataFrame(data, index=pd.RangeIndex(meta['length']))
+
+FORMATS = {
+    "json": {"extension": ".json", "dumps": dumps_json, "loads": loads_json},
+    "npz": {"extension": ".npz", "dumps": dumps_npz, "loads": loads_npz},
+}
+
+def supports(format, data):
+    """Returns True if data can be stored in the given format (npz only stores DataFrames and offer batches)."""
+    return format == "json" or isinstance(data, (pd.DataFrame, OfferBatch))
@@ -1,67 +1,420 @@
 import os
 import json
 import time
+import asyncio
+import logging
 import hashlib
+import threading
 import pandas as pd
 
-CACHE_DIR = 'cache'
+from src.utils import single_flight, cache_backends, memory_cache, address_utils, cache_formats
+from src.utils.offer_batch import OfferBatch
+
+# One cache location, independent of the working directory (default: src/cache)
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache"))
 CACHE_TIME = int(float(os.getenv("CACHE_TIME", "3600")))  # Default to 3600 seconds
+# "file" (one JSON file per entry) or "sqlite" (indexed, one database file)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "file")
+# Entries are purged in the background every CACHE_PURGE_INTERVAL seconds (0 disables it):
+# entries older than CACHE_PURGE_AGE first, then the least recently used above CACHE_MAX_BYTES
+CACHE_PURGE_INTERVAL = int(float(os.getenv("CACHE_PURGE_INTERVAL", "600")))
+# Entries up to CACHE_STALE_TIME seconds past CACHE_TIME are still served (marked as stale)
+# while they are refreshed in the background (stale-while-revalidate, 0 disables it)
+CACHE_STALE_TIME = int(float(os.getenv("CACHE_STALE_TIME", str(24 * 3600))))
+CACHE_PURGE_AGE = int(float(os.getenv("CACHE_PURGE_AGE", str(max(CACHE_TIME + CACHE_STALE_TIME, 7 * 24 * 3600)))))
+CACHE_MAX_BYTES = int(float(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024))))
+# On-disk format of DataFrames: "json" (list of records) or "npz" (columnar, keeps dtypes).
+# Entries in the other format are still read, so the format can be switched at any time.
+CACHE_FORMAT = os.getenv("CACHE_FORMAT", "json")
+# Per-process memory tier in front of the backend, holds the already normalized data
+MEMORY_CACHE_ENTRIES = int(os.getenv("MEMORY_CACHE_ENTRIES", "256"))
+MEMORY_CACHE_BYTES = int(float(os.getenv("MEMORY_CACHE_BYTES", str(64 * 1024 * 1024))))
 
-# Create cache directory if it doesn't exist
-def make_cache_dir():
-    os.makedirs(CACHE_DIR, exist_ok=True)
+MEMORY_CACHE = memory_cache.MemoryLRU(MEMORY_CACHE_ENTRIES, MEMORY_CACHE_BYTES)
 
-# Create a unique cache path based on provider name and address
-def cache_path(provider_name, address):
+_backend = None
+_backend_config = None
+_backend_lock = threading.Lock()
+_purge_thread = None
+
+# Return the configured cache backend, (re)created when the configuration changes
+def get_backend():
+    global _backend, _backend_config
+    config = (CACHE_BACKEND, CACHE_DIR)
+    if _backend_config == config:
+        return _backend
+    with _backend_lock:
+        # another thread may have created it while this one waited
+        if _backend_config != config:
+            backend = cache_backends.create_backend(*config)
+            # the memory tier belongs to the previous backend
+            MEMORY_CACHE.clear()
+            _backend = backend
+            _backend_config = config
+            start_purge_thread()
+        return _backend
+
+# Purge expired and least recently used entries, and lock files not used for CACHE_PURGE_AGE
+def purge_cache():
+    single_flight.purge_locks(lock_dir(), CACHE_PURGE_AGE)
+    return get_backend().purge(CACHE_PURGE_AGE, CACHE_MAX_BYTES)
+
+def start_purge_thread():
+    global _purge_thread
+    if CACHE_PURGE_INTERVAL <= 0 or _purge_thread is not None:
+        return
+    def purge_periodically():
+        while True:
+            time.sleep(CACHE_PURGE_INTERVAL)
+            try:
+                purge_cache()
+            except Exception as e:
+                logging.error(f"Cache purge failed: {e}")
+    _purge_thread = threading.Thread(target=purge_periodically, name="cache-purge", daemon=True)
+    _purge_thread.start()
+
+# Create a unique cache key based on provider name and address
+def cache_key(provider_name, address):
+    # Spellings of the same address share a key, e.g. "Hauptstraße 5a" and "hauptstr. 5 A"
+    return raw_cache_key(provider_name, address_utils.canonical_address(address))
+
+def raw_cache_key(provider_name, address):
     # Use a hash to avoid filesystem issues
     address_str = json.dumps(address, sort_keys=True)
     address_hash = hashlib.md5(address_str.encode()).hexdigest()
-    filename = f"{provider_name}_{address_hash}.json"
-    return os.path.join(CACHE_DIR, filename)
+    return f"{provider_name}_{address_hash}"
+
+# Key of the entry in the memory tier. Data loaded with normalize is kept apart from the data
+# as read from the backend, so callers with and without normalize never get each other's data.
+def memory_key(provider_name, address, normalized=False):
+    key = cache_key(provider_name, address)
+    return f"{key}#normalized" if normalized else key
+
+# Name of the cache entry in the backend
+def entry_name(provider_name, address, format="json"):
+    return f"{cache_key(provider_name, address)}{cache_formats.FORMATS[format]['extension']}"
+
+# Name of the entry before addresses were canonicalized, still read so existing caches keep working
+def legacy_entry_name(provider_name, address):
+    return f"{raw_cache_key(provider_name, address)}.json"
+
+# Create a unique cache path based on provider name and address (file backend)
+def cache_path(provider_name, address):
+    return os.path.join(CACHE_DIR, entry_name(provider_name, address, CACHE_FORMAT))
+
+# Lock files used to coordinate fetches of the same entry between processes (any backend)
+def lock_dir():
+    return os.path.join(CACHE_DIR, "locks")
+
+def lock_path(provider_name, address):
+    return os.path.join(lock_dir(), f"{cache_key(provider_name, address)}.lock")
 
 # Save data to cache with a timestamp
-def save_to_cache(provider_name, address, data):
-    make_cache_dir()
-    # Convert DataFrame to list of dicts for JSON serialization
-    if isinstance(data, pd.DataFrame):
-        data = data.to_dict(orient="records")
-    entry = {
-        'timestamp': time.time(),
-        'data': data
-    }
-    with open(cache_path(provider_name, address), 'w') as f:
-        json.dump(entry, f)
-
-# Load data from cache if it exists and is not expired
-def load_from_cache(provider_name, address):
-    path = cache_path(provider_name, address)
-    if not os.path.exists(path):
+def save_to_cache(provider_name, address, data, memory=None, normalized=False):
+    """
+    Args:
+        memory (MemoryLRU): Memory tier of the entry (default MEMORY_CACHE).
+        normalized (bool): True if data is the result of the normalize of the loads.
+    """
+    if memory is None:
+        memory = MEMORY_CACHE
+    backend = get_backend()
+    timestamp = time.time()
+    memory.set(memory_key(provider_name, address, normalized), data, timestamp)
+    memory.delete(memory_key(provider_name, address, not normalized))
+    format = CACHE_FORMAT if cache_formats.supports(CACHE_FORMAT, data) else "json"
+    value = cache_formats.FORMATS[format]['dumps'](timestamp, data)
+    backend.set(entry_name(provider_name, address, format), value, timestamp)
+    # an older entry in another format must not be read instead
+    for other in cache_formats.FORMATS:
+        if other != format:
+            backend.delete(entry_name(provider_name, address, other))
+    # the serialized offers of the previous data are outdated
+    memory.delete(ndjson_entry_name(provider_name, address))
+    backend.delete(ndjson_entry_name(provider_name, address))
+
+# Load data from cache if it exists and is not older than max_age (default CACHE_TIME)
+def load_from_cache(provider_name, address, max_age=None, normalize=None, memory=None):
+    """
+    Looks in the memory tier (default MEMORY_CACHE) first, then in the backend.
+    Data read from the backend is passed through normalize (if given) once
+    and kept in the memory tier with its original timestamp.
+    """
+    return load_entry(provider_name, address, max_age, normalize, memory)[1]
+
+def load_entry(provider_name, address, max_age=None, normalize=None, memory=None):
+    """
+    Same as load_from_cache, but returns (timestamp, data), or (None, None) if there is no
+    entry younger than max_age.
+    """
+    if max_age is None:
+        max_age = CACHE_TIME
+    if memory is None:
+        memory = MEMORY_CACHE
+    backend = get_backend()
+    key = memory_key(provider_name, address, normalize is not None)
+    timestamp, data = memory.get_entry(key, max_age)
+    if data is not None:
+        return timestamp, data
+    entry = read_entry(backend, provider_name, address)
+    if entry is None:
+        return None, None
+    format, name, value = entry
+    try:
+        timestamp, data = cache_formats.FORMATS[format]['loads'](value)
+    except Exception as e:
+        # e.g. truncated or emptied by a crash (writes are not synced), treat it as a miss
+        logging.error(f"Removing corrupt cache entry {name}: {e}")
+        backend.delete(name)
+        return None, None
+    if time.time() - timestamp > max_age:
+        return None, None
+    if normalize is not None:
+        data = normalize(data)
+    memory.set(key, data, timestamp)
+    return timestamp, data
+
+def read_entry(backend, provider_name, address):
+    """
+    Returns (format, name, bytes) of the stored entry, trying the configured format first,
+    or None if there is no entry.
+    """
+    formats = [CACHE_FORMAT] + [format for format in cache_formats.FORMATS if format != CACHE_FORMAT]
+    names = [(format, entry_name(provider_name, address, format)) for format in formats]
+    names.append(("json", legacy_entry_name(provider_name, address)))
+    for format, name in names:
+        value = backend.get(name)
+        if value is not None:
+            return format, name, value
+    return None
+
+# --- Serialized Offers ---
+# The NDJSON of a fresh entry is kept next to it, so hits are streamed without pandas.
+# It is only ever derived from a fresh entry and expires with it. Saving new data removes it,
+# and it is ignored if it was written with another version of the serialization, for older
+# data than the entry next to it (saved while the NDJSON was built) or if it is incomplete.
+
+# Allowed difference between the timestamp of an entry and its write time in the backend
+# (file modification times are not stored with full float precision)
+TIMESTAMP_TOLERANCE = 0.001
+
+def ndjson_entry_name(provider_name, address):
+    return f"{cache_key(provider_name, address)}.ndjson"
+
+def save_ndjson(provider_name, address, value, version, timestamp):
+    """
+    Stores the NDJSON bytes of the entry written at timestamp.
+    The first line of the stored value is a header with the timestamp, version and length.
+    """
+    backend = get_backend()
+    name = ndjson_entry_name(provider_name, address)
+    MEMORY_CACHE.set(name, (version, value), timestamp, size=len(value))
+    header = json.dumps({'timestamp': timestamp, 'version': version, 'length': len(value)}).encode()
+    backend.set(name, header + b"\n" + value, timestamp)
+    # save_to_cache writes the entry before it removes the NDJSON, so if new data was saved
+    # while this NDJSON was built, either it removed this NDJSON or the entry is newer now
+    if not is_current(backend, provider_name, address, timestamp):
+        MEMORY_CACHE.delete(name)
+        backend.delete(name)
+
+def is_current(backend, provider_name, address, timestamp):
+    """Returns True if the stored entry was written at timestamp."""
+    names = [entry_name(provider_name, address, format) for format in cache_formats.FORMATS]
+    names.append(legacy_entry_name(provider_name, address))
+    for name in names:
+        written = backend.timestamp(name)
+        if written is not None:
+            return abs(written - timestamp) <= TIMESTAMP_TOLERANCE
+    return False
+
+def load_ndjson(provider_name, address, version, max_age=None):
+    """Returns the stored NDJSON bytes if present in this version and not older than max_age, else None."""
+    if max_age is None:
+        max_age = CACHE_TIME
+    backend = get_backend()
+    name = ndjson_entry_name(provider_name, address)
+    timestamp, entry = MEMORY_CACHE.get_entry(name, max_age)
+    if entry is not None:
+        return entry[1] if entry[0] == version else None
+    value = backend.get(name)
+    if value is None:
         return None
-    with open(path) as f:
-        entry = json.load(f)
-    timestamp = entry.get('timestamp', 0)
-    if time.time() - timestamp > CACHE_TIME:
+    header, _, value = value.partition(b"\n")
+    try:
+        header = json.loads(header)
+    except ValueError as e:
+        logging.error(f"Removing corrupt cache entry {name}: {e}")
+        backend.delete(name)
         return None
-    data = entry.get('data')
-    # Convert list of dicts back to DataFrame
-    if isinstance(data, list):
-        try:
-            import pandas as pd
-            return pd.DataFrame(data)
-        except ImportError:
-            pass
+    if header.get('version') != version or time.time() - header.get('timestamp', 0) > max_age:
+        return None
+    if header.get('length') != len(value) or not is_current(backend, provider_name, address, header['timestamp']):
+        # e.g. truncated by a crash, or left over from older data
+        backend.delete(name)
+        return None
+    MEMORY_CACHE.set(name, (version, value), header['timestamp'], size=len(value))
+    return value
+
+# --- Off-Loop Access ---
+# Backend calls block (file I/O, the SQLite busy timeout of a locked database), so the async
+# paths run them in a worker thread and the shared event loop keeps serving other requests.
+# Hits of the memory tier are answered on the loop.
+
+async def load_entry_async(provider_name, address, max_age=None, normalize=None, memory=None):
+    """Same as load_entry, the backend is read in a worker thread."""
+    if memory is None:
+        memory = MEMORY_CACHE
+    key = memory_key(provider_name, address, normalize is not None)
+    timestamp, data = memory.get_entry(key, CACHE_TIME if max_age is None else max_age)
+    if data is not None:
+        return timestamp, data
+    return await asyncio.to_thread(load_entry, provider_name, address, max_age, normalize, memory)
+
+async def load_from_cache_async(provider_name, address, max_age=None, normalize=None, memory=None):
+    """Same as load_from_cache, the backend is read in a worker thread."""
+    return (await load_entry_async(provider_name, address, max_age, normalize, memory))[1]
+
+async def save_to_cache_async(provider_name, address, data, memory=None, normalized=False):
+    """Same as save_to_cache, the backend is written in a worker thread."""
+    await asyncio.to_thread(save_to_cache, provider_name, address, data, memory, normalized)
+
+async def load_ndjson_async(provider_name, address, version, max_age=None):
+    """Same as load_ndjson, the backend is read in a worker thread."""
+    name = ndjson_entry_name(provider_name, address)
+    timestamp, entry = MEMORY_CACHE.get_entry(name, CACHE_TIME if max_age is None else max_age)
+    if entry is not None:
+        return entry[1] if entry[0] == version else None
+    return await asyncio.to_thread(load_ndjson, provider_name, address, version, max_age)
+
+async def save_ndjson_async(provider_name, address, value, version, timestamp):
+    """Same as save_ndjson, the backend is written in a worker thread."""
+    await asyncio.to_thread(save_ndjson, provider_name, address, value, version, timestamp)
+
+async def iter_provider_ndjson_async(provider_name, address, iter_func, normalize, serialize, version):
+    """
+    Same as iter_provider_data_async, but yields serialize(batch), the NDJSON bytes of each batch.
+    Hits of fresh entries are served from their stored NDJSON, which is created on the first hit.
+    """
+    value = await load_ndjson_async(provider_name, address, version)
+    if value is not None:
+        yield value
+        return
+    timestamp, data = await load_entry_async(provider_name, address, normalize=normalize)
+    if data is not None:
+        value = serialize(data)
+        await save_ndjson_async(provider_name, address, value, version, timestamp)
+        yield value
+        return
+    async for batch in iter_provider_data_async(provider_name, address, iter_func, normalize):
+        yield serialize(batch)
+
+# Mark offers served from an expired entry, so clients can tell them apart
+def mark_stale(data):
+    if isinstance(data, pd.DataFrame):
+        return data.assign(stale=True)
+    if isinstance(data, OfferBatch):
+        return data.mark_stale()
     return data
 
+def concat_batches(batches):
+    """Returns the fetched batches (DataFrames or offer batches) as one."""
+    if batches and isinstance(batches[0], OfferBatch):
+        return OfferBatch.concat(batches)
+    return pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
+
 # Retrieve provider data with caching
-def get_provider_data(provider_name, address, fetch_func):
+def get_provider_data(provider_name, address, fetch_func, normalize=None):
     """
     Try cache first, else call fetch_func(address), then cache it.
+    If given, normalize is applied to the data before it is cached, cached data is
+    returned as it is.
+    Concurrent misses for the same entry, in this process or others, call fetch_func only once.
     """
-    data = load_from_cache(provider_name, address)
+    data = load_from_cache(provider_name, address, normalize=normalize)
     if data is not None:
         return data
-    data = fetch_func(address)
-    # Only save to cache if data is a non-empty DataFrame
-    if isinstance(data, pd.DataFrame) and not data.empty:
-        save_to_cache(provider_name, address, data)
-    return data
\ No newline at end of file
+    return single_flight.do(
+        cache_key(provider_name, address),
+        lambda: fetch_and_cache(provider_name, address, fetch_func, normalize)
+    )
+
+def fetch_and_cache(provider_name, address, fetch_func, normalize=None):
+    # Only one process fetches, the others wait for the lock and then read its result
+    with single_flight.file_lock(lock_path(provider_name, address)):
+        data = load_from_cache(provider_name, address, normalize=normalize)
+        if data is not None:
+            return data
+        data = fetch_func(address)
+        if normalize is not None:
+            data = normalize(data)
+        # Only save to cache if data is a non-empty DataFrame or offer batch
+        if isinstance(data, (pd.DataFrame, OfferBatch)) and not data.empty:
+            save_to_cache(provider_name, address, data, normalized=normalize is not None)
+        return data
+
+# Stream provider data with caching, for async generator functions
+async def iter_provider_data_async(provider_name, address, iter_func, normalize=None):
+    """
+    Yield the cached data if present, else yield every batch of iter_func(address)
+    and cache all batches together once the provider is done.
+    If given, normalize is applied to every fetched batch, cached data is yielded as it is.
+    Concurrent misses for the same entry, in this process or others, stream iter_func only once.
+    Expired entries younger than CACHE_TIME + CACHE_STALE_TIME are yielded right away with
+    a "stale" column and refreshed in the background.
+    """
+    timestamp, data = await load_entry_async(provider_name, address, CACHE_TIME + CACHE_STALE_TIME, normalize)
+    if data is not None:
+        if time.time() - timestamp > CACHE_TIME:
+            schedule_refresh(provider_name, address, iter_func, normalize)
+            data = mark_stale(data)
+        yield data
+        return
+    async for batch in single_flight.stream(
+        cache_key(provider_name, address),
+        lambda: iter_and_cache_async(provider_name, address, iter_func, normalize)
+    ):
+        yield batch
+
+# Background refreshes of stale entries by cache key, only used from the shared event loop
+_refreshes = {}
+
+def schedule_refresh(provider_name, address, iter_func, normalize=None):
+    """
+    Refreshes the entry in a background task, unless a refresh of it is already running.
+    The refresh joins a fetch of the same entry that is already in flight.
+    """
+    key = cache_key(provider_name, address)
+    if key in _refreshes:
+        return _refreshes[key]
+    task = asyncio.ensure_future(refresh_async(provider_name, address, iter_func, normalize))
+    _refreshes[key] = task
+    task.add_done_callback(lambda _: _refreshes.pop(key, None))
+    return task
+
+async def refresh_async(provider_name, address, iter_func, normalize=None):
+    try:
+        async for _ in single_flight.stream(
+            cache_key(provider_name, address),
+            lambda: iter_and_cache_async(provider_name, address, iter_func, normalize)
+        ):
+            pass
+    except Exception as e:
+        logging.error(f"[{provider_name}] Refreshing cached offers failed: {e}")
+
+async def iter_and_cache_async(provider_name, address, iter_func, normalize=None):
+    # Only one process fetches, the others wait for the lock and then read its result
+    async with single_flight.file_lock_async(lock_path(provider_name, address)):
+        data = await load_from_cache_async(provider_name, address, normalize=normalize)
+        if data is not None:
+            yield data
+            return
+        batches = []
+        async for batch in iter_func(address):
+            if normalize is not None:
+                batch = normalize(batch)
+            batches.append(batch)
+            yield batch
+        # Only save to cache if data is not empty
+        data = concat_batches(batches)
+        if not data.empty:
+            await save_to_cache_async(provider_name, address, data, normalized=normalize is not None)
\ No newline at end of file
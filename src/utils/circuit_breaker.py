@@ -0,0 +1,79 @@
+import os
+import time
+import logging
+
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))  # consecutive failures
+RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))  # seconds
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Stops calling a provider that keeps failing.
+    - closed: calls go through, FAILURE_THRESHOLD consecutive failures open the circuit
+    - open: calls fail fast until RESET_TIMEOUT has passed
+    - half_open: a single probe call goes through, its success closes the circuit,
+      its failure (or abort) opens it again for another RESET_TIMEOUT
+    Only used from the shared event loop, so no lock is needed.
+    """
+    def __init__(self, name, failure_threshold=None, reset_timeout=None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold or FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or RESET_TIMEOUT
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def allow(self):
+        """Returns True if a call may be made now."""
+        if self.state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self.probing = False
+        if self.state == HALF_OPEN:
+            # let exactly one probe through
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+        return self.state == CLOSED
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logging.info(f"[{self.name}] Circuit closed.")
+        self.state = CLOSED
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logging.error(f"[{self.name}] Circuit opened after {self.failures} failures.")
+            self.state = OPEN
+            self.opened_at = self.clock()
+            self.probing = False
+
+    def record_abort(self):
+        """
+        Records a call that ended without an outcome, e.g. cancelled or its stream closed
+        by the caller. An aborted probe counts as a failure, so the next probe is let
+        through after RESET_TIMEOUT. Aborts in the closed state are not counted.
+        """
+        if self.state == HALF_OPEN:
+            self.record_failure()
+
+# One circuit breaker per provider
+_breakers = {}
+
+def get_breaker(name):
+    """Returns the circuit breaker of the given provider, creating it on first use."""
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name)
+    return _breakers[name]
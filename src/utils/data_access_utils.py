@@ -1,9 +1,16 @@
+import os
+import asyncio
 import time
+import random
 import logging
 import pandas as pd
 
+from src.utils import circuit_breaker
+
 MAX_RETRIES = 3
 RETRY_BACKOFF = 5  # seconds
+# Time budget of one provider in one search, including all retries
+PROVIDER_DEADLINE = float(os.getenv("PROVIDER_DEADLINE", "180"))  # seconds
 
 def safe_get_offers(get_offers_func, address, provider_name):
     """
@@ -22,4 +29,110 @@ def safe_get_offers(get_offers_func, address, provider_name):
                 time.sleep(RETRY_BACKOFF ** attempt)
             else:
                 logging.error(f"[{provider_name}] All retries failed. Returning empty DataFrame.")
-                return pd.DataFrame()
\ No newline at end of file
+                return pd.DataFrame()
+
+def backoff_delay(attempt):
+    """
+    Returns a random delay between 0 and RETRY_BACKOFF ** attempt seconds (full jitter),
+    so that retries of many searches do not hit a provider at the same time.
+    """
+    return random.uniform(0, RETRY_BACKOFF ** attempt)
+
+async def iter_with_deadline(batches, deadline):
+    """
+    Yields the batches of an async generator, raises asyncio.TimeoutError if the deadline
+    (time.monotonic()) passes while waiting for the next batch.
+    """
+    try:
+        while True:
+            try:
+                batch = await asyncio.wait_for(batches.__anext__(), deadline - time.monotonic())
+            except StopAsyncIteration:
+                return
+            yield batch
+    finally:
+        await batches.aclose()
+
+async def safe_get_offers_async(get_offers_func, address, provider_name, deadline=None, raise_errors=False):
+    """
+    Async version of safe_get_offers, waits between retries without blocking a thread.
+    Retries use a jittered backoff and stop at the deadline. While the provider's
+    circuit breaker is open the call fails fast.
+    Args:
+        get_offers_func (function): Coroutine function to fetch offers.
+        address (dict): Address to fetch offers for.
+        provider_name (str): Name of the provider for logging.
+        deadline (float): time.monotonic() after which to give up, default in PROVIDER_DEADLINE seconds.
+        raise_errors (bool): Raise the error of the last attempt (CircuitOpenError if the circuit
+            is open) instead of returning an empty DataFrame, so callers can tell failures from
+            providers without offers.
+    """
+    breaker = circuit_breaker.get_breaker(provider_name)
+    if deadline is None:
+        deadline = time.monotonic() + PROVIDER_DEADLINE
+    for attempt in range(1, MAX_RETRIES + 1):
+        if not breaker.allow():
+            logging.error(f"[{provider_name}] Circuit open, skipping provider.")
+            if raise_errors:
+                raise circuit_breaker.CircuitOpenError(f"Circuit of {provider_name} is open")
+            return pd.DataFrame()
+        try:
+            offers = await asyncio.wait_for(get_offers_func(address), deadline - time.monotonic())
+            breaker.record_success()
+            return offers
+        except Exception as e:
+            breaker.record_failure()
+            logging.error(f"[{provider_name}] Attempt {attempt} failed: {e!r}")
+            error = e
+        except BaseException:
+            # cancelled, e.g. the client disconnected
+            breaker.record_abort()
+            raise
+        delay = backoff_delay(attempt)
+        if attempt == MAX_RETRIES or time.monotonic() + delay >= deadline:
+            if raise_errors:
+                raise error
+            logging.error(f"[{provider_name}] All retries failed. Returning empty DataFrame.")
+            return pd.DataFrame()
+        await asyncio.sleep(delay)
+
+async def safe_iter_offers_async(iter_offers_func, address, provider_name, deadline=None):
+    """
+    Streaming version of safe_get_offers_async, yields the batches of iter_offers_func.
+    A failed attempt is only retried if it did not yield any offers yet, otherwise
+    the offers would be sent twice and the error is raised.
+    Args:
+        iter_offers_func (function): Async generator function yielding DataFrames of offers.
+        address (dict): Address to fetch offers for.
+        provider_name (str): Name of the provider for logging.
+        deadline (float): time.monotonic() after which to give up, default in PROVIDER_DEADLINE seconds.
+    """
+    breaker = circuit_breaker.get_breaker(provider_name)
+    if deadline is None:
+        deadline = time.monotonic() + PROVIDER_DEADLINE
+    for attempt in range(1, MAX_RETRIES + 1):
+        if not breaker.allow():
+            logging.error(f"[{provider_name}] Circuit open, skipping provider.")
+            return
+        streamed = False
+        try:
+            async for batch in iter_with_deadline(iter_offers_func(address), deadline):
+                streamed = True
+                yield batch
+            breaker.record_success()
+            return
+        except Exception as e:
+            breaker.record_failure()
+            logging.error(f"[{provider_name}] Attempt {attempt} failed: {e!r}")
+            if streamed:
+                logging.error(f"[{provider_name}] Offers were already streamed, not retrying.")
+                raise
+        except BaseException:
+            # cancelled or closed by the caller before the provider was done
+            breaker.record_abort()
+            raise
+        delay = backoff_delay(attempt)
+        if attempt == MAX_RETRIES or time.monotonic() + delay >= deadline:
+            logging.error(f"[{provider_name}] All retries failed. No offers streamed.")
+            return
+        await asyncio.sleep(delay)
\ No newline at end of file
@@ -0,0 +1,105 @@
+import os
+import json
+import asyncio
+import threading
+import aiohttp
+from yarl import URL
+
+# --- Shared event loop ---
+# One long-lived event loop per process, running in a daemon thread.
+# All provider requests are scheduled on this loop, so no request has to
+# create its own loop or hop through the default executor.
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_loop():
+    """
+    Returns the shared event loop, starting its thread on first use.
+    The loop is created lazily so that every gunicorn worker gets its own
+    loop after forking.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="http-client-loop", daemon=True)
+            thread.start()
+            _loop = loop
+    return _loop
+
+def submit(coro):
+    """
+    Schedules a coroutine on the shared loop.
+    Returns:
+        concurrent.futures.Future: Future with the result of the coroutine.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+def run(coro, timeout=None):
+    """
+    Runs a coroutine on the shared loop and blocks until it is done.
+    Must not be called from inside the shared loop itself.
+    """
+    return submit(coro).result(timeout)
+
+# --- Shared connection pools ---
+# One aiohttp session (with its own keep-alive connection pool) per provider host.
+# Pool sizes can be configured per host, e.g.
+# HTTP_POOL_SIZES = {"servus-speed.gendev7.check24.fun": 10}
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))  # Default connections per host
+POOL_SIZES = json.loads(os.getenv("HTTP_POOL_SIZES", "{}"))
+KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))  # seconds
+DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))  # seconds
+
+_sessions = {}
+
+def pool_size(host):
+    """Returns the configured pool size for the given host."""
+    return int(POOL_SIZES.get(host, POOL_SIZE))
+
+async def get_session(url=None):
+    """
+    Returns the pooled aiohttp session for the host of the given url, creating it on first use.
+    Without url a general purpose session is returned.
+    Must be awaited on the shared loop, the sessions are bound to it.
+    """
+    host = URL(url).host if url else None
+    session = _sessions.get(host)
+    if session is None or session.closed:
+        size = pool_size(host)
+        connector = aiohttp.TCPConnector(
+            limit=size,
+            limit_per_host=size,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        _sessions[host] = session
+    return session
+
+async def warm_up(urls, connections=1):
+    """
+    Resolves DNS and opens keep-alive connections (including the TLS handshake)
+    to the given urls, so the first search does not pay for the connection setup.
+    Errors are ignored, warm-up is best effort.
+    Args:
+        urls (list): Urls of the provider APIs.
+        connections (int): Number of connections to open per url.
+    """
+    async def open_connection(url):
+        session = await get_session(url)
+        try:
+            timeout = aiohttp.ClientTimeout(total=10)
+            async with session.head(url, allow_redirects=False, timeout=timeout) as resp:
+                await resp.read()
+        except Exception as e:
+            print(f"Warm-up for {URL(url).host} failed: {e}")
+
+    await asyncio.gather(*[open_connection(url) for url in urls for _ in range(connections)])
+
+async def close_sessions():
+    """Closes all pooled aiohttp sessions."""
+    for session in list(_sessions.values()):
+        if not session.closed:
+            await session.close()
+    _sessions.clear()
@@ -0,0 +1,83 @@
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from src.utils.offer_batch import OfferBatch
+
+def estimate_size(value):
+    """
+    Returns the approximate memory size of a cached value in bytes.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, OfferBatch):
+        return value.nbytes
+    if isinstance(value, (bytes, str)):
+        return sys.getsizeof(value)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+class MemoryLRU:
+    """
+    In-memory LRU cache bounded by number of entries and total size in bytes.
+    Every entry keeps the timestamp it was originally written with, so the same
+    max_age as for the disk cache can be applied.
+    Thread safe.
+    """
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (timestamp, value, size)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, max_age):
+        """Returns the value if present and not older than max_age seconds, else None."""
+        return self.get_entry(key, max_age)[1]
+
+    def get_entry(self, key, max_age):
+        """Same as get, but returns (timestamp, value), or (None, None) if missing or expired."""
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None, None
+            timestamp, value, _ = item
+            if time.time() - timestamp > max_age:
+                return None, None
+            self.entries.move_to_end(key)
+            return timestamp, value
+
+    def set(self, key, value, timestamp, size=None):
+        """Stores the value, evicting the least recently used entries if needed."""
+        if size is None:
+            size = estimate_size(value)
+        with self.lock:
+            self.pop(key)
+            if size > self.max_bytes or self.max_entries <= 0:
+                return
+            self.entries[key] = (timestamp, value, size)
+            self.total_bytes += size
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def pop(self, key):
+        # callers hold the lock
+        item = self.entries.pop(key, None)
+        if item is not None:
+            self.total_bytes -= item[2]
+
+    def delete(self, key):
+        with self.lock:
+            self.pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
@@ -0,0 +1,71 @@
+import json
+import itertools
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library encoder is used instead
+    orjson = None
+
+from src.utils.offer_batch import OFFER_COLUMNS
+
+# --- NDJSON Serializer ---
+# Writes an OfferBatch as NDJSON straight from its column arrays: every column is encoded
+# at once (numbers with orjson in one call per column if it is installed), then the lines are
+# joined from the encoded columns, without a dict per offer. Missing values (the mask of the
+# batch, NaN, infinity, pd.NA and None) are written as null, JSON has no infinity. Both backends write compact JSON with the
+# same keys and values, orjson keeps non-ASCII characters as UTF-8 instead of escaping them.
+
+def encode_strings(values, dumps):
+    # the same few values (provider, connection type, tv) repeat, so each is encoded once
+    encoded = {}
+    for value in values:
+        if value not in encoded:
+            encoded[value] = None if pd.isna(value) else dumps(value)
+    return [encoded[value] for value in values]
+
+def encode_column(values, missing, kind):
+    """Returns the JSON of every value of a column, None for missing values."""
+    if kind == "str":
+        dumps = (lambda value: orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)) if orjson is not None else json.dumps
+        encoded = encode_strings(values.tolist(), dumps)
+    elif orjson is not None:
+        # a JSON array of numbers or booleans only has commas between the values, NaN is null
+        encoded = orjson.dumps(values, option=orjson.OPT_SERIALIZE_NUMPY)[1:-1].split(b",")
+    elif kind == "float":
+        encoded = list(map(float.__repr__, values.tolist()))
+        missing = missing | ~np.isfinite(values)
+    elif kind == "int":
+        encoded = list(map(int.__repr__, values.tolist()))
+    else:
+        encoded = ["true" if value else "false" for value in values.tolist()]
+    if missing.any():
+        encoded = [None if m else value for value, m in zip(encoded, missing.tolist())]
+    return encoded
+
+def dumps_offers(batch):
+    """
+    Converts a batch of offers to NDJSON, one JSON object per line.
+    Args:
+        batch (OfferBatch): Normalized offers.
+    Returns:
+        bytes: The offers as NDJSON, one chunk for the whole batch.
+    """
+    if not batch.length:
+        return b""
+    null = b"null" if orjson is not None else "null"
+    columns = []
+    for i, (column, kind) in enumerate(OFFER_COLUMNS.items()):
+        prefix = ("{" if i == 0 else ",") + json.dumps(column) + ":"
+        if orjson is not None:
+            prefix = prefix.encode()
+        encoded = encode_column(batch.values[column], batch.missing[column], kind)
+        columns.append([prefix + (null if value is None else value) for value in encoded])
+    end = ',"stale":true}\n' if batch.stale else "}\n"
+    columns.append(itertools.repeat(end.encode() if orjson is not None else end, batch.length))
+    lines = itertools.chain.from_iterable(zip(*columns))
+    if orjson is not None:
+        return b"".join(lines)
+    return "".join(lines).encode()
@@ -0,0 +1,90 @@
+import os
+import time
+
+from src.utils import cache_utils, cache_formats, memory_cache, for_string
+
+# --- Nominatim Cache ---
+# Address validation and autocomplete results change rarely, so they are kept for
+# NOMINATIM_CACHE_TIME seconds in a memory LRU of their own (provider results are not evicted by them)
+# and, with NOMINATIM_CACHE_PERSIST, also in the cache backend shared by all workers.
+NOMINATIM_CACHE_TIME = int(float(os.getenv("NOMINATIM_CACHE_TIME", str(7 * 24 * 3600))))
+NOMINATIM_CACHE_ENTRIES = int(os.getenv("NOMINATIM_CACHE_ENTRIES", "4096"))
+NOMINATIM_CACHE_BYTES = int(float(os.getenv("NOMINATIM_CACHE_BYTES", str(16 * 1024 * 1024))))
+NOMINATIM_CACHE_PERSIST = for_string.str2bool(os.getenv("NOMINATIM_CACHE_PERSIST", "false"))
+
+MEMORY_CACHE = memory_cache.MemoryLRU(NOMINATIM_CACHE_ENTRIES, NOMINATIM_CACHE_BYTES)
+
+def entry_name(kind, params):
+    # address fields in params are canonicalized, so spellings of the same address share an entry
+    return f"{cache_utils.cache_key(f'Nominatim {kind}', params)}.json"
+
+def load(kind, params):
+    """Returns the cached result of the lookup, or None."""
+    name = entry_name(kind, params)
+    value = MEMORY_CACHE.get(name, NOMINATIM_CACHE_TIME)
+    if value is not None or not NOMINATIM_CACHE_PERSIST:
+        return value
+    stored = cache_utils.get_backend().get(name)
+    if stored is None:
+        return None
+    try:
+        timestamp, data = cache_formats.loads_json(stored)
+    except ValueError:
+        return None
+    if time.time() - timestamp > NOMINATIM_CACHE_TIME:
+        return None
+    MEMORY_CACHE.set(name, data['value'], timestamp)
+    return data['value']
+
+def save(kind, params, value):
+    name = entry_name(kind, params)
+    timestamp = time.time()
+    MEMORY_CACHE.set(name, value, timestamp)
+    if NOMINATIM_CACHE_PERSIST:
+        # wrapped, so lists are not turned into DataFrames when loaded
+        cache_utils.get_backend().set(name, cache_formats.dumps_json(timestamp, {'value': value}), timestamp)
+
+def cached(kind, params, fetch, keep=None):
+    """
+    Returns the cached result of the lookup, else fetch() (which must not return None) and caches it.
+    Args:
+        kind (str): Type of the lookup, e.g. "validation".
+        params (dict): Parameters of the lookup, JSON serializable.
+        fetch (function): Makes the lookup.
+        keep (function): keep(value) returns False for results that are not cached (default: all are).
+    """
+    value = load(kind, params)
+    if value is None:
+        value = fetch()
+        if keep is None or keep(value):
+            save(kind, params, value)
+    return value
+
+def cached_prefix(kind, params, query, fetch, matches):
+    """
+    Same as cached, for prefix searches (autocomplete). A complete result for a prefix of
+    the query already contains every match of the query, so it is filtered instead of
+    making a new lookup, e.g. the results for "101" answer "1011".
+    Args:
+        kind (str): Type of the lookup, e.g. "plz".
+        params (dict): Parameters of the lookup besides the query.
+        query (str): The searched prefix.
+        fetch (function): fetch(query) returns {"complete": bool, "suggestions": list},
+            complete is True if the suggestions are all matches of the query.
+        matches (function): matches(suggestion, query) returns True if the suggestion matches the query.
+    Returns:
+        list: Suggestions for the query.
+    """
+    entry = load(kind, {**params, "query": query})
+    if entry is not None:
+        return entry["suggestions"]
+    for end in range(len(query) - 1, 0, -1):
+        shorter = load(kind, {**params, "query": query[:end]})
+        # an empty result is never reused, the longer query may still have matches
+        if shorter is not None and shorter["complete"] and shorter["suggestions"]:
+            entry = {"complete": True, "suggestions": [s for s in shorter["suggestions"] if matches(s, query)]}
+            break
+    else:
+        entry = fetch(query)
+    save(kind, {**params, "query": query}, entry)
+    return entry["suggestions"]
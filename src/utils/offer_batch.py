@@ -0,0 +1,230 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+# --- Offer Batches ---
+# The offers streamed by /offers in a compact, typed form: one NumPy array per column of
+# OFFER_SCHEMA plus a mask of the missing values, instead of a DataFrame of object columns.
+# Providers build their batches straight from the parsed offers (records or column arrays),
+# everything after that (memory tier, stored NDJSON, serialization) works on the arrays. Missing values stay missing until
+# they are serialized (None in records, null in JSON).
+
+# Columns of an offer:
+# - "type": "float" (float64), "int" (int64), "bool" (bool) or "str" (Python objects)
+# - "from": provider columns the value is taken from, the first one that is not missing
+#   (default: the column itself)
+# - "default": value if all of them are missing (default: missing)
+OFFER_SCHEMA = {
+    "provider": {"type": "str"},
+    "name": {"type": "str"},
+    "cost_eur": {"type": "float"},
+    # if no promo price is given, use cost_eur
+    "cost_first_years_eur": {"type": "float", "from": ["promo_price_eur", "cost_eur"]},
+    "promo_price_eur": {"type": "float"},
+    # if the price does not change after two years, use cost_eur
+    "after_two_years_eur": {"type": "float", "from": ["after_two_years_eur", "cost_eur"]},
+    "voucher_fixed_eur": {"type": "float"},
+    "voucher_percent": {"type": "int"},
+    # shown in the cost details of an offer
+    "promo_duration_months": {"type": "int"},
+    "speed_mbps": {"type": "int"},
+    "connection_type": {"type": "str"},
+    "duration_months": {"type": "int"},
+    "max_age": {"type": "int"},
+    "limit_from_gb": {"type": "int"},
+    "tv": {"type": "str"},
+    # if no information about the installation is given, assume it is not included
+    "installation_included": {"type": "bool", "default": False},
+}
+
+OFFER_COLUMNS = {column: field["type"] for column, field in OFFER_SCHEMA.items()}
+
+DTYPES = {"float": np.float64, "int": np.int64, "bool": np.bool_, "str": object}
+
+# Value stored for missing values, the mask tells them apart
+EMPTY = {"float": np.nan, "int": 0, "bool": False, "str": None}
+
+def to_array(series, kind):
+    """
+    Returns (values, missing) of a column as arrays of the given type. Columns that
+    already have the NumPy dtype are not copied.
+    """
+    missing = series.isna().to_numpy()
+    if kind == "str":
+        values = series.to_numpy(dtype=object, copy=True)
+        values[missing] = None
+    elif series.dtype == DTYPES[kind]:
+        values = series.to_numpy()
+    elif kind == "bool":
+        values = series.to_numpy(dtype=object, na_value=False).astype(np.bool_)
+    else:
+        # nullable and object columns are converted through float64
+        values = series.to_numpy(dtype=np.float64, na_value=EMPTY[kind]).astype(DTYPES[kind], copy=False)
+    return values, missing
+
+def is_missing(value):
+    return value is None or value is pd.NA or (isinstance(value, float) and value != value)
+
+def values_to_array(values, kind):
+    """
+    Same as to_array for a list or NumPy array of values, None, NaN and pd.NA are missing.
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind in "biuf":
+        missing = np.isnan(values) if values.dtype.kind == "f" else np.zeros(len(values), dtype=bool)
+        if kind != "str":
+            if values.dtype != DTYPES[kind]:
+                values = np.where(missing, EMPTY[kind], values).astype(DTYPES[kind])
+            return values, missing
+    values = list(values) if isinstance(values, np.ndarray) else values
+    missing = np.fromiter(map(is_missing, values), dtype=bool, count=len(values))
+    if kind == "str":
+        array = np.empty(len(values), dtype=object)
+        array[:] = [None if m else value for value, m in zip(values, missing.tolist())]
+    elif kind == "bool":
+        array = np.array([not m and bool(value) for value, m in zip(values, missing.tolist())], dtype=np.bool_)
+    else:
+        # converted through float64 like to_array, integers are truncated
+        array = np.array([EMPTY[kind] if m else float(value) for value, m in zip(values, missing.tolist())],
+                         dtype=np.float64).astype(DTYPES[kind], copy=False)
+    return array, missing
+
+class OfferBatch:
+    """
+    Offers of one provider batch, column by column.
+    Attributes:
+        length (int): Number of offers.
+        values (dict): Column name -> array of the values, see OFFER_COLUMNS.
+        missing (dict): Column name -> bool array, True where the value is missing.
+        stale (bool): True if the offers come from an expired cache entry.
+    """
+    __slots__ = ("length", "values", "missing", "stale")
+
+    def __init__(self, length, values, missing, stale=False):
+        self.length = length
+        self.values = values
+        self.missing = missing
+        self.stale = stale
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Normalizes a DataFrame of offers in one pass over OFFER_SCHEMA: every provider
+        column is converted once, derived columns and defaults are filled in, columns
+        that are not in OFFER_SCHEMA are dropped.
+        Args:
+            df (pd.DataFrame): Offers of a provider, or offers normalized before.
+        Returns:
+            OfferBatch: The normalized offers.
+        """
+        stale = "stale" in df.columns and bool(df["stale"].any())
+        return cls.from_columns({column: df[column] for column in df.columns}, len(df), stale)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Same as from_frame for a list of offers (dicts with the provider columns), without a DataFrame.
+        """
+        keys = set().union(*records)
+        columns = {column: [record.get(column) for record in records] for column in OFFER_COLUMNS if column in keys}
+        return cls.from_columns(columns, len(records))
+
+    @classmethod
+    def from_columns(cls, columns, length, stale=False):
+        """
+        Same as from_frame for offers given column by column.
+        Args:
+            columns (dict): Provider column -> pd.Series, list or NumPy array with a value per offer.
+            length (int): Number of offers.
+            stale (bool): True if the offers come from an expired cache entry.
+        Returns:
+            OfferBatch: The normalized offers.
+        """
+        arrays = {}     # provider column -> (values, missing)
+        values, missing = {}, {}
+        for column, field in OFFER_SCHEMA.items():
+            kind = field["type"]
+            column_values = np.full(length, EMPTY[kind], dtype=DTYPES[kind])
+            column_missing = np.ones(length, dtype=bool)
+            for source in field.get("from", [column]):
+                if source not in columns or not column_missing.any():
+                    continue
+                if source not in arrays:
+                    source_column = columns[source]
+                    if isinstance(source_column, pd.Series):
+                        arrays[source] = to_array(source_column, OFFER_COLUMNS[source])
+                    else:
+                        arrays[source] = values_to_array(source_column, OFFER_COLUMNS[source])
+                source_values, source_missing = arrays[source]
+                if column_missing.all():
+                    column_values, column_missing = source_values, source_missing
+                else:
+                    column_values = np.where(column_missing, source_values, column_values)
+                    column_missing = column_missing & source_missing
+            if "default" in field and column_missing.any():
+                column_values = np.where(column_missing, field["default"], column_values)
+                column_missing = np.zeros(length, dtype=bool)
+            values[column], missing[column] = column_values, column_missing
+        return cls(length, values, missing, stale)
+
+    @classmethod
+    def concat(cls, batches):
+        """Returns one batch with the offers of all batches."""
+        return cls(
+            sum(batch.length for batch in batches),
+            {column: np.concatenate([batch.values[column] for batch in batches]) for column in OFFER_COLUMNS},
+            {column: np.concatenate([batch.missing[column] for batch in batches]) for column in OFFER_COLUMNS},
+            any(batch.stale for batch in batches),
+        )
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def empty(self):
+        return self.length == 0
+
+    def __getitem__(self, column):
+        """Returns the values of a column as a list, None for missing values."""
+        missing = self.missing[column]
+        return [None if m else value for value, m in zip(self.values[column].tolist(), missing.tolist())]
+
+    def mark_stale(self):
+        """Returns the same offers marked as stale, the arrays are shared."""
+        return OfferBatch(self.length, self.values, self.missing, stale=True)
+
+    def records(self):
+        """Returns the offers as dicts of Python values, None for missing values."""
+        columns = [self[column] for column in OFFER_COLUMNS]
+        records = [dict(zip(OFFER_COLUMNS, row)) for row in zip(*columns)]
+        if self.stale:
+            for record in records:
+                record["stale"] = True
+        return records
+
+    def to_frame(self):
+        """Returns the offers as a DataFrame with nullable dtypes (Float64, Int64, boolean, object)."""
+        data = {}
+        for column, kind in OFFER_COLUMNS.items():
+            values, missing = self.values[column], self.missing[column]
+            if kind == "float":
+                data[column] = pd.arrays.FloatingArray(values, missing)
+            elif kind == "int":
+                data[column] = pd.arrays.IntegerArray(values, missing)
+            elif kind == "bool":
+                data[column] = pd.arrays.BooleanArray(values, missing)
+            else:
+                data[column] = values
+        df = pd.DataFrame(data, index=pd.RangeIndex(self.length))
+        if self.stale:
+            df["stale"] = True
+        return df
+
+    @property
+    def nbytes(self):
+        """Approximate memory size in bytes, including the strings."""
+        size = sum(array.nbytes for array in self.values.values()) + sum(array.nbytes for array in self.missing.values())
+        for column, kind in OFFER_COLUMNS.items():
+            if kind == "str":
+                size += sum(sys.getsizeof(value) for value in self.values[column] if value is not None)
+        return size
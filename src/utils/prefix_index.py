@@ -0,0 +1,118 @@
+import os
+import mmap
+import numpy as np
+
+from src.utils import address_utils
+
+# --- Offline Prefix Index ---
+# Postal codes and streets from a local dataset, for autocomplete without Nominatim.
+# Every table is a sorted array of records ("<search key>\x1f<value>", UTF-8) in one file,
+# plus the offsets of the records in a .npy file. Both are memory-mapped, so opening the
+# index is instant, it is shared by all workers through the page cache, and a prefix search
+# is a binary search over the records.
+
+# Between search key and value, sorts before any character of a key
+SEPARATOR = "\x1f"
+
+PLZ_TABLE = "plz"
+STREET_TABLE = "streets"
+
+def plz_key(plz):
+    return address_utils.canonical_plz(plz)
+
+def street_key(street, city):
+    # "Karl-Marx-Str." and "karl marx" are both found under "karlmarx..."
+    return f"{address_utils.canonical_city(city)}\t{address_utils.canonical_street(street)}"
+
+def write_table(directory, name, records):
+    """
+    Writes the records (tuples of search key and value) as a sorted table, without duplicates.
+    Returns:
+        int: number of records written
+    """
+    encoded = sorted({f"{key}{SEPARATOR}{value}".encode() for key, value in records})
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(record) for record in encoded])
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+    return len(encoded)
+
+def build_index(rows, directory):
+    """
+    Builds the index from rows of a dataset.
+    Args:
+        rows (iterable): Dicts with "plz", "city" and optionally "street".
+        directory (str): Directory to write the index to.
+    Returns:
+        dict: Number of records by table.
+    """
+    os.makedirs(directory, exist_ok=True)
+    plz_records, street_records = set(), set()
+    for row in rows:
+        plz, city, street = (str(row.get(field) or "").strip() for field in ("plz", "city", "street"))
+        if plz and city:
+            plz_records.add((plz_key(plz), f"{plz}\t{city}"))
+        if street and city:
+            street_records.add((street_key(street, city), street))
+    return {
+        PLZ_TABLE: write_table(directory, PLZ_TABLE, plz_records),
+        STREET_TABLE: write_table(directory, STREET_TABLE, street_records),
+    }
+
+class SortedTable:
+    """A memory-mapped table written by write_table."""
+    def __init__(self, directory, name):
+        self.offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r")
+        self.size = len(self.offsets) - 1
+        self.data = b""
+        if self.size:
+            with open(os.path.join(directory, f"{name}.bin"), "rb") as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def record(self, i):
+        return self.data[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+    def search(self, prefix, limit):
+        """
+        Returns the values of up to limit records whose key starts with prefix, in key order.
+        """
+        prefix = prefix.encode()
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.record(middle) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        values = []
+        for i in range(low, self.size):
+            record = self.record(i)
+            if not record.startswith(prefix) or len(values) >= limit:
+                break
+            values.append(record.decode().split(SEPARATOR, 1)[1])
+        return values
+
+class PrefixIndex:
+    """Postal code and street suggestions from an index built by build_index."""
+    def __init__(self, directory):
+        self.plz = SortedTable(directory, PLZ_TABLE)
+        self.streets = SortedTable(directory, STREET_TABLE)
+
+    def plz_suggestions(self, query, limit=10):
+        """Returns suggestions for postal codes starting with query, in the format of autocomplete.fetch_plz_suggestions."""
+        suggestions = []
+        for value in self.plz.search(plz_key(query), limit):
+            plz, city = value.split("\t", 1)
+            suggestions.append({"display": f"{plz} {city}", "postcode": plz, "city": city})
+        return suggestions
+
+    def street_suggestions(self, query, city, limit=10):
+        """Returns suggestions for streets in city starting with query, in the format of autocomplete.fetch_street_suggestions."""
+        return [{"display": street} for street in self.streets.search(street_key(query, city), limit)]
+
+def open_index(directory):
+    """Opens the index in directory, or returns None if there is none."""
+    if not os.path.exists(os.path.join(directory, f"{PLZ_TABLE}.offsets.npy")):
+        return None
+    return PrefixIndex(directory)
@@ -0,0 +1,172 @@
+import os
+import time
+import asyncio
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # no file locks on Windows, only coalesce within the process
+    fcntl = None
+
+# --- Coalescing within a process ---
+# Concurrent calls with the same key share one upstream call.
+
+class Call:
+    """Result of a synchronous call shared by all threads waiting for it."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+def do(key, func):
+    """
+    Runs func() once for all threads calling do() with the same key at the same time,
+    every caller gets its result (or its exception).
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = Call()
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+    try:
+        call.result = func()
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
+
+class Flight:
+    """Batches of an async stream shared by all coroutines waiting for it."""
+    def __init__(self):
+        self.batches = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+
+# Only used from the shared event loop, so no lock is needed
+_flights = {}
+
+async def run_flight(key, flight, iter_func):
+    try:
+        async for batch in iter_func():
+            async with flight.changed:
+                flight.batches.append(batch)
+                flight.changed.notify_all()
+    except Exception as e:
+        flight.error = e
+    finally:
+        # later callers start a new flight
+        del _flights[key]
+        async with flight.changed:
+            flight.done = True
+            flight.changed.notify_all()
+
+async def stream(key, iter_func):
+    """
+    Yields the batches of the async generator iter_func(), which is run only once for
+    all coroutines streaming the same key at the same time. Callers that join late
+    get the batches already received first.
+    The stream runs in its own task, so it finishes even if the first caller stops listening.
+    """
+    flight = _flights.get(key)
+    if flight is None:
+        flight = _flights[key] = Flight()
+        asyncio.ensure_future(run_flight(key, flight, iter_func))
+    received = 0
+    while True:
+        async with flight.changed:
+            await flight.changed.wait_for(lambda: received < len(flight.batches) or flight.done)
+        while received < len(flight.batches):
+            yield flight.batches[received]
+            received += 1
+        if flight.done and received == len(flight.batches):
+            if flight.error is not None:
+                raise flight.error
+            return
+
+# --- Coalescing across processes ---
+# Gunicorn workers coordinate through lock files: only the worker holding the lock
+# fetches, the others wait for it and then find the result in the cache.
+
+# The modification time of a lock file is its last use, so unused ones can be purged
+def touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def purge_locks(directory, max_age):
+    """
+    Removes the lock files in directory not used for max_age seconds, skipping locks held
+    right now. A process that opened a lock file just before it was removed locks the
+    removed file, at worst the entry is then fetched twice.
+    Returns:
+        int: number of removed lock files
+    """
+    if fcntl is None or not os.path.isdir(directory):
+        return 0
+    now = time.time()
+    deleted = 0
+    with os.scandir(directory) as it:
+        for entry in it:
+            if not entry.name.endswith(".lock") or now - entry.stat().st_mtime <= max_age:
+                continue
+            with open(entry.path, "a") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                try:
+                    os.remove(entry.path)
+                    deleted += 1
+                except FileNotFoundError:
+                    pass
+    return deleted
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Holds an exclusive lock on the file at path, blocking until it is free."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        touch(path)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+@contextlib.asynccontextmanager
+async def file_lock_async(path, poll_interval=0.2):
+    """Same as file_lock, but waits for the lock without blocking the event loop."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(poll_interval)
+        touch(path)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -2,6 +2,8 @@ import requests
 import os
 import json
 
+from src.utils import nominatim_cache
+
 NOMINATIM_URL = os.getenv("NOMINATIM_URL")
 HEADERS = json.loads(os.getenv("HEADERS"))
 
@@ -9,7 +11,17 @@ HEADERS = json.loads(os.getenv("HEADERS"))
 def validate_address(street, house_number, plz, city):
     """
     Returns True if the address exists according to Nominatim, else False.
+    Existing addresses are cached, spellings of the same address share an entry (see nominatim_cache).
+    False is not cached: Nominatim may reject one spelling of an address it finds in another,
+    or answer wrongly once, and the shared entry would then reject every spelling.
     """
+    address = {"street": street, "house_number": house_number, "plz": plz, "city": city}
+    return nominatim_cache.cached(
+        "validation", address, lambda: address_exists(street, house_number, plz, city), keep=bool
+    )
+
+def address_exists(street, house_number, plz, city):
+    """Asks Nominatim whether the address exists."""
     params = {
         "street": f"{house_number} {street}",
         "city": city,
@@ -0,0 +1,16 @@
+import contextlib
+
+class InFlight:
+    """Counts the fake requests in flight and the most that were in flight at the same time."""
+    def __init__(self):
+        self.now = 0
+        self.max = 0
+
+    @contextlib.contextmanager
+    def track(self):
+        self.now += 1
+        self.max = max(self.max, self.now)
+        try:
+            yield
+        finally:
+            self.now -= 1
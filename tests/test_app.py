@@ -1,7 +1,10 @@
+import json
 import pytest
+import pandas as pd
 from unittest.mock import patch
 
-from src.app import app
+from src.app import app, NDJSON_VERSION
+from src.providers.base import ProviderFetcher
 
 @pytest.fixture
 # Create a test client for the Flask application
@@ -49,4 +52,71 @@ def test_share_and_view_snapshot(client):
 # Test if /share endpoint returns an error if no offers are provided
 def test_share_missing_offers(client):
     response = client.post("/share", json={"filters": {}})
-    assert response.status_code == 400
\ No newline at end of file
+    assert response.status_code == 400
+
+# Test the /offers endpoint streams NDJSON offers from every provider
+def test_offers_stream(client, monkeypatch, tmp_path):
+    class FakeFetcher(ProviderFetcher):
+        def __init__(self, name):
+            self.name = name
+        async def get_offers_async(self, address):
+            return pd.DataFrame([{"provider": self.name, "name": "Offer", "cost_eur": 30.0}])
+
+    fetchers = {name: FakeFetcher(name) for name in ["A", "B"]}
+    monkeypatch.setattr(app, "secret_key", "test")
+    monkeypatch.setattr("src.app.cache_utils.CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr("src.app.PROVIDER_FETCHERS", fetchers)
+    monkeypatch.setattr("src.app.validation.validate_address", lambda *a: True)
+    monkeypatch.setattr("src.app.cache_utils.load_from_cache", lambda *a, **kw: None)
+    monkeypatch.setattr("src.app.cache_utils.save_to_cache", lambda *a: None)
+
+    response = client.get("/offers?street=Hauptstrasse&house_number=5A&plz=10115&city=Berlin")
+    assert response.status_code == 200
+    offers = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert {offer["provider"] for offer in offers} == {"A", "B"}
+    # normalize_offers is applied, so the derived columns are present
+    assert all(offer["cost_first_years_eur"] == 30.0 for offer in offers)
+
+# Test that /offers streams every batch of a streaming provider and caches them together
+def test_offers_stream_batches(client, monkeypatch, tmp_path):
+    class StreamingFetcher(ProviderFetcher):
+        async def iter_offers_async(self, address):
+            for i in range(3):
+                yield pd.DataFrame([{"provider": "S", "name": f"Offer {i}", "cost_eur": 30.0}])
+
+    saved = {}
+    monkeypatch.setattr(app, "secret_key", "test")
+    monkeypatch.setattr("src.app.cache_utils.CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr("src.app.PROVIDER_FETCHERS", {"S": StreamingFetcher()})
+    monkeypatch.setattr("src.app.validation.validate_address", lambda *a: True)
+    monkeypatch.setattr("src.app.cache_utils.load_from_cache", lambda *a, **kw: None)
+    monkeypatch.setattr("src.app.cache_utils.save_to_cache", lambda name, address, data, *args: saved.update({name: data}))
+
+    response = client.get("/offers?street=Hauptstrasse&house_number=5A&plz=10115&city=Berlin")
+    offers = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [offer["name"] for offer in offers] == ["Offer 0", "Offer 1", "Offer 2"]
+    assert list(saved["S"]["name"]) == ["Offer 0", "Offer 1", "Offer 2"]
+
+# Test that repeated searches are streamed from the stored NDJSON, which is rebuilt for a new version
+def test_offers_stream_cached_ndjson(client, monkeypatch, tmp_path):
+    class CountingFetcher(ProviderFetcher):
+        calls = 0
+        async def get_offers_async(self, address):
+            CountingFetcher.calls += 1
+            return pd.DataFrame([{"provider": "C", "name": "Offer", "cost_eur": 30.0}])
+
+    monkeypatch.setattr(app, "secret_key", "test")
+    monkeypatch.setattr("src.app.cache_utils.CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr("src.app.PROVIDER_FETCHERS", {"C": CountingFetcher()})
+    monkeypatch.setattr("src.app.validation.validate_address", lambda *a: True)
+    url = "/offers?street=Hauptstrasse&house_number=5A&plz=10115&city=Berlin"
+
+    first = client.get(url).data
+    client.get(url)  # the first hit stores the NDJSON
+    serialized = []
+    monkeypatch.setattr("src.app.offers_to_ndjson", lambda df: serialized.append(df) or b"")
+    assert client.get(url).data == first
+    assert serialized == [] and CountingFetcher.calls == 1
+    monkeypatch.setattr("src.app.NDJSON_VERSION", NDJSON_VERSION + 1)
+    client.get(url)
+    assert len(serialized) == 1 and CountingFetcher.calls == 1
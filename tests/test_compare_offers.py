@@ -6,6 +6,7 @@ from src.compare_offers import (fill_columns,
                                 filter_installation, filter_limit, filter_provider, filter_age,
                                 sort_by_after_two_years_cost, sort_by_first_years_cost, sort_by_speed
                                 )
+from src.utils.offer_batch import OFFER_SCHEMA
 from src.providers.fetch_byteme import ByteMeFetcher
 from src.providers.fetch_pingperfect import PingPerfectFetcher
 from src.providers.fetch_servusspeed import ServusSpeedFetcher
@@ -14,16 +15,24 @@ from src.providers.fetch_webwunder import WebWunderFetcher
 
 # ---Test cases for the compare_offers module---
 
-# Test that fill_columns replaces NaN and pd.NA with None
-def test_fill_columns_no_nan_or_pdna():
+# Test that fill_columns derives the cost columns, applies defaults and keeps missing values as NA
+def test_fill_columns_schema():
     df = pd.DataFrame({
-        "a": [1, np.nan, pd.NA, None],
-        "b": [None, "x", np.nan, pd.NA]
+        "provider": ["A", "A", "B", None],
+        "cost_eur": [30.0, 40.0, np.nan, pd.NA],
+        "promo_price_eur": [25.0, None, np.nan, None],
+        "after_two_years_eur": [35.0, pd.NA, None, np.nan],
+        "max_age": [27, np.nan, None, pd.NA],
+        "installation_included": [True, None, False, np.nan],
+        "unknown": [1, 2, 3, 4],
     })
     df_filled = fill_columns(df)
-    for col in df_filled.columns:
-        for val in df_filled[col]:
-            assert val is None or not (pd.isna(val)), f"Found {val} in column {col}"
+    assert list(df_filled.columns) == list(OFFER_SCHEMA)
+    assert df_filled["cost_first_years_eur"].tolist()[:2] == [25.0, 40.0] and df_filled["cost_first_years_eur"].isna().tolist()[2:] == [True, True]
+    assert df_filled["after_two_years_eur"].tolist()[:2] == [35.0, 40.0]
+    assert df_filled["installation_included"].tolist() == [True, False, False, False]
+    assert str(df_filled["max_age"].dtype) == "Int64" and df_filled["max_age"].isna().tolist() == [False, True, True, True]
+    assert df_filled["provider"].tolist() == ["A", "A", "B", None] and df_filled["tv"].isna().all()
 
 # Test filtering functions
 def test_filter_speed():
@@ -0,0 +1,65 @@
+import pandas as pd
+
+from src import prewarm
+from src.utils import cache_utils, circuit_breaker, data_access_utils
+from src.providers.base import ProviderFetcher
+
+class FakeFetcher(ProviderFetcher):
+    def __init__(self, name, offers=True, error=None):
+        self.name = name
+        self.offers = offers
+        self.error = error
+        self.calls = []
+    async def get_offers_async(self, address):
+        self.calls.append(address)
+        if self.error is not None:
+            raise self.error
+        if not self.offers:
+            return pd.DataFrame()
+        return pd.DataFrame([{"provider": self.name, "name": "Offer", "cost_eur": 30.0}])
+
+# Test that addresses are read from CSV and JSONL files and encoded like in /offers
+def test_read_addresses(tmp_path):
+    csv_path = tmp_path / "addresses.csv"
+    csv_path.write_text("street,house_number,plz,city\nHauptstraße,5A,10115,Berlin\nMissing,,10115,Berlin\n", encoding="utf-8")
+    jsonl_path = tmp_path / "addresses.jsonl"
+    jsonl_path.write_text('{"street": "Hauptstraße", "house_number": "5A", "plz": "10115", "city": "Berlin"}\n', encoding="utf-8")
+    expected = [{"street": "Hauptstrasse", "house_number": "5A", "plz": "10115", "city": "Berlin"}]
+    assert prewarm.read_addresses(str(csv_path)) == expected
+    assert prewarm.read_addresses(str(jsonl_path)) == expected
+
+# Test that finished jobs are cached and skipped on resume, empty results are retried
+def test_prewarm_resume(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path / "cache"))
+    fetchers = {"Good": FakeFetcher("Good"), "Empty": FakeFetcher("Empty", offers=False)}
+    addresses = [
+        {"street": "Hauptstrasse", "house_number": "5A", "plz": "10115", "city": "Berlin"},
+        {"street": "Bahnhofstrasse", "house_number": "1", "plz": "80331", "city": "Muenchen"},
+    ]
+    state_path = str(tmp_path / "addresses.csv.done")
+
+    stats = prewarm.prewarm(addresses, concurrency=4, per_provider=1, state_path=state_path, fetchers=fetchers)
+    assert (stats["Good"].ok, stats["Empty"].empty) == (2, 2)
+    assert list(cache_utils.load_from_cache("Good", addresses[0])["cost_first_years_eur"]) == [30.0]
+
+    stats = prewarm.prewarm(addresses, concurrency=4, per_provider=1, state_path=state_path, fetchers=fetchers)
+    assert stats["Good"].ok + stats["Good"].cached == 0
+    assert stats["Empty"].empty == 2
+    assert len(fetchers["Good"].calls) == 2
+    assert len(fetchers["Empty"].calls) == 4
+
+# Test that jobs of a failing provider count as failed, also once its circuit is open
+def test_prewarm_counts_outages_as_failed(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(data_access_utils, "backoff_delay", lambda attempt: 0)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    fetchers = {"Down": FakeFetcher("Down", error=RuntimeError("server error"))}
+    addresses = [
+        {"street": "Hauptstrasse", "house_number": "5A", "plz": "10115", "city": "Berlin"},
+        {"street": "Bahnhofstrasse", "house_number": "1", "plz": "80331", "city": "Muenchen"},
+    ]
+
+    stats = prewarm.prewarm(addresses, concurrency=1, per_provider=1, fetchers=fetchers)
+    assert (stats["Down"].failed, stats["Down"].empty) == (2, 0)
+    # the first job opened the circuit, the second one failed fast
+    assert len(fetchers["Down"].calls) == data_access_utils.MAX_RETRIES
@@ -1,10 +1,23 @@
+import os
+import io
+import json
+import time
+import asyncio
+import aiohttp
 import pandas as pd
 import pytest
+from src.providers import fetch_byteme, fetch_pingperfect, fetch_servusspeed, fetch_verbyndich, fetch_webwunder
+from src.providers.base import ProviderFetcher
 from src.providers.fetch_byteme import ByteMeFetcher
 from src.providers.fetch_pingperfect import PingPerfectFetcher
 from src.providers.fetch_servusspeed import ServusSpeedFetcher
 from src.providers.fetch_verbyndich import VerbynDichFetcher
 from src.providers.fetch_webwunder import WebWunderFetcher
+from src.utils import cache_utils, circuit_breaker, data_access_utils, http_client, memory_cache
+from src.utils.offer_batch import OfferBatch
+from tests.helpers import InFlight
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
 
 ADDRESS = {
     "street": "Hauptstrasse",
@@ -20,12 +33,263 @@ ADDRESS = {
     VerbynDichFetcher(),
     WebWunderFetcher(),
 ])
-# Test that each provider function returns a DataFrame with minimal expected columns
-def test_provider_returns_dataframe(provider_instance):
-    df = provider_instance.get_offers(ADDRESS)
-    assert isinstance(df, pd.DataFrame)
+# Test that each provider function returns an OfferBatch with the minimal expected columns filled in
+def test_provider_returns_offer_batch(provider_instance):
+    batch = provider_instance.get_offers(ADDRESS)
+    assert isinstance(batch, OfferBatch)
     # Check for at least some expected columns
     for col in ["provider", "name", "cost_eur", "speed_mbps", 
                 "connection_type", "duration_months"
                 ]:
-        assert col in df.columns
\ No newline at end of file
+        assert not batch.missing[col].any()
+
+# Test that the synchronous get_offers runs get_offers_async on the shared event loop
+def test_get_offers_runs_on_shared_loop():
+    class FakeFetcher(ProviderFetcher):
+        async def get_offers_async(self, address):
+            return pd.DataFrame([{"provider": "Fake", "loop": asyncio.get_running_loop()}])
+    df = FakeFetcher().get_offers(ADDRESS)
+    assert df.loc[0, "loop"] is http_client.get_loop()
+    # the loop is reused between calls
+    assert FakeFetcher().get_offers(ADDRESS).loc[0, "loop"] is df.loc[0, "loop"]
+
+# Test that timeouts reach the retries of every provider and open its circuit
+@pytest.mark.parametrize("fetcher", [ByteMeFetcher(), PingPerfectFetcher(), ServusSpeedFetcher(), VerbynDichFetcher(), WebWunderFetcher()])
+def test_provider_timeouts_open_circuit(fetcher, monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(data_access_utils, "backoff_delay", lambda attempt: 0)
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(fetch_pingperfect, "SIGNATURE_SECRET", "secret")
+    monkeypatch.setattr(fetch_servusspeed, "USER", "user")
+    monkeypatch.setattr(fetch_servusspeed, "PASS", "password")
+    requests = []
+    class TimingOutSession:
+        def request(self, *args, **kwargs):
+            requests.append(args)
+            raise asyncio.TimeoutError()
+        get = post = request
+    async def get_session(base_url):
+        return TimingOutSession()
+    monkeypatch.setattr(http_client, "get_session", get_session)
+
+    # the timeout itself is raised, not an error about an empty response
+    with pytest.raises(asyncio.TimeoutError):
+        http_client.run(data_access_utils.safe_get_offers_async(fetcher.get_offers_async, ADDRESS, "Down", raise_errors=True))
+    assert len(requests) >= data_access_utils.MAX_RETRIES
+    assert circuit_breaker.get_breaker("Down").state == circuit_breaker.OPEN
+    # the next search fails fast
+    count = len(requests)
+    df = http_client.run(data_access_utils.safe_get_offers_async(fetcher.get_offers_async, ADDRESS, "Down"))
+    assert df.empty and len(requests) == count
+
+# Minimal SOAP response with one fixed-voucher product
+WEBWUNDER_RESPONSE = """<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
+    xmlns:ns2="http://webwunder.gendev7.check24.fun/offerservice"
+    xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <soapenv:Body><Output><ns2:products>
+    <ns2:productId>1</ns2:productId>
+    <ns2:providerName>WebWunder {connection_type}</ns2:providerName>
+    <ns2:productInfo>
+      <ns2:speed>100</ns2:speed>
+      <ns2:monthlyCostInCent>3000</ns2:monthlyCostInCent>
+      <ns2:monthlyCostInCentFrom25thMonth>3500</ns2:monthlyCostInCentFrom25thMonth>
+      <ns2:voucher xsi:type="ns2:absoluteVoucher">
+        <ns2:discountInCent>2400</ns2:discountInCent>
+        <ns2:minOrderValueInCent>1000</ns2:minOrderValueInCent>
+      </ns2:voucher>
+      <ns2:contractDurationInMonths>24</ns2:contractDurationInMonths>
+      <ns2:connectionType>{connection_type}</ns2:connectionType>
+    </ns2:productInfo>
+  </ns2:products></Output></soapenv:Body>
+</soapenv:Envelope>"""
+
+# Test that WebWunder sends its six SOAP calls concurrently, capped by CONCURRENCY
+def test_webwunder_fetches_combinations_concurrently(monkeypatch):
+    in_flight = InFlight()
+    async def fake_fetch_offers(session, installation, connection_type, address):
+        with in_flight.track():
+            await asyncio.sleep(0.05)
+        return WEBWUNDER_RESPONSE.format(connection_type=connection_type.upper())
+    monkeypatch.setattr(fetch_webwunder, "fetch_offers", fake_fetch_offers)
+    monkeypatch.setattr(fetch_webwunder, "CONCURRENCY", 4)
+
+    df = WebWunderFetcher().get_offers(ADDRESS)
+    assert len(df) == 6
+    assert in_flight.max == 4
+    # every combination keeps its own installation flag
+    combinations = set(zip(df["connection_type"], df["installation_included"]))
+    assert combinations == {(c, i) for c in ["fiber", "dsl", "cable"] for i in [True, False]}
+
+# Test that Ping Perfect sends both signed requests concurrently and merges them
+def test_pingperfect_fetches_fiber_and_non_fiber_concurrently(monkeypatch):
+    monkeypatch.setattr(fetch_pingperfect, "SIGNATURE_SECRET", "secret")
+    in_flight = InFlight()
+    async def fake_fetch_offers(session, request):
+        with in_flight.track():
+            await asyncio.sleep(0.05)
+        fiber = '"wantsFiber":true' in request["json_body"]
+        return [{
+            "providerName": "Fiber" if fiber else "DSL",
+            "productInfo": {"speed": 100, "contractDurationInMonths": 24, "connectionType": "Fiber" if fiber else "DSL"},
+            "pricingDetails": {"monthlyCostInCent": 3000, "installationService": "no"},
+        }]
+    monkeypatch.setattr(fetch_pingperfect, "fetch_offers", fake_fetch_offers)
+
+    df = PingPerfectFetcher().get_offers(ADDRESS)
+    assert in_flight.max == 2
+    # fiber offers come first, as before
+    assert list(df["name"]) == ["Fiber", "DSL"]
+
+# Test that a retried Ping Perfect request is signed again once its timestamp is too old
+def test_pingperfect_resigns_stale_request_on_retry(monkeypatch):
+    monkeypatch.setattr(fetch_pingperfect, "SIGNATURE_SECRET", "secret")
+    request = fetch_pingperfect.build_request(ADDRESS, True)
+
+    sent = []
+    class FakeResponse:
+        async def __aenter__(self): return self
+        async def __aexit__(self, *exc): return False
+        def raise_for_status(self): pass
+        async def json(self): return [{"ok": True}]
+    class FakeSession:
+        def post(self, url, headers, data, timeout):
+            sent.append(dict(headers))
+            if len(sent) == 1:
+                # the first attempt fails after the signature window has passed
+                request["timestamp"] -= fetch_pingperfect.SIGNATURE_MAX_AGE + 1
+                raise aiohttp.ClientConnectionError("connection reset")
+            return FakeResponse()
+
+    results = http_client.run(fetch_pingperfect.fetch_offers(FakeSession(), request))
+    assert results == [{"ok": True}]
+    assert len(sent) == 2
+    # the retry carries a fresh timestamp and a matching signature
+    assert time.time() - int(sent[1]["X-Timestamp"]) <= fetch_pingperfect.SIGNATURE_MAX_AGE
+    assert sent[1]["X-Signature"] == fetch_pingperfect.sign_payload(
+        request["json_body"], request["timestamp"], "secret")
+
+# Test that Servus Speed only requests details of products missing from the details cache
+def test_servusspeed_details_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(fetch_servusspeed, "DETAILS_MEMORY_CACHE", memory_cache.MemoryLRU(16, 1024 * 1024))
+    requested = []
+    async def fake_fetch_details(session, product_id, address, limiter):
+        requested.append(product_id)
+        return {"servusSpeedProduct": {"id": product_id}}
+    monkeypatch.setattr(fetch_servusspeed, "fetch_details", fake_fetch_details)
+
+    # the cache is read in worker threads, so the details are requested in any order
+    offers = http_client.run(fetch_servusspeed.fetch_all_offers(None, ["a", "b"], ADDRESS))
+    assert sorted(requested) == ["a", "b"]
+    requested.clear()
+    offers = http_client.run(fetch_servusspeed.fetch_all_offers(None, ["a", "b", "c"], ADDRESS))
+    assert requested == ["c"]
+    assert [offer["servusSpeedProduct"]["id"] for offer in offers] == ["a", "b", "c"]
+    # details are kept in their own memory tier, not in the one of the provider results
+    name, scope = fetch_servusspeed.details_cache_key("a", ADDRESS)
+    assert cache_utils.MEMORY_CACHE.get(cache_utils.cache_key(name, scope), 3600) is None
+    assert fetch_servusspeed.DETAILS_MEMORY_CACHE.get(cache_utils.cache_key(name, scope), 3600) is not None
+    # details are scoped by address
+    requested.clear()
+    http_client.run(fetch_servusspeed.fetch_all_offers(None, ["a"], {**ADDRESS, "plz": "80331"}))
+    assert requested == ["a"]
+    # expired details are fetched again
+    requested.clear()
+    monkeypatch.setattr(fetch_servusspeed, "DETAILS_CACHE_TIME", -1)
+    http_client.run(fetch_servusspeed.fetch_all_offers(None, ["b"], ADDRESS))
+    assert requested == ["b"]
+
+# Test that VerbynDich requests pages speculatively, discards pages after the last one
+# and remembers the page count of the PLZ
+def test_verbyndich_speculative_pagination(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(fetch_verbyndich, "PAGE_WINDOW", 2)
+    in_flight = InFlight()
+    requested = []
+    async def fake_fetch_offers_from_page(session, address, page):
+        requested.append(page)
+        with in_flight.track():
+            await asyncio.sleep(0.01)
+        if page > 4:
+            raise aiohttp.ClientError("page out of range")
+        return {"page": page, "last": page == 4, "offers": []}
+    monkeypatch.setattr(fetch_verbyndich, "fetch_offers_from_page", fake_fetch_offers_from_page)
+    address = "Hauptstrasse;5A;Berlin;10115"
+
+    pages = http_client.run(fetch_verbyndich.fetch_all_offers(None, address))
+    assert [data["page"] for data in pages] == [0, 1, 2, 3, 4]
+    assert in_flight.max == 2
+    assert http_client.run(fetch_verbyndich.load_page_hint("10115")) == 5
+
+    # the next search for the PLZ requests all known pages at once
+    in_flight.max = 0
+    requested.clear()
+    pages = http_client.run(fetch_verbyndich.fetch_all_offers(None, address))
+    assert [data["page"] for data in pages] == [0, 1, 2, 3, 4]
+    assert in_flight.max == 5
+    assert sorted(requested) == [0, 1, 2, 3, 4]
+
+# Test that a failing page before the last page is raised
+def test_verbyndich_pagination_raises_page_errors(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    async def fake_fetch_offers_from_page(session, address, page):
+        if page == 1:
+            raise aiohttp.ClientError("server error")
+        return {"page": page, "last": page == 3}
+    monkeypatch.setattr(fetch_verbyndich, "fetch_offers_from_page", fake_fetch_offers_from_page)
+    with pytest.raises(aiohttp.ClientError):
+        http_client.run(fetch_verbyndich.fetch_all_offers(None, "Hauptstrasse;5A;Berlin;10115"))
+
+# Test that Servus Speed yields every offer as soon as its details arrive
+def test_servusspeed_streams_offers(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    async def fake_fetch_available_products(session, address):
+        return ["slow", "fast", "timeout"]
+    async def fake_fetch_details(session, product_id, address, limiter):
+        if product_id == "timeout":
+            return None
+        await asyncio.sleep(0.05 if product_id == "slow" else 0)
+        return {"servusSpeedProduct": {
+            "providerName": product_id,
+            "productInfo": {"speed": 100, "contractDurationInMonths": 24, "connectionType": "DSL",
+                            "tv": None, "limitFrom": None, "maxAge": 30},
+            "pricingDetails": {"monthlyCostInCent": 3000, "installationService": False},
+        }}
+    monkeypatch.setattr(fetch_servusspeed, "fetch_available_products", fake_fetch_available_products)
+    monkeypatch.setattr(fetch_servusspeed, "fetch_details", fake_fetch_details)
+
+    async def collect():
+        return [batch async for batch in ServusSpeedFetcher().iter_offers_async(ADDRESS)]
+    batches = http_client.run(collect())
+    assert all(isinstance(batch, OfferBatch) for batch in batches)
+    assert [list(batch["name"]) for batch in batches] == [["fast"], ["slow"]]
+    # get_offers_async skips the timed out product the same way
+    assert sorted(ServusSpeedFetcher().get_offers(ADDRESS)["name"]) == ["fast", "slow"]
+
+# Test that the ByteMe transform computes vouchers and keeps missing values with nullable dtypes
+def test_byteme_transform_offers():
+    csv = (
+        "productId,providerName,speed,monthlyCostInCent,afterTwoYearsMonthlyCost,durationInMonths,"
+        "connectionType,installationService,tv,limitFrom,maxAge,voucherType,voucherValue\n"
+        "1,Byte Basic,100,4800,5200,24,DSL,false,ByteLive Basic,,27,percentage,10\n"
+        "2,Byte Ultra,1000,6000,6000,12,Fiber,false,,300,,absolute,2400\n"
+        "3,Byte Max,250,3000,3500,24,Cable,false,,200,,,\n"
+    )
+    df = fetch_byteme.transform_offers(pd.read_csv(io.StringIO(csv)))
+    assert df["voucher_percent"][0] == 10 and df["voucher_percent"].isna().tolist() == [False, True, True]
+    assert df["voucher_fixed_eur"][1] == 24.0 and df["voucher_fixed_eur"].isna().tolist() == [True, False, True]
+    assert list(df["promo_price_eur"][:2]) == [43.2, 59.0] and pd.isna(df["promo_price_eur"][2])
+    assert df["max_age"].tolist()[0] == 27 and df["max_age"].isna().tolist() == [False, True, True]
+    assert df["limit_from_gb"].isna().tolist() == [True, False, False]
+    assert df["tv"].tolist()[1:] == [pd.NA, pd.NA] and df["connection_type"].tolist() == ["dsl", "fiber", "cable"]
+    assert {column: str(df[column].dtype) for column in ["max_age", "voucher_percent", "limit_from_gb", "voucher_fixed_eur", "installation_included"]} == {
+        "max_age": "Int64", "voucher_percent": "Int64", "limit_from_gb": "Int64", "voucher_fixed_eur": "Float64", "installation_included": "boolean"
+    }
+
+# Test that VerbynDich descriptions are parsed into the expected offers, invalid offers are dropped
+def test_verbyndich_transform_offers_fixture():
+    with open(os.path.join(FIXTURES, "verbyndich_offers.json"), encoding="utf-8") as f:
+        fixture = json.load(f)
+    rows = fetch_verbyndich.transform_offers(fixture["offers"]).records()
+    assert [{column: row[column] for column in expected} for row, expected in zip(rows, fixture["expected"])] == fixture["expected"]
+    assert len(rows) == len(fixture["expected"]) and {row["provider"] for row in rows} == {"VerbynDich"}
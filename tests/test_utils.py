@@ -1,5 +1,18 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import multiprocessing
+import concurrent.futures
 import pytest
-from src.utils import for_string, autocomplete, validation
+import numpy as np
+import pandas as pd
+from src.utils import for_string, autocomplete, validation, http_client, data_access_utils, cache_utils, cache_backends, cache_formats, single_flight, circuit_breaker, memory_cache, address_utils, nominatim_cache, prefix_index, ndjson
+from src.utils.adaptive_limiter import AdaptiveLimiter
+from src.utils.offer_batch import OfferBatch
+from src import build_index
+from tests.helpers import InFlight
 
 # --- Utility Functions ---
 # Make sure special characters are URL-safe for API requests
@@ -65,4 +78,726 @@ def test_validate_address(monkeypatch):
         def raise_for_status(self): pass
         def json(self): return []
     monkeypatch.setattr("requests.get", lambda *a, **kw: MockResponseEmpty())
-    assert validation.validate_address("Fake", "1", "00000", "Nowhere") is False
\ No newline at end of file
+    assert validation.validate_address("Fake", "1", "00000", "Nowhere") is False
+
+# Complete autocomplete results answer longer queries without a new request
+def test_plz_suggestions_prefix_reuse(monkeypatch):
+    nominatim_cache.MEMORY_CACHE.clear()
+    calls = []
+    class MockResponse:
+        def __init__(self, count):
+            self.count = count
+        def raise_for_status(self): pass
+        def json(self):
+            return [{"address": {"postcode": f"101{i}5", "city": "Berlin"}} for i in range(self.count)]
+    def get(url, params, headers):
+        calls.append(params["postalcode"])
+        return MockResponse(3 if params["postalcode"] == "101" else 10)
+    monkeypatch.setattr("requests.get", get)
+    assert [s["postcode"] for s in autocomplete.fetch_plz_suggestions("1011")] == ["10115"]
+    assert [s["postcode"] for s in autocomplete.fetch_plz_suggestions("101")] == ["10105", "10115", "10125"]
+    assert [s["postcode"] for s in autocomplete.fetch_plz_suggestions("1012")] == ["10125"]
+    assert autocomplete.fetch_plz_suggestions("10122") == []
+    # "1011" was looked up before "101" and is cached itself
+    assert calls == ["1011", "101"]
+
+# Short and empty results of exact postal code searches do not answer longer queries
+def test_plz_suggestions_exact_match_upstream(monkeypatch):
+    nominatim_cache.MEMORY_CACHE.clear()
+    calls = []
+    class MockResponse:
+        def __init__(self, query):
+            self.query = query
+        def raise_for_status(self): pass
+        def json(self):
+            return [{"address": {"postcode": "10115", "city": "Berlin"}}] if self.query in ("10115", "10") else []
+    def get(url, params, headers):
+        calls.append(params["postalcode"])
+        return MockResponse(params["postalcode"])
+    monkeypatch.setattr("requests.get", get)
+    for query in ["1", "10", "101", "1011"]:
+        autocomplete.fetch_plz_suggestions(query)
+    assert [s["postcode"] for s in autocomplete.fetch_plz_suggestions("10115")] == ["10115"]
+    assert calls == ["1", "10", "101", "1011", "10115"]
+
+# Validation results are cached, also in the cache backend, and shared by spellings of the address
+def test_validate_address_cached(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(nominatim_cache, "NOMINATIM_CACHE_PERSIST", True)
+    nominatim_cache.MEMORY_CACHE.clear()
+    calls = []
+    class MockResponse:
+        def raise_for_status(self): pass
+        def json(self): return [{}]
+    monkeypatch.setattr("requests.get", lambda *a, **kw: calls.append(1) or MockResponse())
+    assert validation.validate_address("Hauptstraße", "5A", "10115", "Berlin") is True
+    assert validation.validate_address("hauptstr.", "5 a", "10115", "Berlin") is True
+    nominatim_cache.MEMORY_CACHE.clear()
+    assert validation.validate_address("Hauptstrasse", "5a", "10115", "berlin") is True
+    assert len(calls) == 1
+
+# A rejected spelling is not cached, so other spellings of the address are still asked for
+def test_validate_address_does_not_cache_rejections(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    nominatim_cache.MEMORY_CACHE.clear()
+    calls = []
+    class MockResponse:
+        def __init__(self, params):
+            self.params = params
+        def raise_for_status(self): pass
+        def json(self): return [{}] if self.params["street"] == "5A Hauptstraße" else []
+    monkeypatch.setattr("requests.get", lambda url, params, headers: calls.append(1) or MockResponse(params))
+    assert validation.validate_address("Hauptstr.", "5A", "10115", "Berlin") is False
+    assert validation.validate_address("Hauptstraße", "5A", "10115", "Berlin") is True
+    assert validation.validate_address("Hauptstrasse", "5a", "10115", "Berlin") is True
+    assert len(calls) == 2
+
+# The offline index answers prefix searches, autocomplete only asks Nominatim on a miss
+def test_autocomplete_prefix_index(monkeypatch, tmp_path):
+    csv_path = tmp_path / "addresses.csv"
+    csv_path.write_text(
+        "plz,city,street\n10115,Berlin,Hauptstraße\n10115,Berlin,Karl-Marx-Straße\n"
+        "10117,Berlin,Hauptstraße\n80331,München,Hauptstraße\n", encoding="utf-8")
+    build_index.main([str(csv_path), "--output", str(tmp_path / "index")])
+    index = prefix_index.open_index(str(tmp_path / "index"))
+    assert [s["display"] for s in index.plz_suggestions("101")] == ["10115 Berlin", "10117 Berlin"]
+    assert index.plz_suggestions("8", limit=1) == [{"display": "80331 München", "postcode": "80331", "city": "München"}]
+    assert index.street_suggestions("karl marx", "berlin") == [{"display": "Karl-Marx-Straße"}]
+    assert index.street_suggestions("Haupt", "München") == [{"display": "Hauptstraße"}]
+    assert prefix_index.open_index(str(tmp_path / "missing")) is None
+
+    monkeypatch.setattr(autocomplete, "INDEX", index)
+    monkeypatch.setattr("requests.get", lambda *a, **kw: pytest.fail("Nominatim was asked"))
+    assert autocomplete.fetch_plz_suggestions("1011")[0]["postcode"] == "10115"
+    assert autocomplete.fetch_street_suggestions("Haupt", "Berlin") == [{"display": "Hauptstraße"}]
+    # unknown prefixes fall back to Nominatim
+    class MockResponse:
+        def raise_for_status(self): pass
+        def json(self): return [{"address": {"postcode": "20095", "city": "Hamburg"}}]
+    monkeypatch.setattr("requests.get", lambda *a, **kw: MockResponse())
+    assert autocomplete.fetch_plz_suggestions("2009")[0]["postcode"] == "20095"
+
+# --- HTTP Client ---
+# Test that sessions are pooled per host with the configured pool size
+def test_http_client_sessions_per_host(monkeypatch):
+    monkeypatch.setattr(http_client, "POOL_SIZES", {"a.example.com": 3})
+    async def get_sessions():
+        return (
+            await http_client.get_session("https://a.example.com/api/x"),
+            await http_client.get_session("https://a.example.com/api/y"),
+            await http_client.get_session("https://b.example.com/api"),
+        )
+    a1, a2, b = http_client.run(get_sessions())
+    assert a1 is a2
+    assert a1 is not b
+    assert a1.connector.limit_per_host == 3
+    assert b.connector.limit_per_host == http_client.POOL_SIZE
+    http_client.run(http_client.close_sessions())
+    assert a1.closed and b.closed
+
+# --- Adaptive Limiter ---
+# Fast successful requests raise the limit, errors and slow requests lower it
+def test_adaptive_limiter_aimd():
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=1, max_limit=6)
+    for _ in range(20):
+        limiter.record(1.0, True)
+    assert limiter.limit == 6
+    limiter.record(1.0, False)
+    assert limiter.limit == 3
+    # the same congestion reported by requests already in flight only counts once
+    limiter.record(5.0, True)
+    assert limiter.limit == 3
+
+# The latency baseline only covers recent requests, one fast outlier does not lower the limit for good
+def test_adaptive_limiter_baseline_recovers():
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=1, max_limit=6, latency_window=5)
+    limiter.record(0.01, True)
+    assert limiter.min_latency == 0.01
+    for _ in range(5):
+        limiter.record(1.0, True)
+    assert limiter.min_latency == 1.0
+    # normal latencies count as fast again and raise the limit
+    for _ in range(20):
+        limiter.record(1.0, True)
+    assert limiter.limit == 6
+
+# The limiter never lets more requests in flight than its current limit
+def test_adaptive_limiter_caps_in_flight():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=2)
+    in_flight = InFlight()
+    async def request():
+        async with limiter.slot():
+            with in_flight.track():
+                await asyncio.sleep(0.01)
+    async def run_all():
+        await asyncio.gather(*[request() for _ in range(8)])
+    http_client.run(run_all())
+    assert in_flight.max == 2
+    assert limiter.in_flight == 0
+
+# --- Data Access ---
+# A streaming provider is retried until it yields, but not after it streamed offers
+def test_safe_iter_offers_async(monkeypatch):
+    monkeypatch.setattr(data_access_utils, "RETRY_BACKOFF", 0)
+    calls = []
+    async def flaky(address):
+        calls.append(address)
+        if len(calls) == 1:
+            raise ConnectionError("first attempt fails")
+        yield "batch"
+        raise ConnectionError("fails after streaming")
+    async def collect():
+        batches = []
+        try:
+            async for batch in data_access_utils.safe_iter_offers_async(flaky, "address", "Flaky Provider"):
+                batches.append(batch)
+        except ConnectionError:
+            batches.append("error")
+        return batches
+    assert http_client.run(collect()) == ["batch", "error"]
+    assert len(calls) == 2
+
+# --- Single Flight ---
+ADDRESS = {"street": "Hauptstrasse", "house_number": "5A", "plz": "10115", "city": "Berlin"}
+
+# Concurrent streams of the same cache entry call the provider only once
+def test_iter_provider_data_coalesces_concurrent_misses(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    calls = []
+    async def iter_offers(address):
+        calls.append(address)
+        for i in range(2):
+            await asyncio.sleep(0.01)
+            yield pd.DataFrame([{"provider": "Test", "name": f"Offer {i}"}])
+    async def collect():
+        return [list(batch["name"]) async for batch in cache_utils.iter_provider_data_async("Test", ADDRESS, iter_offers)]
+    async def search_three_times():
+        return await asyncio.gather(collect(), collect(), collect())
+    results = http_client.run(search_three_times())
+    assert len(calls) == 1
+    assert results == [[["Offer 0"], ["Offer 1"]]] * 3
+    # the result was cached once for all callers
+    assert list(cache_utils.load_from_cache("Test", ADDRESS)["name"]) == ["Offer 0", "Offer 1"]
+
+# Concurrent threads with the same key share one call
+def test_single_flight_do_across_threads():
+    calls = []
+    started = threading.Event()
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "result"
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        first = pool.submit(single_flight.do, "key", slow)
+        started.wait()
+        others = [pool.submit(single_flight.do, "key", slow) for _ in range(3)]
+        results = [first.result()] + [f.result() for f in others]
+    assert results == ["result"] * 4
+    assert calls == [1]
+
+def fetch_in_process(cache_dir, marker_dir, index):
+    # Runs in a separate process: fetch through the cache, record upstream calls as files
+    cache_utils.CACHE_DIR = cache_dir
+    def fetch(address):
+        open(os.path.join(marker_dir, str(index)), "w").close()
+        time.sleep(0.3)
+        return pd.DataFrame([{"provider": "Test", "name": "Offer"}])
+    cache_utils.get_provider_data("Test", ADDRESS, fetch)
+
+# Concurrent processes with the same cache entry call the provider only once
+@pytest.mark.skipif(single_flight.fcntl is None or "fork" not in multiprocessing.get_all_start_methods(),
+                    reason="needs fcntl and fork")
+def test_get_provider_data_coalesces_across_processes(tmp_path):
+    cache_dir, marker_dir = tmp_path / "cache", tmp_path / "markers"
+    marker_dir.mkdir()
+    ctx = multiprocessing.get_context("fork")
+    processes = [ctx.Process(target=fetch_in_process, args=(str(cache_dir), str(marker_dir), i)) for i in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(10)
+    assert all(p.exitcode == 0 for p in processes)
+    assert len(os.listdir(marker_dir)) == 1
+
+# Lock files not used for the purge age are removed, held and recently used ones are kept
+@pytest.mark.skipif(single_flight.fcntl is None, reason="needs fcntl")
+def test_purge_cache_removes_unused_locks(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    old, held, recent = (cache_utils.lock_path(name, ADDRESS) for name in ("Old", "Held", "Recent"))
+    for path in (old, held, recent):
+        with single_flight.file_lock(path):
+            pass
+    an_hour_ago = time.time() - 3600
+    for path in (old, held):
+        os.utime(path, (an_hour_ago, an_hour_ago))
+    monkeypatch.setattr(cache_utils, "CACHE_PURGE_AGE", 60)
+    with open(held, "a") as f:
+        single_flight.fcntl.flock(f, single_flight.fcntl.LOCK_EX)
+        cache_utils.purge_cache()
+    assert sorted(os.listdir(cache_utils.lock_dir())) == sorted(os.path.basename(path) for path in (held, recent))
+
+# --- Retries and Circuit Breaker ---
+# The circuit opens after consecutive failures, fails fast and lets one probe through after the reset timeout
+def test_circuit_breaker_states():
+    now = [0.0]
+    breaker = circuit_breaker.CircuitBreaker("Test", failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN
+    assert not breaker.allow()
+    now[0] = 31
+    assert breaker.allow()       # the probe
+    assert not breaker.allow()   # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN
+    now[0] = 62
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == circuit_breaker.CLOSED
+    assert breaker.allow()
+
+# A cancelled or closed probe opens the circuit again instead of leaving it stuck half-open
+def test_circuit_breaker_aborted_probe(monkeypatch):
+    now = [0.0]
+    name = "Aborted Probe"
+    breaker = circuit_breaker.CircuitBreaker(name, failure_threshold=1, reset_timeout=30, clock=lambda: now[0])
+    monkeypatch.setattr(circuit_breaker, "_breakers", {name: breaker})
+    breaker.record_failure()
+
+    async def hanging(address):
+        await asyncio.sleep(10)
+    async def cancel_probe():
+        task = asyncio.ensure_future(data_access_utils.safe_get_offers_async(hanging, "address", name))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    now[0] = 31
+    http_client.run(cancel_probe())
+    assert breaker.state == circuit_breaker.OPEN and not breaker.probing
+
+    async def streaming(address):
+        yield pd.DataFrame([{"name": "Offer"}])
+        await asyncio.sleep(10)
+    async def close_probe():
+        stream = data_access_utils.safe_iter_offers_async(streaming, "address", name)
+        await stream.__anext__()
+        await stream.aclose()
+    now[0] = 62
+    http_client.run(close_probe())
+    assert breaker.state == circuit_breaker.OPEN and not breaker.probing
+    now[0] = 93
+    assert breaker.allow()
+
+# A dead provider fails fast once its circuit is open
+def test_safe_get_offers_async_fails_fast_when_circuit_open(monkeypatch):
+    monkeypatch.setattr(data_access_utils, "RETRY_BACKOFF", 0)
+    calls = []
+    async def dead(address):
+        calls.append(address)
+        raise ConnectionError("provider down")
+    name = "Dead Provider"
+    df = http_client.run(data_access_utils.safe_get_offers_async(dead, "address", name))
+    assert df.empty
+    assert len(calls) == data_access_utils.MAX_RETRIES
+    assert circuit_breaker.get_breaker(name).state == circuit_breaker.OPEN
+    df = http_client.run(data_access_utils.safe_get_offers_async(dead, "address", name))
+    assert df.empty
+    assert len(calls) == data_access_utils.MAX_RETRIES
+
+# Retries stop at the deadline instead of sleeping through it
+def test_safe_get_offers_async_respects_deadline():
+    async def hanging(address):
+        await asyncio.sleep(10)
+    async def run_with_deadline():
+        return await data_access_utils.safe_get_offers_async(
+            hanging, "address", "Slow Provider", deadline=time.monotonic() + 0.1)
+    start = time.monotonic()
+    df = http_client.run(run_with_deadline())
+    assert df.empty
+    assert time.monotonic() - start < 1
+
+# --- Cache Backends ---
+# Both backends store, read, delete entries and purge by age and size (LRU)
+@pytest.mark.parametrize("kind", ["file", "sqlite"])
+def test_cache_backend_purge(kind, monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_backends, "ATIME_RESOLUTION", 0)
+    backend = cache_backends.create_backend(kind, str(tmp_path))
+    now = time.time()
+    backend.set("old.json", b"x" * 10, now - 100)
+    backend.set("a.json", b"a" * 10, now - 3)
+    backend.set("b.json", b"b" * 10, now - 2)
+    backend.set("c.json", b"c" * 10, now - 1)
+    assert backend.get("old.json") == b"x" * 10
+    backend.delete("old.json")
+    assert backend.get("old.json") is None
+    backend.set("old.json", b"x" * 10, now - 100)
+    # reading "a" makes "b" the least recently used entry
+    time.sleep(0.01)
+    backend.get("a.json")
+    assert backend.purge(max_age=50, max_bytes=20) == 2
+    assert backend.get("old.json") is None
+    assert backend.get("b.json") is None
+    assert backend.get("a.json") == b"a" * 10
+    assert backend.get("c.json") == b"c" * 10
+
+# Reads only update the last read time of an entry if it is older than ATIME_RESOLUTION
+@pytest.mark.parametrize("kind", ["file", "sqlite"])
+def test_cache_backend_read_time_resolution(kind, tmp_path):
+    backend = cache_backends.create_backend(kind, str(tmp_path))
+    def set_accessed(accessed):
+        if kind == "file":
+            os.utime(backend.path("a.json"), (accessed, os.stat(backend.path("a.json")).st_mtime))
+        else:
+            backend.connect().execute("UPDATE entries SET accessed = ? WHERE name = 'a.json'", (accessed,))
+    def get_accessed():
+        if kind == "file":
+            return os.stat(backend.path("a.json")).st_atime
+        return backend.connect().execute("SELECT accessed FROM entries WHERE name = 'a.json'").fetchone()[0]
+    now = time.time()
+    backend.set("a.json", b"a", now - 1000)
+    set_accessed(now - 30)
+    assert backend.get("a.json") == b"a"
+    assert get_accessed() == pytest.approx(now - 30)
+    set_accessed(now - 120)
+    assert backend.get("a.json") == b"a"
+    assert get_accessed() >= now
+
+# Threads asking for the backend at the same time after a configuration change share one backend
+def test_get_backend_concurrent(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    created = []
+    def create_backend(kind, directory):
+        time.sleep(0.05)
+        created.append(object())
+        return created[-1]
+    monkeypatch.setattr(cache_backends, "create_backend", create_backend)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        backends = list(pool.map(lambda _: cache_utils.get_backend(), range(8)))
+    assert len(created) == 1
+    assert all(backend is created[0] for backend in backends)
+
+# The cache round-trips provider data through the configured backend
+@pytest.mark.parametrize("kind", ["file", "sqlite"])
+def test_cache_roundtrip(kind, monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache_utils, "CACHE_BACKEND", kind)
+    df = pd.DataFrame([{"provider": "Test", "name": "Offer", "cost_eur": 30.0}])
+    cache_utils.save_to_cache("Test", ADDRESS, df)
+    assert cache_utils.load_from_cache("Test", ADDRESS).equals(df)
+    assert cache_utils.load_from_cache("Test", ADDRESS, max_age=-1) is None
+    assert cache_utils.load_from_cache("Other", ADDRESS) is None
+
+# Expired entries are served as stale while a single background refresh replaces them
+def test_iter_provider_data_stale_while_revalidate(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache_utils, "CACHE_TIME", 0)
+    monkeypatch.setattr(cache_utils, "CACHE_STALE_TIME", 60)
+    cache_utils.save_to_cache("Stale Provider", ADDRESS, pd.DataFrame([{"name": "Old"}]))
+    calls = []
+
+    async def iter_func(address):
+        calls.append(address)
+        await asyncio.sleep(0.05)
+        yield pd.DataFrame([{"name": "New"}])
+
+    async def search():
+        return [batch async for batch in cache_utils.iter_provider_data_async("Stale Provider", ADDRESS, iter_func)]
+
+    async def run():
+        first, second = await search(), await search()
+        await cache_utils._refreshes[cache_utils.cache_key("Stale Provider", ADDRESS)]
+        return first, second
+
+    first, second = http_client.run(run())
+    assert list(first[0]["name"]) == ["Old"] and list(first[0]["stale"]) == [True]
+    assert list(second[0]["name"]) == ["Old"]
+    assert len(calls) == 1
+    assert list(cache_utils.load_from_cache("Stale Provider", ADDRESS, max_age=60)["name"]) == ["New"]
+
+# Async paths read and write the backend in worker threads, never on the shared event loop
+@pytest.mark.parametrize("kind", ["file", "sqlite"])
+def test_iter_provider_ndjson_backend_off_loop(kind, monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache_utils, "CACHE_BACKEND", kind)
+    backend = cache_utils.get_backend()
+    threads = []
+    for method in ("get", "set", "delete"):
+        def record(*args, call=getattr(backend, method)):
+            threads.append(threading.current_thread().name)
+            return call(*args)
+        monkeypatch.setattr(backend, method, record)
+
+    async def iter_func(address):
+        yield pd.DataFrame([{"name": "Offer"}])
+
+    async def search():
+        return [value async for value in cache_utils.iter_provider_ndjson_async(
+            "Off Loop", ADDRESS, iter_func, OfferBatch.from_frame, ndjson.dumps_offers, 1)]
+
+    first = http_client.run(search())
+    cache_utils.MEMORY_CACHE.clear()
+    second = http_client.run(search())
+    assert first == second and threads
+    assert "http-client-loop" not in threads
+
+# The npz format keeps dtypes, entries in the other format are still read until overwritten
+def test_cache_format_migration(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    df = pd.DataFrame({
+        "name": ["A", "B"],
+        "cost_eur": [30.0, None],
+        "tv": ["Basic", None],
+        "speed_mbps": [100, 250],
+        "installation_included": pd.array([True, None], dtype="boolean"),
+    }).astype({"cost_eur": object})
+    cache_utils.save_to_cache("Test", ADDRESS, df)
+    cache_utils.MEMORY_CACHE.clear()
+    monkeypatch.setattr(cache_utils, "CACHE_FORMAT", "npz")
+    assert list(cache_utils.load_from_cache("Test", ADDRESS)["name"]) == ["A", "B"]
+    cache_utils.save_to_cache("Test", ADDRESS, df)
+    cache_utils.MEMORY_CACHE.clear()
+    assert not os.path.exists(os.path.join(str(tmp_path), cache_utils.entry_name("Test", ADDRESS, "json")))
+    loaded = cache_utils.load_from_cache("Test", ADDRESS)
+    assert loaded.equals(df) and loaded.dtypes.equals(df.dtypes)
+    # data other than DataFrames is always stored as JSON
+    cache_utils.save_to_cache("Hint", ADDRESS, {"pages": 3})
+    assert os.path.exists(os.path.join(str(tmp_path), cache_utils.entry_name("Hint", ADDRESS, "json")))
+
+def write_entries(directory, index, until):
+    backend = cache_backends.FileBackend(directory)
+    i = 0
+    while time.time() < until:
+        # sizes from a few bytes to a few MB, so a non-atomic write would be seen half done
+        size = (index * 7919 + i * 104729) % (4 * 1024 * 1024)
+        backend.set("entry.json", json.dumps({"size": size, "payload": "x" * size}).encode(), time.time())
+        i += 1
+
+def read_entries(directory, until):
+    backend = cache_backends.FileBackend(directory)
+    reads = 0
+    while time.time() < until:
+        value = backend.get("entry.json")
+        if value is not None:
+            entry = json.loads(value)
+            assert len(entry["payload"]) == entry["size"]
+            reads += 1
+    assert reads > 0
+
+# Readers in other processes never see a partially written entry
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_file_backend_atomic_writes_across_processes(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    until = time.time() + 1.5
+    processes = [ctx.Process(target=write_entries, args=(str(tmp_path), i, until)) for i in range(3)]
+    processes += [ctx.Process(target=read_entries, args=(str(tmp_path), until)) for _ in range(3)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(10)
+    assert all(p.exitcode == 0 for p in processes)
+    assert os.listdir(tmp_path) == ["entry.json"]
+
+# Corrupt entries are treated as misses and removed
+def test_load_from_cache_corrupt_entry(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    name = cache_utils.entry_name("Test", ADDRESS)
+    cache_utils.get_backend().set(name, b'{"timestamp": 1, "data": [{"na', time.time())
+    assert cache_utils.load_from_cache("Test", ADDRESS) is None
+    assert not os.path.exists(os.path.join(str(tmp_path), name))
+    # what an unsynced write may leave behind after a crash
+    cache_utils.get_backend().set(name, b"", time.time())
+    assert cache_utils.load_from_cache("Test", ADDRESS) is None
+    assert not os.path.exists(os.path.join(str(tmp_path), name))
+
+# Stored NDJSON expires with its entry, is versioned and is removed when new data is saved
+def test_ndjson_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    cache_utils.save_to_cache("Test", ADDRESS, pd.DataFrame([{"name": "Offer"}]))
+    timestamp, _ = cache_utils.load_entry("Test", ADDRESS)
+    cache_utils.save_ndjson("Test", ADDRESS, b'{"name": "Offer"}\n', 1, timestamp)
+    cache_utils.MEMORY_CACHE.clear()
+    assert cache_utils.load_ndjson("Test", ADDRESS, 1) == b'{"name": "Offer"}\n'
+    assert cache_utils.load_ndjson("Test", ADDRESS, 2) is None
+    assert cache_utils.load_ndjson("Test", ADDRESS, 1, max_age=-1) is None
+    cache_utils.save_to_cache("Test", ADDRESS, pd.DataFrame([{"name": "New"}]))
+    assert cache_utils.load_ndjson("Test", ADDRESS, 1) is None
+
+# NDJSON built from data that was replaced in the meantime is not stored
+def test_ndjson_cache_saved_after_new_data(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    cache_utils.save_to_cache("Test", ADDRESS, pd.DataFrame([{"name": "Old"}]))
+    timestamp, _ = cache_utils.load_entry("Test", ADDRESS)
+    time.sleep(0.01)
+    cache_utils.save_to_cache("Test", ADDRESS, pd.DataFrame([{"name": "New"}]))
+    cache_utils.save_ndjson("Test", ADDRESS, b'{"name": "Old"}\n', 1, timestamp)
+    assert cache_utils.load_ndjson("Test", ADDRESS, 1) is None
+    cache_utils.MEMORY_CACHE.clear()
+    assert cache_utils.load_ndjson("Test", ADDRESS, 1) is None
+
+# Stored NDJSON that is shorter than its header says (e.g. truncated by a crash) is a miss
+def test_ndjson_cache_truncated(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    cache_utils.save_to_cache("Test", ADDRESS, pd.DataFrame([{"name": "Offer"}]))
+    timestamp, _ = cache_utils.load_entry("Test", ADDRESS)
+    cache_utils.save_ndjson("Test", ADDRESS, b'{"name": "Offer"}\n{"name": "Other"}\n', 1, timestamp)
+    cache_utils.MEMORY_CACHE.clear()
+    backend = cache_utils.get_backend()
+    name = cache_utils.ndjson_entry_name("Test", ADDRESS)
+    backend.set(name, backend.get(name)[:-20], timestamp)
+    assert cache_utils.load_ndjson("Test", ADDRESS, 1) is None
+    assert backend.get(name) is None
+
+# --- Address Canonicalization ---
+# Spellings of the same address share a cache key, different addresses do not
+def test_cache_key_canonical_address():
+    def key(street, house_number, city="Berlin"):
+        address = {"street": for_string.make_api_safe(street), "house_number": for_string.make_api_safe(house_number),
+                   "plz": "10115", "city": for_string.make_api_safe(city)}
+        return cache_utils.cache_key("ByteMe", address)
+    assert key("Hauptstraße", "5a") == key("Hauptstrasse", "5A") == key("hauptstr.", "5 a") == key("HAUPTSTR", "5a", "berlin")
+    assert key("Karl-Marx-Str.", "12") == key("Karl Marx Straße", "12")
+    assert key("Hauptstraße", "5a") != key("Hauptstraße", "5")
+    assert key("Hauptstraße", "5a") != key("Strandweg", "5a")
+    assert address_utils.canonical_address({"plz": "10115", "scope": "x"}) == {"plz": "10115", "scope": "x"}
+
+# Entries written under the key of the uncanonicalized address are still found
+def test_load_from_cache_legacy_key(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    address = {"street": "Hauptstrasse", "house_number": "5A", "plz": "10115", "city": "Berlin"}
+    entry = {"timestamp": time.time(), "data": [{"name": "Offer"}]}
+    cache_utils.get_backend().set(cache_utils.legacy_entry_name("ByteMe", address), json.dumps(entry).encode(), time.time())
+    assert list(cache_utils.load_from_cache("ByteMe", address)["name"]) == ["Offer"]
+
+# --- Memory Cache ---
+# The memory tier evicts the least recently used entries above its entry and byte limits
+def test_memory_lru_eviction():
+    cache = memory_cache.MemoryLRU(max_entries=2, max_bytes=100)
+    now = time.time()
+    cache.set("a", "A", now, size=10)
+    cache.set("b", "B", now, size=10)
+    cache.get("a", max_age=60)
+    cache.set("c", "C", now, size=10)
+    assert cache.get("b", max_age=60) is None
+    assert cache.get("a", max_age=60) == "A"
+    cache.set("d", "D", now, size=95)
+    assert cache.get("a", max_age=60) is None
+    assert cache.get("c", max_age=60) is None
+    assert cache.get("d", max_age=60) == "D"
+    # entries keep their original timestamp
+    cache.set("old", "O", now - 100, size=1)
+    assert cache.get("old", max_age=60) is None
+
+# Hits in the memory tier skip the backend, data read from the backend is normalized once
+def test_load_from_cache_memory_tier(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    df = pd.DataFrame([{"provider": "Test", "name": "Offer", "cost_eur": 30.0}])
+    cache_utils.save_to_cache("Test", ADDRESS, df)
+    cache_utils.MEMORY_CACHE.clear()
+    calls = []
+    def normalize(data):
+        calls.append(1)
+        return data.assign(normalized=True)
+    first = cache_utils.load_from_cache("Test", ADDRESS, normalize=normalize)
+    assert cache_utils.load_from_cache("Test", ADDRESS, max_age=-1) is None
+    monkeypatch.setattr(cache_utils.get_backend(), "get", lambda name: pytest.fail("backend was read"))
+    second = cache_utils.load_from_cache("Test", ADDRESS, normalize=normalize)
+    assert second is first
+    assert list(second["normalized"]) == [True]
+    assert len(calls) == 1
+
+# Loads with and without normalize get their own data from the memory tier, in either order
+def test_load_from_cache_memory_tier_keeps_normalized_apart(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_utils, "CACHE_DIR", str(tmp_path))
+    df = pd.DataFrame([{"provider": "Test", "name": "Offer", "cost_eur": 30.0}])
+    cache_utils.save_to_cache("Test", ADDRESS, df)
+    normalize = lambda data: data.assign(normalized=True)
+    assert "normalized" not in cache_utils.load_from_cache("Test", ADDRESS).columns
+    assert list(cache_utils.load_from_cache("Test", ADDRESS, normalize=normalize)["normalized"]) == [True]
+    assert "normalized" not in cache_utils.load_from_cache("Test", ADDRESS).columns
+    # data saved as normalized replaces the raw entry in the memory tier
+    cache_utils.save_to_cache("Test", ADDRESS, normalize(df), normalized=True)
+    assert list(cache_utils.load_from_cache("Test", ADDRESS, normalize=normalize)["normalized"]) == [True]
+
+# --- Offer Batches ---
+# Provider columns are converted to typed arrays, missing columns and values are None in the records
+def test_offer_batch_from_frame():
+    df = pd.DataFrame([
+        {"provider": "A", "name": "Fast", "cost_eur": 30.0, "speed_mbps": 100, "limit_from_gb": 250.0, "tv": None, "product_id": "1"},
+        {"provider": "A", "name": "Slow", "cost_eur": None, "speed_mbps": 50, "limit_from_gb": None, "tv": "TV", "product_id": "2"},
+    ]).astype({"cost_eur": object})
+    batch = OfferBatch.from_frame(df)
+    assert len(batch) == 2 and str(batch.values["speed_mbps"].dtype) == "int64"
+    assert batch["cost_eur"] == [30.0, None] and batch["limit_from_gb"] == [250, None]
+    first = batch.records()[0]
+    assert "product_id" not in first and first["installation_included"] is False and first["tv"] is None
+    assert json.dumps(first)
+    both = OfferBatch.concat([batch, batch.mark_stale()])
+    assert both["name"] == ["Fast", "Slow", "Fast", "Slow"] and both.records()[0]["stale"] is True
+    assert memory_cache.estimate_size(batch) == batch.nbytes > 0
+
+# Batches built from records or column arrays are the same as batches built from a DataFrame of them
+def test_offer_batch_from_records_and_columns():
+    records = [
+        {"provider": "A", "name": "Fast", "cost_eur": 30.0, "speed_mbps": 100, "limit_from_gb": float("nan"), "tv": None, "installation_included": True},
+        {"provider": "A", "name": "Slow", "promo_price_eur": 20.0, "speed_mbps": 50, "limit_from_gb": 250, "tv": pd.NA, "product_id": "2"},
+    ]
+    expected = OfferBatch.from_frame(pd.DataFrame(records)).records()
+    assert OfferBatch.from_records(records).records() == expected
+    columns = {
+        "provider": ["A", "A"], "name": np.array(["Fast", "Slow"], dtype=object), "cost_eur": np.array([30.0, np.nan]),
+        "promo_price_eur": [None, 20.0], "speed_mbps": np.array([100, 50]), "limit_from_gb": np.array([np.nan, 250.0]),
+        "tv": [None, pd.NA], "installation_included": [True, None],
+    }
+    assert OfferBatch.from_columns(columns, 2).records() == expected
+    assert OfferBatch.from_records([]).empty
+
+# Offer batches are stored in both cache formats and read back as DataFrames with the same values
+@pytest.mark.parametrize("format", ["json", "npz"])
+def test_offer_batch_cache_formats(format):
+    batch = OfferBatch.from_frame(pd.DataFrame([
+        {"provider": "A", "name": "Fast", "cost_eur": 30.0, "speed_mbps": 100, "installation_included": True},
+        {"provider": "A", "name": "Slow", "max_age": 27},
+    ]))
+    assert cache_formats.supports(format, batch)
+    timestamp, df = cache_formats.FORMATS[format]["loads"](cache_formats.FORMATS[format]["dumps"](1.0, batch))
+    assert timestamp == 1.0
+    assert OfferBatch.from_frame(df).records() == batch.records()
+
+# --- NDJSON Serializer ---
+# Both encoders write one line per offer with null for missing values, NaN and pd.NA
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_offers(monkeypatch, use_orjson):
+    if use_orjson and ndjson.orjson is None:
+        pytest.skip("orjson is not installed")
+    if not use_orjson:
+        monkeypatch.setattr(ndjson, "orjson", None)
+    batch = OfferBatch.from_frame(pd.DataFrame({
+        "provider": ["Ä", "B"], "name": ["Offer", pd.NA], "cost_eur": [30.5, float("nan")],
+        "speed_mbps": [100, None], "installation_included": [True, None],
+    }))
+    value = ndjson.dumps_offers(batch.mark_stale())
+    assert isinstance(value, bytes) and value.endswith(b"\n")
+    offers = [json.loads(line) for line in value.decode().splitlines()]
+    assert offers == [{**record, "stale": True} for record in batch.records()]
+    assert offers[1]["name"] is None and offers[1]["cost_eur"] is None and offers[1]["speed_mbps"] is None
+    assert offers[0]["provider"] == "Ä" and offers[0]["speed_mbps"] == 100 and offers[1]["installation_included"] is False
+    assert ndjson.dumps_offers(OfferBatch.from_frame(pd.DataFrame())) == b""
+
+# Both encoders write the same JSON for the same batch, infinite prices are null
+def test_dumps_offers_backends_agree(monkeypatch):
+    if ndjson.orjson is None:
+        pytest.skip("orjson is not installed")
+    batch = OfferBatch.from_frame(pd.DataFrame({
+        "provider": ["A", "B", "C"], "name": ["Offer", None, "Ü"],
+        "cost_eur": [30.5, float("inf"), float("-inf")], "promo_price_eur": [float("nan"), 10.0, None],
+        "speed_mbps": [100, None, 50], "installation_included": [True, None, False],
+    }))
+    with_orjson = [json.loads(line) for line in ndjson.dumps_offers(batch).decode().splitlines()]
+    monkeypatch.setattr(ndjson, "orjson", None)
+    without_orjson = [json.loads(line) for line in ndjson.dumps_offers(batch).decode().splitlines()]
+    assert with_orjson == without_orjson
+    assert [offer["cost_eur"] for offer in without_orjson] == [30.5, None, None]